@@ -3,56 +3,253 @@ import asyncio
 import logging
 import os
 import pathlib
+import signal
+import socket
 import sys
+import time
 from logging import Logger
 from threading import Thread
-from typing import Dict
+from typing import Dict, List, Tuple
 
 import cherrypy
 
 from src import Utils
+from src.Agent import Agent
+from src.AgentRegistry import AgentRegistry
+from src.AsyncWeb import AsyncWeb
 from src.BaseTypes import CheckResult
+from src.CheckResultApi import CheckResultApi
 from src.ConfigReader import ConfigReader
+from src.Dashboard import Dashboard
+from src.ExtensionRegistry import ExtensionRegistry
+from src.FederationClient import FederationClient
 from src.HealthChecker import HealthChecker
+from src.HistoryStore import HistoryStore
 from src.HtmlWriter import HtmlWriter
+from src.Metrics import Metrics
+from src.HttpClient import HttpClient
 from src.NotifyManager import NotifyManager
-from src.Web import API, Application
+from src.PingEngine import PingEngine
+from src.ResultCache import ResultCache
+from src.Scheduler import Scheduler
+from src.StateStore import State, StateStore
+from src.Web import API, AgentAPI, Application, DashboardAPI, HistoryAPI, MetricsAPI, Stream
+from src.WorkerPool import WorkerPool
 
 
-async def HealthCheck(configFilePath: str, checkInterval: int, refreshInterval: int, cache: Dict[str, CheckResult], logger: Logger):
+async def HealthCheck(configFilePath: str, checkInterval: int, jitter: float, cycleDeadline: float, workers: int, cache: ResultCache, dashboard: Dashboard, htmlWriter: HtmlWriter, history: HistoryStore, stateStore: StateStore, snapshotInterval: float, metrics: Metrics, agents: AgentRegistry, logger: Logger):
 
-    folderPath = Utils.PrepareLocalAppdata()
-    htmlFilePath = os.path.join(folderPath, "index.html")
-    htmlWriter = HtmlWriter(htmlFilePath, refreshInterval)
+    pingEngine = PingEngine(logger)
+    httpClient = HttpClient(logger)
+    federationClient = FederationClient(httpClient, logger)
+    workerPool = WorkerPool(workers, logger, cycleDeadline) if workers > 0 else None
+    healthChecker = HealthChecker(cache, pingEngine, httpClient, federationClient, logger, cycleDeadline, metrics, workerPool)
+    scheduler = Scheduler(checkInterval, jitter, logger)
+    healthChecker.RunRequested = scheduler.Trigger
+    resultQueue: asyncio.Queue = asyncio.Queue()
+    notifyManager = NotifyManager(httpClient, logger, metrics)
+    configReader = ConfigReader()
+    extensions = ExtensionRegistry(logger)
+    reloadRequested = asyncio.Event()
+    warmStart = False
+    agentTasks = set()
+
+    configReloads = metrics.Counter("healthchecker_config_reloads_total", "The number of times the config has been applied.").Labels()
+    extensionReloads = metrics.Counter("healthchecker_extension_reloads_total", "The number of times modified extensions have been loaded.").Labels()
+    stageDurations = metrics.Histogram("healthchecker_processing_duration_seconds", "The duration of the processing stages of the check results.", ("stage",))
+
+    # restore the state of the previous process so that the last check results are shown right away
+    if stateStore is not None:
+
+        state = stateStore.Load()
+
+        if state is not None:
+
+            for (identifier, checkResult) in state.Cache.items():
+                cache[identifier] = checkResult
+
+            healthChecker.Results = state.Results
+            Utils.SetThrottleState(state.StageMap, state.MuteMap, state.RunMap)
+            warmStart = any(state.Results)
+            logger.info(f"Restored {len(state.Cache)} cached and {len(state.Results)} last check results.")
+
+    # SIGHUP requests an explicit reload of all extensions
+    if hasattr(signal, "SIGHUP"):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reloadRequested.set)
+
+    def ScheduleChecks():
+
+        # the checks which are assigned to agents are not run by this process
+        assignedKeys = agents.GetAssignedKeys() if agents is not None else set()
+        intervals = {key: interval for (key, interval) in healthChecker.GetIntervals(checkInterval).items() if key not in assignedKeys}
+
+        scheduler.SetChecks(intervals, healthChecker.GetBatchKeys())
+
+    async def LoadConfigAsync():
+
+        nonlocal warmStart
+
+        while True:
+
+            try:
+
+                # only reimport extensions when their files have changed (or when requested)
+                if reloadRequested.is_set():
+                    reloadRequested.clear()
+                    extensionsChanged = extensions.Reload()
+
+                else:
+                    extensionsChanged = extensions.Refresh()
+
+                # only apply the config when the file has actually changed
+                config = configReader.ReadIfChanged(configFilePath)
+
+                if config is not None:
+                    logger.info("The config file has changed, apply it.")
+
+                elif extensionsChanged:
+                    logger.info("The extensions have changed, apply the config again.")
+                    config = healthChecker.Config
+
+                if extensionsChanged:
+                    extensionReloads.Inc()
+
+                if config is not None:
+                    configReloads.Inc()
+                    healthChecker.SetConfig(config, extensions)
+
+                    if agents is not None:
+                        agents.SetChecks(healthChecker.GetRemoteChecks(), checkInterval)
+
+                    ScheduleChecks()
+                    notifyManager.SetConfig(config, extensions)
+
+                # the restored results of checks which still exist are shown until the checks have run again,
+                # an empty batch lets the page be rendered by the task which renders all other results
+                if warmStart:
+                    warmStart = False
+                    resultQueue.put_nowait({})
+
+                healthChecker.CleanUpCache()
+                httpClient.LogStatistics()
+
+            except Exception as ex:
+                logger.error(msg=str(ex), exc_info=ex)
+
+            try:
+                await asyncio.wait_for(reloadRequested.wait(), checkInterval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def RunChecksAsync(keys: List[str]):
 
-    while True:
+        logger.info(f"Check health ({len(keys)} checks).")
+        result = await healthChecker.RunChecksAsync(keys)
+        resultQueue.put_nowait(result)
+
+    async def AddAgentResultsAsync(timedResults: Dict[str, Tuple[CheckResult, float]]):
+        result = await healthChecker.AddCheckResultsAsync(timedResults)
+        resultQueue.put_nowait(result)
+
+    def OnAgentResults(timedResults: Dict[str, Tuple[CheckResult, float]]):
+
+        # the results of the agents are processed like those of the local checks
+        task = asyncio.ensure_future(AddAgentResultsAsync(timedResults))
+        agentTasks.add(task)
+        task.add_done_callback(agentTasks.discard)
+
+    async def RemoveExpiredAgentsAsync():
+
+        while True:
+            await asyncio.sleep(agents.HeartbeatSeconds)
+            agents.RemoveExpired()
+
+    async def ProcessResultsAsync():
+
+        while True:
+
+            # merge all results which have arrived in the meantime
+            result: Dict[str, List[CheckResult]] = {}
+            batches = [await resultQueue.get()]
+
+            while not resultQueue.empty():
+                batches.append(resultQueue.get_nowait())
+
+            for batch in batches:
+                for (group, results) in batch.items():
+                    result.setdefault(group, []).extend(results)
+
+            try:
+
+                logger.info("Throttle notifications.")
+                start = time.perf_counter()
+                filteredResult = Utils.ThrottleNotifications(result)
+
+                logger.info("Notify.")
+                await notifyManager.NotifyAsync(filteredResult)
+                stageDurations.Labels("notify").Observe(time.perf_counter() - start)
+
+                logger.info("Update html.")
+                start = time.perf_counter()
+                await htmlWriter.WriteResultAsync(healthChecker.GetCheckResult())
+                dashboard.Update(healthChecker.GetKeyedCheckResult())
+                stageDurations.Labels("render").Observe(time.perf_counter() - start)
+
+                # the history files are written by a worker thread
+                if history is not None:
+                    logger.info("Record history.")
+                    start = time.perf_counter()
+                    await asyncio.get_running_loop().run_in_executor(None, history.Record, result)
+                    stageDurations.Labels("history").Observe(time.perf_counter() - start)
+
+            except Exception as ex:
+                logger.error(msg=str(ex), exc_info=ex)
+
+    def GetSnapshot() -> tuple:
+        return stateStore.GetSnapshot(State(cache, healthChecker.Results, *Utils.GetThrottleState()))
+
+    async def SaveStateAsync():
 
         try:
+            while True:
+
+                await asyncio.sleep(snapshotInterval)
 
-            logger.info("Load config.")
-            config = ConfigReader().Read(configFilePath)
+                # the snapshot is taken on the event loop, compressing and writing it is done by a worker thread
+                try:
+                    if await asyncio.get_running_loop().run_in_executor(None, stateStore.Save, GetSnapshot()):
+                        logger.info("Saved state.")
 
-            logger.info("Load extensions.")
-            extensions = Utils.LoadExtensions()
+                except Exception as ex:
+                    logger.error(msg=str(ex), exc_info=ex)
 
-            logger.info("Check health.")
-            healthChecker = HealthChecker(config, extensions, cache, logger)
-            result = await healthChecker.CheckHealthAsync()
+        # save the latest state when the app is stopped (e.g. Ctrl+C)
+        except asyncio.CancelledError:
+            stateStore.Save(GetSnapshot())
+            raise
 
-            logger.info("Throttle notifications.")
-            filteredResult = Utils.ThrottleNotifications(result)
+    tasks = [LoadConfigAsync(), scheduler.RunAsync(RunChecksAsync), ProcessResultsAsync()]
 
-            logger.info("Notify.")
-            notifyManager = NotifyManager(config, extensions, logger)
-            await notifyManager.NotifyAsync(filteredResult)
+    if stateStore is not None:
+        tasks.append(SaveStateAsync())
 
-            logger.info("Update html.")
-            htmlWriter.WriteResult(result)
-            
-        except Exception as ex:
-            logger.error(msg=str(ex), exc_info=ex)
+    if agents is not None:
+        agents.AssignmentChanged = ScheduleChecks
+        agents.ResultsReceived = OnAgentResults
+        tasks.append(RemoveExpiredAgentsAsync())
 
-        await asyncio.sleep(checkInterval)
+    if workerPool is not None:
+        metrics.AddGaugeFunction("healthchecker_workers_running", "The number of running worker processes.", lambda: workerPool.RunningWorkers)
+
+    try:
+        await asyncio.gather(*tasks)
+
+    finally:
+        if workerPool is not None:
+            workerPool.Stop()
+
+        # e.g. pending digests are sent
+        await notifyManager.CloseAsync()
 
 def handle_error():
     from cherrypy import _cperror
@@ -61,11 +258,9 @@ def handle_error():
         f"<html><body>{_cperror.format_exc()}</body></html>"
     ]
 
-def Serve(host: str, port: int, cache: Dict[str, CheckResult], logger: Logger):
+def Serve(host: str, port: int, htmlWriter: HtmlWriter, api: CheckResultApi, logger: Logger):
 
     # mount "/"
-    folderPath = Utils.PrepareLocalAppdata()
-    htmlFilePath = os.path.join(folderPath, "index.html")
 
     appConfig = {
         "/": {
@@ -77,7 +272,7 @@ def Serve(host: str, port: int, cache: Dict[str, CheckResult], logger: Logger):
         }
     }
  
-    cherrypy.tree.mount(Application(htmlFilePath), "/", appConfig)
+    cherrypy.tree.mount(Application(htmlWriter), "/", appConfig)
 
     # mount "/api/checkresult"
     apiConfig = {
@@ -89,7 +284,13 @@ def Serve(host: str, port: int, cache: Dict[str, CheckResult], logger: Logger):
         }   
     }
 
-    cherrypy.tree.mount(API(cache, logger), "/api/checkresults", apiConfig)
+    cherrypy.tree.mount(API(api, logger), "/api/checkresults", apiConfig)
+    cherrypy.tree.mount(Stream(api, logger), "/api/stream", apiConfig)
+    cherrypy.tree.mount(DashboardAPI(api, logger), "/api/dashboard", apiConfig)
+    cherrypy.tree.mount(HistoryAPI(api, logger), "/api/history", apiConfig)
+    cherrypy.tree.mount(MetricsAPI(api, logger), "/metrics", apiConfig)
+    cherrypy.tree.mount(AgentAPI(api, logger), "/api/agents", apiConfig)
+    cherrypy.tree.mount(Stream(api, logger, api.SubscribeDashboard), "/api/dashboard/stream", apiConfig)
 
     # run
     logger.info(f"Starting web server on address {host}:{port}.")
@@ -112,11 +313,31 @@ async def Main():
     parser.add_argument("--config", type=str, default="testconfig.conf", help="The default config file is testconfig.conf.")
     parser.add_argument("--host", type=str, default="127.0.0.1", help="The default host is 127.0.0.1")
     parser.add_argument("--port", type=int, default=80, help="The default port is 80.")
+    parser.add_argument("--server", type=str, default="cherrypy", choices=["cherrypy", "aiohttp"], help="The web server implementation. 'aiohttp' serves all requests from the event loop of the health checker. Default is cherrypy.")
     parser.add_argument("--check-interval", type=int, default=60, help="The check interval in seconds. Default is 60s.")
     parser.add_argument("--refresh-interval", type=int, default=15, help="The page refresh interval in seconds. Default is 15s.")
+    parser.add_argument("--cycle-deadline", type=float, default=None, help="The time in seconds after which all checks of a run which are still running are cancelled. Default is no deadline.")
+    parser.add_argument("--cache-ttl-minutes", type=float, default=1440, help="The time in minutes after which cached check results (see external-cache) expire unless a result has its own time to live. Default is 1440 min.")
+    parser.add_argument("--cache-max-size", type=int, default=None, help="The maximum number of cached check results. When it is exceeded, the least recently used check results are evicted. Default is no limit.")
+    parser.add_argument("--history-days", type=int, default=30, help="The number of days for which all check results are kept in the history. 0 disables the history. Default is 30.")
+    parser.add_argument("--snapshot-interval", type=float, default=60, help="The interval in seconds at which the last check results and the notification state are saved to be restored on the next start. 0 disables it. Default is 60s.")
+    parser.add_argument("--workers", type=int, default=0, help="The number of worker processes which run the checks (except external-cache checks) to use multiple CPU cores. 0 runs all checks in the main process. Default is 0.")
+    parser.add_argument("--role", type=str, default="standalone", choices=["standalone", "coordinator", "agent"], help="'coordinator' distributes the checks across the registered agents, 'agent' runs the checks assigned by the coordinator (see --coordinator). Default is standalone.")
+    parser.add_argument("--coordinator", type=str, default=None, help="The URL of the coordinator (agents only).")
+    parser.add_argument("--agent-id", type=str, default=None, help="The unique id of the agent. Default is <host name>-<process id>.")
+    parser.add_argument("--agent-token", type=str, default=None, help="The shared secret which the agents send to the coordinator (required for coordinators and agents).")
+    parser.add_argument("--agent-timeout", type=float, default=30, help="The time in seconds after which the checks of an agent which has not been seen are moved to the other agents (coordinator only). Default is 30s.")
+    parser.add_argument("--jitter", type=float, default=1.0, help="The fraction of a check's interval over which its first run is randomly delayed to spread the load. Default is 1.0.")
 
     args = parser.parse_args()
 
+    # validate the arguments before anything is created
+    if args.role == "agent" and args.coordinator is None:
+        parser.error("--coordinator is required for agents.")
+
+    if args.role in ["coordinator", "agent"] and args.agent_token is None:
+        parser.error(f"--agent-token is required for {args.role}s.")
+
     # logging
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger("Health Checker")
@@ -128,15 +349,47 @@ async def Main():
 
     sys.excepthook = global_except_hook
 
-    # create check result cache
-    cache = {}
+    # agents only run the checks which are assigned by the coordinator and report their results to it
+    if args.role == "agent":
+        agentId = args.agent_id if args.agent_id is not None else f"{socket.gethostname()}-{os.getpid()}"
+        logger.info(f"Starting agent {agentId} of coordinator {args.coordinator}.")
+        await Agent(args.coordinator, agentId, args.agent_token, args.jitter, args.cycle_deadline, args.workers, logger).RunAsync()
+        return
+
+    # create check result cache, the state of the live dashboard and the history
+    folderPath = Utils.PrepareLocalAppdata()
+    cache = ResultCache(defaultTtl=args.cache_ttl_minutes * 60, maxSize=args.cache_max_size)
+    dashboard = Dashboard()
+    history = HistoryStore(os.path.join(folderPath, "history"), logger, args.history_days) if args.history_days > 0 else None
+    stateStore = StateStore(os.path.join(folderPath, "state.bin"), logger) if args.snapshot_interval > 0 else None
+    metrics = Metrics()
+    metrics.AddGaugeFunction("healthchecker_cache_entries", "The number of cached check results.", lambda: len(cache))
+    metrics.AddCounterFunction("healthchecker_cache_hits_total", "The number of cache lookups which have found a check result.", lambda: cache.Hits)
+    metrics.AddCounterFunction("healthchecker_cache_misses_total", "The number of cache lookups which have not found a check result.", lambda: cache.Misses)
+    metrics.AddCounterFunction("healthchecker_cache_expirations_total", "The number of expired cached check results.", lambda: cache.Expirations)
+    metrics.AddCounterFunction("healthchecker_cache_evictions_total", "The number of cached check results which have been evicted to keep the maximum size.", lambda: cache.Evictions)
+    agents = AgentRegistry(args.agent_timeout, args.agent_token, logger) if args.role == "coordinator" else None
+
+    if agents is not None:
+        metrics.AddGaugeFunction("healthchecker_agents", "The number of registered agents.", lambda: len(agents.Agents))
+
+    api = CheckResultApi(cache, logger, asyncio.get_running_loop(), dashboard, history, metrics, agents)
+
+    # the page is rendered by the health checker and served from memory by the web server
+    htmlFilePath = os.path.join(folderPath, "index.html")
+    htmlWriter = HtmlWriter(htmlFilePath, args.refresh_interval)
 
     # run web server
-    thread = Thread(target=Serve, args=(args.host, args.port, cache, logger,))
-    thread.start()
+    if args.server == "aiohttp":
+        await AsyncWeb(args.host, args.port, htmlWriter, api, logger).StartAsync()
+
+    else:
+        thread = Thread(target=Serve, args=(args.host, args.port, htmlWriter, api, logger,))
+        thread.start()
 
     # run health checks
-    await HealthCheck(args.config, args.check_interval, args.refresh_interval, cache, logger)
+    await HealthCheck(args.config, args.check_interval, args.jitter, args.cycle_deadline, args.workers, cache, dashboard, htmlWriter, history, stateStore, args.snapshot_interval, metrics, agents, logger)
     
-# run main task
-asyncio.run(Main())
+# run main task (not in the worker processes, which import this module as well)
+if __name__ == "__main__":
+    asyncio.run(Main())
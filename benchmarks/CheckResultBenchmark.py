@@ -0,0 +1,93 @@
+# Compares the memory usage and the construction and age computation times of the slotted check result
+# with those of the former check result (plain object with a datetime timestamp).
+#
+# usage: python benchmarks/CheckResultBenchmark.py [--results 20000] [--repeat 5]
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.BaseTypes import CheckResult, CheckResultType
+
+
+class _FormerCheckResult:
+    Name: str
+    ResultType: CheckResultType
+    Message: str
+    InfoUrl: str
+    Notifiers: List[str]
+    Created: datetime
+
+    def __init__(self, name: str, resultType: CheckResultType, message: str, infoUrl: str, notifiers: List[str]):
+        self.Name = name
+        self.ResultType = resultType
+        self.Message = message
+        self.InfoUrl = infoUrl
+        self.Notifiers = notifiers
+        self.Created = datetime.utcnow().replace(tzinfo=timezone.utc)
+
+    @property
+    def AgeMinutes(self):
+        return (datetime.utcnow().replace(tzinfo=timezone.utc) - self.Created).total_seconds()/60
+
+def _create(resultType: type, count: int) -> list:
+
+    # like checkers, which create their results from the same settings again and again
+    notifiers = ["email", "loki"]
+
+    return [resultType(f"Check {i % 1000}", CheckResultType.Success, "Everything is fine.", None, notifiers) for i in range(count)]
+
+def _measure(resultType: type, count: int, repeat: int) -> Dict[str, float]:
+
+    # memory of all results (including their attributes)
+    gc.collect()
+    tracemalloc.start()
+    results = _create(resultType, count)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    def measureDuration(action: Callable[[], object]) -> float:
+
+        durations = []
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            action()
+            durations.append(time.perf_counter() - start)
+
+        return min(durations)
+
+    createDuration = measureDuration(lambda: _create(resultType, count))
+    ageDuration = measureDuration(lambda: [result for result in results if result.AgeMinutes > 1440])
+
+    return {
+        "bytesPerResult": round(memory / count, 1),
+        "constructionUs": round(createDuration / count * 1e6, 3),
+        "ageMinutesUs": round(ageDuration / count * 1e6, 3)
+    }
+
+def Main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {
+        "results": args.results,
+        "former": _measure(_FormerCheckResult, args.results, args.repeat),
+        "slotted": _measure(CheckResult, args.results, args.repeat)
+    }
+
+    print(json.dumps(report, indent=4))
+
+if __name__ == "__main__":
+    Main()
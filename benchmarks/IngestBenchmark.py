@@ -0,0 +1,108 @@
+# Compares the throughput of pushing check results one by one (one POST per check result) with the
+# throughput of the bulk NDJSON ingestion (one POST for all check results) in both web server modes.
+#
+# usage: python benchmarks/IngestBenchmark.py [--results 5000] [--concurrency 20]
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from typing import Dict
+
+import aiohttp
+
+from WebBenchmark import ServeAiohttp, ServeCherrypy, WaitForServerAsync
+
+
+def _getCheckResultJson(i: int) -> Dict[str, object]:
+    return {
+        "identifier": f"pushed-{i}",
+        "name": f"Pushed check {i}",
+        "resultType": 1,
+        "message": "Everything is fine."
+    }
+
+async def _pushSingleAsync(url: str, results: int, concurrency: int) -> float:
+
+    counter = iter(range(results))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    headers = { "Content-Type": "application/json" }
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def WorkerAsync():
+            for i in counter:
+                async with session.post(url, data=json.dumps(_getCheckResultJson(i)), headers=headers, raise_for_status=True) as response:
+                    await response.read()
+
+        start = time.perf_counter()
+        await asyncio.gather(*[WorkerAsync() for _ in range(concurrency)])
+
+        return time.perf_counter() - start
+
+async def _pushBulkAsync(url: str, results: int) -> float:
+
+    # the body is generated while it is sent
+    async def GetBodyAsync():
+        for i in range(results):
+            yield (json.dumps(_getCheckResultJson(i)) + "\n").encode("utf8")
+
+    headers = { "Content-Type": "application/x-ndjson" }
+
+    async with aiohttp.ClientSession() as session:
+
+        start = time.perf_counter()
+
+        async with session.post(url, data=GetBodyAsync(), headers=headers, raise_for_status=True) as response:
+            report = json.loads(await response.read())
+
+        duration = time.perf_counter() - start
+
+    if report["accepted"] != results:
+        raise Exception(f"Only {report['accepted']} of {results} check results have been accepted.")
+
+    return duration
+
+async def _runAsync(port: int, results: int, concurrency: int) -> Dict[str, float]:
+
+    url = f"http://127.0.0.1:{port}/api/checkresults"
+    await WaitForServerAsync(f"{url}/check-0")
+
+    singleDuration = await _pushSingleAsync(url, results, concurrency)
+    bulkDuration = await _pushBulkAsync(url, results)
+
+    return {
+        "results": results,
+        "singleResultsPerSecond": round(results / singleDuration, 1),
+        "bulkResultsPerSecond": round(results / bulkDuration, 1),
+        "speedup": round(singleDuration / bulkDuration, 1)
+    }
+
+def Main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=int, default=5000, help="The number of pushed check results.")
+    parser.add_argument("--concurrency", type=int, default=20, help="The number of concurrent single POST requests.")
+    parser.add_argument("--port", type=int, default=18180)
+    args = parser.parse_args()
+
+    report = {}
+
+    # the server runs in its own process so that the load generator does not compete for the GIL
+    for (mode, serve) in [("cherrypy", ServeCherrypy), ("aiohttp", ServeAiohttp)]:
+
+        process = multiprocessing.Process(target=serve, args=(args.port, 1), daemon=True)
+        process.start()
+
+        try:
+            report[mode] = asyncio.run(_runAsync(args.port, args.results, args.concurrency))
+
+        finally:
+            process.terminate()
+            process.join()
+
+    print(json.dumps(report, indent=4))
+
+if __name__ == "__main__":
+    Main()
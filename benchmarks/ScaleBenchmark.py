@@ -0,0 +1,325 @@
+# Runs complete check cycles (checks, notification throttling, notifications and rendering) of a synthetic
+# config with thousands of checks against local stand-ins and reports the cycle times, the CPU time, the peak
+# memory usage and the time per stage as JSON, e.g. to compare the results before and after a change.
+#
+# stand-ins (each in its own process, so that they do not compete with the health checker for the GIL):
+#   - an HTTP server with configurable latency and failure rate for the http-get checks
+#   - a Grafana Loki push endpoint and an SMTP sink for the notifiers
+#   - a federation peer (Web.API) for the query-federated checks
+#
+# usage: python benchmarks/ScaleBenchmark.py [--checks 5000] [--cycles 3] [--latency-ms 20] [--failure-rate 0.05] [--workers 0] [--output report.json]
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from WebBenchmark import ServeCherrypy, WaitForServerAsync
+from src import Utils
+from src.ConfigReader import ConfigReader
+from src.ExtensionRegistry import ExtensionRegistry
+from src.FederationClient import FederationClient
+from src.HealthChecker import HealthChecker
+from src.HtmlWriter import HtmlWriter
+from src.HttpClient import HttpClient
+from src.Metrics import Metrics
+from src.NotifyManager import NotifyManager
+from src.PingEngine import PingEngine
+from src.ResultCache import ResultCache
+from src.WorkerPool import WorkerPool
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def ServeStandIns(port: int, smtpPort: int, latency: float, failureRate: float):
+
+    statistics = { "targetRequests": 0, "targetFailures": 0, "lokiPushes": 0, "mails": 0 }
+
+    async def GetTargetAsync(request: web.Request) -> web.Response:
+
+        statistics["targetRequests"] += 1
+
+        # the latency varies between 0 and twice the mean latency
+        await asyncio.sleep(random.uniform(0, 2 * latency))
+
+        # the same targets fail in every cycle, so that they are notified from the second cycle on
+        if random.Random(request.match_info["index"]).random() < failureRate:
+            statistics["targetFailures"] += 1
+            return web.Response(status=500)
+
+        return web.Response(text=f"<html><body>Target {request.match_info['index']} is OK.</body></html>")
+
+    async def PushLokiAsync(request: web.Request) -> web.Response:
+        await request.read()
+        statistics["lokiPushes"] += 1
+        return web.Response(status=204)
+
+    async def GetStatisticsAsync(request: web.Request) -> web.Response:
+        return web.json_response(statistics)
+
+    async def HandleSmtpAsync(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+
+        # just enough SMTP to accept mails without authentication
+        writer.write(b"220 localhost SMTP sink\r\n")
+
+        while True:
+
+            line = await reader.readline()
+            command = line[:4].upper()
+
+            if not line or command == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                break
+
+            elif command == b"EHLO" or command == b"HELO":
+                writer.write(b"250 localhost\r\n")
+
+            elif command == b"DATA":
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+
+                while (await reader.readline()) not in [b".\r\n", b""]:
+                    pass
+
+                statistics["mails"] += 1
+                writer.write(b"250 OK\r\n")
+
+            else:
+                writer.write(b"250 OK\r\n")
+
+            await writer.drain()
+
+        writer.close()
+
+    async def ServeAsync():
+
+        app = web.Application()
+        app.router.add_get("/targets/{index}", GetTargetAsync)
+        app.router.add_post("/loki/api/v1/push", PushLokiAsync)
+        app.router.add_get("/statistics", GetStatisticsAsync)
+
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        await asyncio.start_server(HandleSmtpAsync, "127.0.0.1", smtpPort)
+        await asyncio.Event().wait()
+
+    asyncio.run(ServeAsync())
+
+def GetConfig(checks: int, federatedShare: float, pingShare: float, port: int, smtpPort: int, peerPort: int) -> str:
+
+    # the config in the format of the ConfigReader, one group per 50 checks
+    lines = [
+        "[notifiers]",
+        "id = loki",
+        "type = grafana-loki",
+        f"url = http://127.0.0.1:{port}/loki",
+        "labels = app=health-checker-benchmark",
+        "",
+        "id = mail",
+        "type = smtp",
+        "security = none",
+        "server = 127.0.0.1",
+        f"port = {smtpPort}",
+        "password = none",
+        "from = health-checker@localhost",
+        "to = admin@localhost",
+        "subject = Health-Check Report",
+        "",
+        "[checks]"
+    ]
+
+    federatedChecks = int(checks * federatedShare)
+    pingChecks = int(checks * pingShare)
+
+    for i in range(checks):
+
+        lines.append(f"group = Group {i // 50}")
+        lines.append("notifiers = loki, mail")
+
+        if i < federatedChecks:
+            lines.append("type = query-federated")
+            lines.append(f"url = http://127.0.0.1:{peerPort}")
+            lines.append(f"remote-identifier = check-{i}")
+            lines.append("max-age-minutes = 60")
+
+        elif i < federatedChecks + pingChecks:
+            lines.append("type = ping-v4")
+            lines.append("address = 127.0.0.1")
+            lines.append(f"name = Ping {i}")
+
+        else:
+            lines.append("type = http-get")
+            lines.append(f"url = http://127.0.0.1:{port}/targets/{i}")
+            lines.append("regex = is OK")
+
+        lines.append("")
+
+    return "\n".join(lines)
+
+def _getPeakRss() -> int:
+
+    if resource is None:
+        return None
+
+    # kilobytes on Linux, bytes on macOS
+    peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peakRss if platform.system() == "Darwin" else peakRss * 1024
+
+async def RunAsync(configFilePath: str, cycles: int, workers: int, statisticsUrl: str) -> Dict[str, object]:
+
+    logger = logging.getLogger("Benchmark")
+    metrics = Metrics()
+    cache = ResultCache(defaultTtl=86400)
+    pingEngine = PingEngine(logger)
+    httpClient = HttpClient(logger)
+    federationClient = FederationClient(httpClient, logger)
+    workerPool = WorkerPool(workers, logger) if workers > 0 else None
+    healthChecker = HealthChecker(cache, pingEngine, httpClient, federationClient, logger, metrics=metrics, workerPool=workerPool)
+    notifyManager = NotifyManager(httpClient, logger, metrics)
+    extensions = ExtensionRegistry(logger)
+    htmlWriter = HtmlWriter(os.path.join(tempfile.mkdtemp(), "index.html"), 15)
+
+    start = time.perf_counter()
+    extensions.Refresh()
+    config = ConfigReader().Read(configFilePath)
+    healthChecker.SetConfig(config, extensions)
+    notifyManager.SetConfig(config, extensions)
+    setupDuration = time.perf_counter() - start
+
+    cycleReports: List[Dict[str, object]] = []
+
+    for _ in range(cycles):
+
+        # the same steps as in Main.HealthCheck, but all checks run at once
+        stages = {}
+        cpuStart = time.process_time()
+        cycleStart = time.perf_counter()
+
+        start = time.perf_counter()
+        result = await healthChecker.CheckHealthAsync()
+        stages["check"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        filteredResult = Utils.ThrottleNotifications(result)
+        stages["throttle"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await notifyManager.NotifyAsync(filteredResult)
+        stages["notify"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await htmlWriter.WriteResultAsync(healthChecker.GetCheckResult())
+        stages["render"] = time.perf_counter() - start
+
+        checkResults = [checkResult for checkResults in result.values() for checkResult in checkResults]
+
+        cycleReports.append({
+            "cycleSeconds": round(time.perf_counter() - cycleStart, 4),
+            "cpuSeconds": round(time.process_time() - cpuStart, 4),
+            "stageSeconds": { stage: round(duration, 4) for (stage, duration) in stages.items() },
+            "checks": len(checkResults),
+            "errors": len([checkResult for checkResult in checkResults if checkResult.HasError]),
+            "notified": sum(len(checkResults) for checkResults in filteredResult.values())
+        })
+
+    # time per checker type, summed up over all cycles
+    checkerTypes = {}
+
+    for ((checkerType, _), histogram) in metrics.Histogram("healthchecker_check_duration_seconds", "The duration of the checks.", ("type", "group")).GetChildren():
+        (count, total) = checkerTypes.get(checkerType, (0, 0))
+        checkerTypes[checkerType] = (count + histogram.Count, total + histogram.Sum)
+
+    async with httpClient.Session.get(statisticsUrl) as response:
+        standInStatistics = await response.json()
+
+    await notifyManager.CloseAsync()
+    await httpClient.CloseAsync()
+
+    if workerPool is not None:
+        workerPool.Stop()
+
+    return {
+        "setupSeconds": round(setupDuration, 4),
+        "cycles": cycleReports,
+        "checkerTypes": { checkerType: { "checks": count, "meanSeconds": round(total / count, 6) } for (checkerType, (count, total)) in checkerTypes.items() },
+        "peakRssBytes": _getPeakRss(),
+        "standIns": standInStatistics
+    }
+
+def Main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checks", type=int, default=5000)
+    parser.add_argument("--cycles", type=int, default=3, help="Failed checks are notified when they fail twice in a row, so at least 2 cycles are required to measure notifications.")
+    parser.add_argument("--federated-share", type=float, default=0.3, help="The share of query-federated checks.")
+    parser.add_argument("--ping-share", type=float, default=0.0, help="The share of ping-v4 checks (requires permission to send ICMP echo requests).")
+    parser.add_argument("--latency-ms", type=float, default=20, help="The mean latency of the stand-in HTTP targets.")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="The share of stand-in HTTP targets which fail.")
+    parser.add_argument("--workers", type=int, default=0, help="The number of worker processes which run the checks (see --workers of Main.py).")
+    parser.add_argument("--port", type=int, default=18280, help="The first of three consecutive ports for the stand-ins.")
+    parser.add_argument("--output", type=str, default=None, help="The file to write the report to, in addition to stdout.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    # the extensions are loaded relative to the repository root
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    random.seed(0)
+
+    (port, smtpPort, peerPort) = (args.port, args.port + 1, args.port + 2)
+    federatedChecks = max(int(args.checks * args.federated_share), 1)
+    configFilePath = os.path.join(tempfile.mkdtemp(), "benchmark.conf")
+
+    with open(configFilePath, "w") as file:
+        file.write(GetConfig(args.checks, args.federated_share, args.ping_share, port, smtpPort, peerPort))
+
+    processes = [
+        multiprocessing.Process(target=ServeStandIns, args=(port, smtpPort, args.latency_ms / 1000, args.failure_rate), daemon=True),
+        multiprocessing.Process(target=ServeCherrypy, args=(peerPort, federatedChecks), daemon=True)
+    ]
+
+    for process in processes:
+        process.start()
+
+    try:
+        asyncio.run(WaitForServerAsync(f"http://127.0.0.1:{port}/statistics"))
+        asyncio.run(WaitForServerAsync(f"http://127.0.0.1:{peerPort}/api/checkresults/check-0"))
+        report = asyncio.run(RunAsync(configFilePath, args.cycles, args.workers, f"http://127.0.0.1:{port}/statistics"))
+
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+    report = {
+        "parameters": vars(args),
+        "python": platform.python_version(),
+        **report
+    }
+
+    output = json.dumps(report, indent=4)
+    print(output)
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            file.write(output)
+
+if __name__ == "__main__":
+    Main()
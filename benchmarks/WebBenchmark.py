@@ -0,0 +1,151 @@
+# Compares the request throughput and latency of the cherrypy and the aiohttp web server mode.
+#
+# usage: python benchmarks/WebBenchmark.py [--requests 5000] [--concurrency 50]
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import aiohttp
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.BaseTypes import CheckResult, CheckResultType
+from src.CheckResultApi import CheckResultApi
+from src.ResultCache import ResultCache
+
+
+def _getCache(count: int) -> ResultCache:
+
+    cache = ResultCache()
+
+    for i in range(count):
+        cache[f"check-{i}"] = CheckResult(f"Check {i}", CheckResultType.Success, "Everything is fine.", None, [])
+
+    return cache
+
+def ServeCherrypy(port: int, count: int):
+
+    import cherrypy
+
+    from src.Web import API
+
+    logger = logging.getLogger("Benchmark")
+    api = CheckResultApi(_getCache(count), logger)
+
+    apiConfig = {
+        "/": {
+            "request.dispatch": cherrypy.dispatch.MethodDispatcher()
+        }
+    }
+
+    cherrypy.tree.mount(API(api, logger), "/api/checkresults", apiConfig)
+
+    cherrypy.config.update({
+        "engine.autoreload.on" : False,
+        "log.screen": False,
+        "server.socket_host": "127.0.0.1",
+        "server.socket_port": port
+    })
+
+    cherrypy.engine.start()
+    cherrypy.engine.block()
+
+def ServeAiohttp(port: int, count: int):
+
+    from src.AsyncWeb import AsyncWeb
+    from src.HtmlWriter import HtmlWriter
+
+    async def ServeAsync():
+        logger = logging.getLogger("Benchmark")
+        api = CheckResultApi(_getCache(count), logger, asyncio.get_running_loop())
+        htmlWriter = HtmlWriter(os.path.join(tempfile.gettempdir(), "health-checker-benchmark.html"), 15)
+        await AsyncWeb("127.0.0.1", port, htmlWriter, api, logger).StartAsync()
+        await asyncio.Event().wait()
+
+    asyncio.run(ServeAsync())
+
+async def WaitForServerAsync(url: str):
+
+    async with aiohttp.ClientSession() as session:
+
+        for _ in range(100):
+
+            try:
+                async with session.get(url) as response:
+                    return
+
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+
+    raise Exception(f"The server at {url} did not start.")
+
+async def _loadAsync(port: int, count: int, requests: int, concurrency: int) -> Dict[str, float]:
+
+    baseUrl = f"http://127.0.0.1:{port}/api/checkresults"
+    await WaitForServerAsync(f"{baseUrl}/check-0")
+
+    latencies: List[float] = []
+    counter = iter(range(requests))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def WorkerAsync():
+            for i in counter:
+                start = time.perf_counter()
+
+                async with session.get(f"{baseUrl}/check-{i % count}") as response:
+                    await response.read()
+
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[WorkerAsync() for _ in range(concurrency)])
+        duration = time.perf_counter() - start
+
+    latencies.sort()
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "requestsPerSecond": round(requests / duration, 1),
+        "p50LatencyMs": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p99LatencyMs": round(latencies[int(len(latencies) * 0.99)] * 1000, 3)
+    }
+
+def Main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--results", type=int, default=1000, help="The number of cached check results.")
+    parser.add_argument("--port", type=int, default=18180)
+    args = parser.parse_args()
+
+    report = {}
+
+    # the server runs in its own process so that the load generator does not compete for the GIL
+    for (mode, serve) in [("cherrypy", ServeCherrypy), ("aiohttp", ServeAiohttp)]:
+
+        process = multiprocessing.Process(target=serve, args=(args.port, args.results), daemon=True)
+        process.start()
+
+        try:
+            report[mode] = asyncio.run(_loadAsync(args.port, args.results, args.requests, args.concurrency))
+
+        finally:
+            process.terminate()
+            process.join()
+
+    print(json.dumps(report, indent=4))
+
+if __name__ == "__main__":
+    Main()
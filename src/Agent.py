@@ -0,0 +1,158 @@
+import asyncio
+import json
+from logging import Logger
+from typing import Dict, List
+from urllib.parse import quote
+
+from aiohttp import ClientTimeout
+
+from .CheckResultApi import CheckResultApi
+from .ExtensionRegistry import ExtensionRegistry
+from .FederationClient import FederationClient
+from .HealthChecker import HealthChecker
+from .HttpClient import HttpClient
+from .PingEngine import PingEngine
+from .ResultCache import ResultCache
+from .Scheduler import Scheduler
+from .WorkerPool import WorkerPool
+
+
+class Agent:
+
+    CoordinatorUrl: str
+    AgentId: str
+    Token: str
+    Jitter: float
+    CycleDeadline: float
+    Workers: int
+    Logger: Logger
+
+    BatchSize: int = 1000
+    BatchDelay: float = 1
+    RetryDelay: float = 5
+    RequestTimeout: float = 30
+
+    def __init__(self, coordinatorUrl: str, agentId: str, token: str, jitter: float, cycleDeadline: float, workers: int, logger: Logger):
+        self.CoordinatorUrl = coordinatorUrl.rstrip("/")
+        self.AgentId = agentId
+        self.Token = token
+        self.Jitter = jitter
+        self.CycleDeadline = cycleDeadline
+        self.Workers = workers
+        self.Logger = logger
+
+    async def RunAsync(self):
+
+        httpClient = HttpClient(self.Logger)
+        federationClient = FederationClient(httpClient, self.Logger)
+        workerPool = WorkerPool(self.Workers, self.Logger, self.CycleDeadline) if self.Workers > 0 else None
+        healthChecker = HealthChecker(ResultCache(), PingEngine(self.Logger), httpClient, federationClient, self.Logger, self.CycleDeadline, workerPool=workerPool)
+        extensions = ExtensionRegistry(self.Logger)
+        agentUrl = f"{self.CoordinatorUrl}/api/agents/{quote(self.AgentId, safe='')}"
+        timeout = ClientTimeout(total=self.RequestTimeout)
+        headers = { CheckResultApi.AgentTokenHeader: self.Token }
+
+        # the latest result per check which has not been sent yet
+        pending: Dict[str, list] = {}
+        resultsAvailable = asyncio.Event()
+
+        # the coordinator provides the checks, their default interval and the heartbeat interval
+        version = None
+        checks = {}
+        checkInterval = 60
+        heartbeatSeconds = self.RetryDelay
+        scheduler = Scheduler(checkInterval, self.Jitter, self.Logger)
+        healthChecker.RunRequested = scheduler.Trigger
+
+        async def HeartbeatAsync():
+
+            nonlocal version, checks, checkInterval, heartbeatSeconds
+
+            try:
+                while True:
+
+                    try:
+
+                        extensionsChanged = extensions.Refresh()
+
+                        async with httpClient.Session.post(agentUrl, data=json.dumps({ "version": version }), headers=headers, timeout=timeout, raise_for_status=True) as response:
+                            assignment = await response.json()
+
+                        heartbeatSeconds = assignment["heartbeatSeconds"]
+                        assignmentChanged = "checks" in assignment
+
+                        if assignmentChanged:
+                            version = assignment["version"]
+                            checks = assignment["checks"]
+                            checkInterval = assignment["checkInterval"]
+                            self.Logger.info(f"Received {len(checks)} checks from the coordinator (version {version}).")
+
+                        if assignmentChanged or extensionsChanged:
+                            healthChecker.SetChecks(checks, extensions)
+                            scheduler.SetChecks(healthChecker.GetIntervals(checkInterval), healthChecker.GetBatchKeys())
+
+                    # the assigned checks keep running while the coordinator is not reachable
+                    except Exception as ex:
+                        self.Logger.warning(f"Unable to reach the coordinator at {self.CoordinatorUrl} ({type(ex).__name__}: {ex}).")
+
+                    await asyncio.sleep(heartbeatSeconds)
+
+            # let the coordinator rebalance the checks right away when the agent is stopped (e.g. Ctrl+C)
+            except asyncio.CancelledError:
+
+                try:
+                    async with httpClient.Session.delete(agentUrl, headers=headers, timeout=ClientTimeout(total=2)) as response:
+                        await response.read()
+
+                except Exception:
+                    pass
+
+                raise
+
+        async def RunChecksAsync(keys: List[str]):
+
+            self.Logger.info(f"Check health ({len(keys)} checks).")
+
+            for (key, result, duration) in await healthChecker.ExecuteChecksAsync(keys):
+                pending[key] = [key, result.Name, result.ResultType.value, result.Message, result.InfoUrl, list(result.Notifiers), result.Timestamp, duration]
+
+            resultsAvailable.set()
+
+        async def SendResultsAsync():
+
+            while True:
+
+                await resultsAvailable.wait()
+
+                # the results of checks which finish shortly after each other are sent together
+                await asyncio.sleep(self.BatchDelay)
+                resultsAvailable.clear()
+
+                while any(pending):
+
+                    batch = list(pending.values())[:self.BatchSize]
+
+                    try:
+                        async with httpClient.Session.post(f"{agentUrl}/results", data=json.dumps({ "results": batch }), headers=headers, timeout=timeout, raise_for_status=True) as response:
+                            report = await response.json()
+
+                    except Exception as ex:
+                        self.Logger.warning(f"Unable to send {len(batch)} check results to the coordinator at {self.CoordinatorUrl} ({type(ex).__name__}: {ex}), retry in {self.RetryDelay:g} s.")
+                        await asyncio.sleep(self.RetryDelay)
+                        continue
+
+                    # newer results which have arrived in the meantime are kept
+                    for values in batch:
+                        if pending.get(values[0]) is values:
+                            del pending[values[0]]
+
+                    self.Logger.info(f"Sent {len(batch)} check results to the coordinator ({report['accepted']} accepted).")
+
+        try:
+            await asyncio.gather(HeartbeatAsync(), scheduler.RunAsync(RunChecksAsync), SendResultsAsync())
+
+        finally:
+            if workerPool is not None:
+                workerPool.Stop()
+
+            await httpClient.CloseAsync()
@@ -0,0 +1,178 @@
+import hmac
+import time
+import uuid
+from logging import Logger
+from typing import Callable, Dict, List, Set, Tuple
+
+from .BaseTypes import CheckResult
+from .HashRing import HashRing
+
+
+class Agent:
+    Id: str
+    LastSeen: float
+    Version: str
+    Checks: Dict[str, Dict[str, str]]
+
+    def __init__(self, id: str):
+        self.Id = id
+        self.LastSeen = 0
+        self.Version = None
+        self.Checks = {}
+
+class AgentRegistry:
+
+    Epoch: str
+    Timeout: float
+    Token: str
+    CheckInterval: float
+    Agents: Dict[str, Agent]
+    Logger: Logger
+    AssignmentChanged: Callable[[], None]
+    ResultsReceived: Callable[[Dict[str, Tuple[CheckResult, float]]], None]
+
+    def __init__(self, timeout: float, token: str, logger: Logger):
+
+        # the epoch distinguishes the assignment versions of different processes
+        self.Epoch = uuid.uuid4().hex[:8]
+        self.Timeout = timeout
+        self.Token = token
+        self.CheckInterval = None
+        self.Agents = {}
+        self.Logger = logger
+        self.AssignmentChanged = None
+        self.ResultsReceived = None
+
+        self._ring: HashRing = HashRing()
+        self._checks: Dict[str, Dict[str, str]] = {}
+        self._assignedKeys: Dict[str, str] = {}
+        self._version: int = 0
+
+    @property
+    def HeartbeatSeconds(self) -> float:
+        # an agent is only removed after it has missed several heartbeats
+        return self.Timeout / 3
+
+    def IsAuthorized(self, token: str) -> bool:
+
+        # constant time comparison, so the token cannot be guessed from the response times
+        if token is None:
+            return False
+
+        return hmac.compare_digest(token.encode(), self.Token.encode())
+
+    def SetChecks(self, checks: Dict[str, Dict[str, str]], checkInterval: float):
+        self._checks = checks
+        self.CheckInterval = checkInterval
+        self._distribute()
+
+    def GetAssignedKeys(self) -> Set[str]:
+        return set(self._assignedKeys)
+
+    def GetAgents(self) -> List[Dict[str, object]]:
+
+        now = time.monotonic()
+
+        return [{ "id": agent.Id, "checks": len(agent.Checks), "lastSeenSeconds": round(now - agent.LastSeen, 1) } for agent in self.Agents.values()]
+
+    def Heartbeat(self, agentId: str, version: str) -> Dict[str, object]:
+
+        agent = self.Agents.get(agentId)
+
+        # an unknown agent is registered and immediately gets a share of the checks
+        if agent is None:
+            agent = Agent(agentId)
+            self.Agents[agentId] = agent
+            self._ring.Add(agentId)
+            self.Logger.info(f"Agent {agentId} has registered, rebalance the checks across {len(self.Agents)} agents.")
+            self._distribute()
+            self._onAssignmentChanged()
+
+        agent.LastSeen = time.monotonic()
+
+        response = {
+            "version": agent.Version,
+            "heartbeatSeconds": self.HeartbeatSeconds,
+            "checkInterval": self.CheckInterval
+        }
+
+        # the checks are only sent when the assignment of the agent has changed
+        if version != agent.Version:
+            response["checks"] = agent.Checks
+
+        return response
+
+    def Unregister(self, agentId: str) -> bool:
+
+        if agentId not in self.Agents:
+            return False
+
+        self.Logger.info(f"Agent {agentId} has unregistered, rebalance the checks across {len(self.Agents) - 1} agents.")
+        self._remove([agentId])
+
+        return True
+
+    def AddResults(self, agentId: str, timedResults: Dict[str, Tuple[CheckResult, float]]) -> int:
+
+        agent = self.Agents.get(agentId)
+
+        if agent is None:
+            return 0
+
+        agent.LastSeen = time.monotonic()
+
+        # results of checks which have been moved to another agent in the meantime are ignored
+        timedResults = {key: timedResult for (key, timedResult) in timedResults.items() if self._assignedKeys.get(key) == agentId}
+
+        if any(timedResults) and self.ResultsReceived is not None:
+            self.ResultsReceived(timedResults)
+
+        return len(timedResults)
+
+    def RemoveExpired(self):
+
+        deadline = time.monotonic() - self.Timeout
+        expiredIds = [agent.Id for agent in self.Agents.values() if agent.LastSeen < deadline]
+
+        if any(expiredIds):
+            self.Logger.warning(f"Agents {', '.join(expiredIds)} have not been seen for {self.Timeout:g} s, rebalance the checks across {len(self.Agents) - len(expiredIds)} agents.")
+            self._remove(expiredIds)
+
+    def _remove(self, agentIds: List[str]):
+
+        for agentId in agentIds:
+            del self.Agents[agentId]
+            self._ring.Remove(agentId)
+
+        self._distribute()
+        self._onAssignmentChanged()
+
+    def _distribute(self):
+
+        # consistent hashing of the check keys, so only the checks of agents which have joined or left move
+        shards = {agentId: {} for agentId in self.Agents}
+        assignedKeys = {}
+
+        for (key, settings) in self._checks.items():
+
+            agentId = self._ring.GetNode(key)
+
+            if agentId is not None:
+                shards[agentId][key] = settings
+                assignedKeys[key] = agentId
+
+        for (agentId, shard) in shards.items():
+
+            agent = self.Agents[agentId]
+
+            if agent.Version is None or shard != agent.Checks:
+                self._version += 1
+                agent.Version = f"{self.Epoch}-{self._version}"
+                agent.Checks = shard
+
+        self._assignedKeys = assignedKeys
+
+    def _onAssignmentChanged(self):
+
+        if self.AssignmentChanged is not None:
+            self.AssignmentChanged()
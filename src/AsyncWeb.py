@@ -0,0 +1,262 @@
+import asyncio
+from logging import Logger
+from typing import Callable, Set
+
+from aiohttp import web
+
+from .CheckResultApi import ApiError, ApiResponse, CheckResultApi, CheckResultSubscription
+from .HtmlWriter import HtmlWriter
+
+
+class AsyncWeb:
+
+    Host: str
+    Port: int
+    HtmlWriter: HtmlWriter
+    Api: CheckResultApi
+    Logger: Logger
+
+    def __init__(self, host: str, port: int, htmlWriter: HtmlWriter, api: CheckResultApi, logger: Logger):
+        self.Host = host
+        self.Port = port
+        self.HtmlWriter = htmlWriter
+        self.Api = api
+        self.Logger = logger
+
+        self._runner: web.AppRunner = None
+        self._streamTasks: Set[asyncio.Task] = set()
+
+    async def StartAsync(self):
+
+        app = web.Application()
+        app.router.add_get("/", self._getIndexAsync)
+        app.router.add_static("/static", "./src/wwwroot/")
+        app.router.add_get("/api/checkresults", self._getCheckResultsAsync)
+        app.router.add_get("/api/checkresults/{identifier:.+}", self._getCheckResultAsync)
+        app.router.add_post("/api/checkresults", self._postCheckResultAsync)
+        app.router.add_get("/api/stream", self._getStreamAsync)
+        app.router.add_get("/live", self._getLiveAsync)
+        app.router.add_get("/api/dashboard", self._getDashboardAsync)
+        app.router.add_get("/api/dashboard/stream", self._getDashboardStreamAsync)
+        app.router.add_get("/api/history", self._getHistoryAsync)
+        app.router.add_get("/metrics", self._getMetricsAsync)
+        app.router.add_get("/api/agents", self._getAgentsAsync)
+        app.router.add_post("/api/agents/{agentId}", self._postAgentHeartbeatAsync)
+        app.router.add_post("/api/agents/{agentId}/results", self._postAgentResultsAsync)
+        app.router.add_delete("/api/agents/{agentId}", self._deleteAgentAsync)
+        app.on_shutdown.append(self._closeStreamsAsync)
+
+        # the server runs on the event loop of the health checker, which is therefore the only owner of the cache
+        self.Logger.info(f"Starting web server on address {self.Host}:{self.Port}.")
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.Host, self.Port).start()
+
+    async def StopAsync(self):
+
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _getIndexAsync(self, request: web.Request) -> web.StreamResponse:
+
+        # the page and its compressed variants are prepared by the html writer
+        page = self.HtmlWriter.Page
+        (content, encoding) = page.GetContent(request.headers.get("Accept-Encoding"))
+        headers = { "Content-Type": "text/html; charset=utf-8", "Vary": "Accept-Encoding", "ETag": page.ETag }
+
+        if request.headers.get("If-None-Match") == page.ETag:
+            return web.Response(status=304, headers=headers)
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+
+        return web.Response(body=content, headers=headers)
+
+    async def _getCheckResultAsync(self, request: web.Request) -> web.StreamResponse:
+
+        try:
+            response = self.Api.GetCheckResult(request.match_info["identifier"], request.headers.get("If-None-Match"))
+
+        except ApiError as ex:
+            return web.Response(status=ex.Status, text=ex.Message)
+
+        return self._toResponse(response)
+
+    async def _getCheckResultsAsync(self, request: web.Request) -> web.StreamResponse:
+
+        try:
+            response = self.Api.GetCheckResults(
+                request.query.getall("id", None),
+                request.query.get("prefix"),
+                request.query.get("format", "json"),
+                request.query.get("since"),
+                request.headers.get("If-None-Match"))
+
+        except ApiError as ex:
+            return web.Response(status=ex.Status, text=ex.Message)
+
+        return self._toResponse(response)
+
+    async def _postCheckResultAsync(self, request: web.Request) -> web.StreamResponse:
+
+        # bulk ingestion, the body is processed line by line while it is received
+        if request.content_type == "application/x-ndjson":
+
+            ingest = self.Api.IngestCheckResults()
+
+            try:
+                async for line in request.content:
+                    ingest.Add(line)
+
+            except ValueError as ex:
+                return web.Response(status=400, text=f"Unable to read the request body ({ex}).")
+
+            return self._toResponse(ingest.Complete())
+
+        try:
+            self.Api.PostCheckResult(await request.read())
+
+        except ApiError as ex:
+            return web.Response(status=ex.Status, text=ex.Message)
+
+        return web.Response()
+
+    async def _getLiveAsync(self, request: web.Request) -> web.StreamResponse:
+        # the static shell of the live dashboard is cached by the browsers
+        return web.FileResponse("./src/wwwroot/live.html", headers={"Content-Type": "text/html"})
+
+    async def _getDashboardAsync(self, request: web.Request) -> web.StreamResponse:
+
+        try:
+            response = self.Api.GetDashboard(request.headers.get("If-None-Match"))
+
+        except ApiError as ex:
+            return web.Response(status=ex.Status, text=ex.Message)
+
+        return self._toResponse(response)
+
+    async def _getHistoryAsync(self, request: web.Request) -> web.StreamResponse:
+
+        # the history files are scanned by a worker thread
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(None, self.Api.GetHistory, request.query.get("check"), request.query.get("days", "7"))
+
+        except ApiError as ex:
+            return web.Response(status=ex.Status, text=ex.Message)
+
+        return self._toResponse(response)
+
+    async def _getMetricsAsync(self, request: web.Request) -> web.StreamResponse:
+
+        try:
+            response = self.Api.GetMetrics()
+
+        except ApiError as ex:
+            return web.Response(status=ex.Status, text=ex.Message)
+
+        return self._toResponse(response)
+
+    async def _getAgentsAsync(self, request: web.Request) -> web.StreamResponse:
+
+        try:
+            response = self.Api.GetAgents(request.headers.get(CheckResultApi.AgentTokenHeader))
+
+        except ApiError as ex:
+            return web.Response(status=ex.Status, text=ex.Message)
+
+        return self._toResponse(response)
+
+    async def _postAgentHeartbeatAsync(self, request: web.Request) -> web.StreamResponse:
+
+        try:
+            response = self.Api.PostAgentHeartbeat(request.match_info["agentId"], request.headers.get(CheckResultApi.AgentTokenHeader), await request.read())
+
+        except ApiError as ex:
+            return web.Response(status=ex.Status, text=ex.Message)
+
+        return self._toResponse(response)
+
+    async def _postAgentResultsAsync(self, request: web.Request) -> web.StreamResponse:
+
+        try:
+            response = self.Api.PostAgentResults(request.match_info["agentId"], request.headers.get(CheckResultApi.AgentTokenHeader), await request.read())
+
+        except ApiError as ex:
+            return web.Response(status=ex.Status, text=ex.Message)
+
+        return self._toResponse(response)
+
+    async def _deleteAgentAsync(self, request: web.Request) -> web.StreamResponse:
+
+        try:
+            self.Api.DeleteAgent(request.match_info["agentId"], request.headers.get(CheckResultApi.AgentTokenHeader))
+
+        except ApiError as ex:
+            return web.Response(status=ex.Status, text=ex.Message)
+
+        return web.Response()
+
+    async def _getStreamAsync(self, request: web.Request) -> web.StreamResponse:
+        return await self._streamAsync(request, self.Api.Subscribe)
+
+    async def _getDashboardStreamAsync(self, request: web.Request) -> web.StreamResponse:
+        return await self._streamAsync(request, self.Api.SubscribeDashboard)
+
+    async def _streamAsync(self, request: web.Request, subscribe: Callable[..., CheckResultSubscription]) -> web.StreamResponse:
+
+        # browsers resume an event stream with the id of the last event, which is newer than the initial since parameter
+        since = request.headers.get("Last-Event-ID", request.query.get("since"))
+        wakeUpEvent = asyncio.Event()
+        task = asyncio.current_task()
+
+        try:
+            subscription = subscribe(request.query.getall("id", None), request.query.get("prefix"), request.query.get("format", "sse"), since, wakeUpEvent.set)
+
+        except ApiError as ex:
+            return web.Response(status=ex.Status, text=ex.Message)
+
+        self._streamTasks.add(task)
+
+        try:
+            response = web.StreamResponse(headers={ "Content-Type": subscription.ContentType, "Cache-Control": "no-cache" })
+            await response.prepare(request)
+            await response.write(subscription.GetInitialEvents())
+
+            while True:
+
+                try:
+                    await asyncio.wait_for(wakeUpEvent.wait(), self.Api.HeartbeatSeconds)
+                except asyncio.TimeoutError:
+                    pass
+
+                wakeUpEvent.clear()
+                await response.write(subscription.GetEvents())
+
+        except ConnectionResetError:
+            pass
+
+        finally:
+            subscription.Close()
+            self._streamTasks.discard(task)
+
+        return response
+
+    async def _closeStreamsAsync(self, app: web.Application):
+
+        # streams never end by themselves, so they would delay the shutdown
+        for task in list(self._streamTasks):
+            task.cancel()
+
+    def _toResponse(self, response: ApiResponse) -> web.Response:
+
+        if response.Status == 304:
+            return web.Response(status=304, headers=response.Headers)
+
+        headers = dict(response.Headers)
+
+        # the content type might have parameters (e.g. the version of the metrics format), which aiohttp does not accept as content_type
+        if response.ContentType is not None:
+            headers["Content-Type"] = response.ContentType
+
+        return web.Response(status=response.Status, body=response.Body, headers=headers)
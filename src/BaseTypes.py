@@ -1,7 +1,10 @@
+import asyncio
+import sys
+import time
 from abc import ABC, abstractmethod
 from datetime import date, datetime, timezone
 from enum import Enum
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 
 class Config:
@@ -16,41 +19,83 @@ class CheckResultType(Enum):
     Success = 1
     Warning = 2
     Error = 3
+    Timeout = 4
+
+# wall clock time derived from the monotonic clock, which is cheaper than creating datetimes
+_clockOffset: float = time.time() - time.monotonic()
+
+# the notifier lists of all results of a checker are shared
+_notifiers: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+def GetTimestamp() -> float:
+    return time.monotonic() + _clockOffset
 
 class CheckResult:
     Name: str
     ResultType: CheckResultType
     Message: str
     InfoUrl: str
-    Notifiers: List[str]
-    Created: datetime
+    Notifiers: Tuple[str, ...]
+    Timestamp: float
 
-    def __init__(self, name: str, resultType: CheckResultType, message: str, infoUrl: str, notifiers: List[str]):
-        self.Name = name
-        self.ResultType = resultType
-        self.Message = message
-        self.InfoUrl = infoUrl
-        self.Notifiers = notifiers
-        self.Created = datetime.utcnow().replace(tzinfo=timezone.utc)
+    # results are immutable and without __dict__ because many thousands of them are kept in the caches
+    __slots__ = ("Name", "ResultType", "Message", "InfoUrl", "Notifiers", "Timestamp")
+
+    def __init__(self, name: str, resultType: CheckResultType, message: str, infoUrl: str, notifiers: List[str], timestamp: float = None):
+
+        notifiers = tuple(notifiers)
+
+        setValue = object.__setattr__
+        setValue(self, "Name", sys.intern(name) if type(name) is str else name)
+        setValue(self, "ResultType", resultType)
+        setValue(self, "Message", message)
+        setValue(self, "InfoUrl", infoUrl)
+        setValue(self, "Notifiers", _notifiers.setdefault(notifiers, notifiers))
+        setValue(self, "Timestamp", GetTimestamp() if timestamp is None else timestamp)
+
+    def __setattr__(self, name: str, value):
+        raise AttributeError("The check result is immutable.")
+
+    def __delattr__(self, name: str):
+        raise AttributeError("The check result is immutable.")
+
+    def __reduce__(self):
+        return (CheckResult, (self.Name, self.ResultType, self.Message, self.InfoUrl, self.Notifiers, self.Timestamp))
+
+    @property
+    def Created(self) -> datetime:
+        return datetime.fromtimestamp(self.Timestamp, timezone.utc)
 
     @property
     def AgeMinutes(self):
-        return (datetime.utcnow().replace(tzinfo=timezone.utc) - self.Created).total_seconds()/60
+        return (GetTimestamp() - self.Timestamp) / 60
 
     @property
     def HasError(self):
-        return self.ResultType == CheckResultType.Error
+        return self.ResultType == CheckResultType.Error or self.ResultType == CheckResultType.Timeout
+
+    @property
+    def IsTimeout(self):
+        return self.ResultType == CheckResultType.Timeout
 
 class Checker(ABC):
 
+    DefaultTimeoutSeconds: float = 30
     InfoUrl: str
     Notifiers: List[str]
     Settings: Dict[str, str]
+    TimeoutSeconds: float
 
     def __init__(self, settings: Dict[str, str]):
 
         self.Settings = settings
 
+        # timeout
+        if "timeout-seconds" in settings:
+            self.TimeoutSeconds = float(settings["timeout-seconds"])
+        else:
+            self.TimeoutSeconds = self.DefaultTimeoutSeconds
+
         # url
         if "info-url" in settings:
             self.InfoUrl = settings["info-url"]
@@ -72,10 +117,24 @@ class Checker(ABC):
 
     def Error(self, message: str) -> CheckResult:
         return CheckResult(self.GetName(), CheckResultType.Error, message, self.InfoUrl, self.Notifiers)
+
+    def Timeout(self, message: str = None) -> CheckResult:
+
+        if message is None:
+            message = f"The check timed out after {self.TimeoutSeconds:g} s."
+
+        try:
+            name = self.GetName()
+        except Exception:
+            name = "Failed check"
+
+        return CheckResult(name, CheckResultType.Timeout, message, self.InfoUrl, self.Notifiers)
     
     async def GetCheckResultAsync(self) -> CheckResult:
         try:
-            return await self.DoCheckAsync()
+            return await asyncio.wait_for(self.DoCheckAsync(), self.TimeoutSeconds)
+        except asyncio.TimeoutError:
+            return self.Timeout()
         except Exception as ex:
 
             try:
@@ -84,6 +143,10 @@ class Checker(ABC):
             except Exception as ex2:
                 return CheckResult("Failed check", CheckResultType.Error, str(ex2), self.InfoUrl, self.Notifiers)
 
+    def GetBatchKey(self) -> str:
+        # checks with the same batch key (and interval) are scheduled together
+        return None
+
     @abstractmethod
     def GetName(self) -> str:
         pass
@@ -108,15 +171,29 @@ class DefaultChecker(Checker):
 
 class Notifier(ABC):
 
+    DefaultTimeoutSeconds: float = 60
     Id: str
+    TimeoutSeconds: float
 
     def __init__(self, settings: Dict[str, str]):
         self.Id = settings["id"]
 
+        if "timeout-seconds" in settings:
+            self.TimeoutSeconds = float(settings["timeout-seconds"])
+        else:
+            self.TimeoutSeconds = self.DefaultTimeoutSeconds
+
     @abstractmethod
     async def NotifyAsync(self):
         pass
 
+    async def FlushAsync(self):
+        pass
+
+    # called when the notifier is removed or replaced (e.g. on config reload) and when the app is stopped
+    async def CloseAsync(self):
+        pass
+
 class NotificationState():
     RunId: str
     Date: date
@@ -0,0 +1,619 @@
+import asyncio
+import concurrent.futures
+import json
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from logging import Logger
+from typing import Callable, Dict, List, Set, Tuple
+
+from .AgentRegistry import AgentRegistry
+from .BaseTypes import CheckResult, CheckResultType
+from .Dashboard import Dashboard
+from .HistoryStore import HistoryStore
+from .Metrics import Metrics
+from .ResultCache import ResultCache
+
+
+class ApiError(Exception):
+    Status: int
+    Message: str
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.Status = status
+        self.Message = message
+
+class ApiResponse:
+    Status: int
+    Body: bytes
+    ContentType: str
+    Headers: Dict[str, str]
+
+    def __init__(self, status: int, body: bytes = b"", contentType: str = None, headers: Dict[str, str] = None):
+        self.Status = status
+        self.Body = body
+        self.ContentType = contentType
+        self.Headers = headers if headers is not None else {}
+
+class CheckResultSubscription:
+    Identifiers: Set[str]
+    Prefix: str
+    Format: str
+    ContentType: str
+
+    def __init__(self, cache: ResultCache, toDict: Callable[[str, CheckResult], Dict[str, object]], identifiers: List[str], prefix: str, format: str, since: str, wakeUp: Callable[[], None]):
+        self.Identifiers = set(identifiers) if identifiers is not None and any(identifiers) else None
+        self.Prefix = prefix
+        self.Format = format
+        self.ContentType = "text/event-stream" if format == "sse" else "application/x-ndjson"
+
+        self._cache = cache
+        self._toDict = toDict
+        self._since = since
+        self._wakeUp = wakeUp
+
+        # identifiers which have been modified since the last events, multiple modifications are sent only once
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+
+        cache.AddListener(self._onModified)
+
+    def GetInitialEvents(self) -> bytes:
+
+        cache = self._cache
+        validator = cache.GetValidator()
+
+        # continue where a previous subscription has stopped, if possible
+        if self._since is not None:
+            (incremental, modifiedIdentifiers, removedIdentifiers) = cache.GetChangesSince(cache.GetGeneration(self._since))
+
+        else:
+            (incremental, modifiedIdentifiers, removedIdentifiers) = (False, list(cache.keys()), [])
+
+        modifiedIdentifiers = [identifier for identifier in modifiedIdentifiers if self._isSubscribed(identifier)]
+        removedIdentifiers = [identifier for identifier in removedIdentifiers if self._isSubscribed(identifier)]
+
+        return self._getEvents(validator, modifiedIdentifiers, removedIdentifiers, incremental)
+
+    def GetEvents(self) -> bytes:
+
+        validator = self._cache.GetValidator()
+
+        with self._lock:
+            pending = self._pending
+            self._pending = set()
+
+        # without pending modifications, the generation marker serves as heartbeat
+        return self._getEvents(validator, pending, [], True)
+
+    def Close(self):
+        self._cache.RemoveListener(self._onModified)
+
+    def _onModified(self, identifier: str):
+
+        if not self._isSubscribed(identifier):
+            return
+
+        with self._lock:
+            self._pending.add(identifier)
+
+        self._wakeUp()
+
+    def _isSubscribed(self, identifier: str) -> bool:
+        return (self.Identifiers is None or identifier in self.Identifiers) and (self.Prefix is None or identifier.startswith(self.Prefix))
+
+    def _getEvents(self, validator: str, identifiers: List[str], removedIdentifiers: List[str], incremental: bool) -> bytes:
+
+        events = []
+
+        for identifier in identifiers:
+
+            checkResult = self._cache.get(identifier)
+
+            if checkResult is None:
+                events.append(("removed", { "identifier": identifier, "removed": True }))
+
+            else:
+                events.append(("result", self._toDict(identifier, checkResult)))
+
+        for identifier in removedIdentifiers:
+            events.append(("removed", { "identifier": identifier, "removed": True }))
+
+        # the generation marker closes a batch of events and allows to resume the subscription later
+        events.append(("generation", { "generation": validator, "incremental": incremental }))
+
+        if self.Format == "sse":
+            lines = [f"event: {event}\ndata: {json.dumps(data)}\n\n" for (event, data) in events[:-1]]
+            lines.append(f"id: {validator}\nevent: generation\ndata: {json.dumps(events[-1][1])}\n\n")
+
+        else:
+            lines = [json.dumps(data) + "\n" for (_, data) in events]
+
+        return "".join(lines).encode('utf8')
+
+class CheckResultIngest:
+    Accepted: int
+    Rejected: int
+    Errors: List[Dict[str, object]]
+    MaxErrors: int = 100
+
+    def __init__(self, parse: Callable[[object], Tuple[str, CheckResult, float]], apply: Callable[[List[Tuple[str, CheckResult, float]]], None], batchSize: int, logger: Logger):
+        self.Accepted = 0
+        self.Rejected = 0
+        self.Errors = []
+
+        self._parse = parse
+        self._apply = apply
+        self._batchSize = batchSize
+        self._logger = logger
+        self._lineNumber = 0
+        self._batch: List[Tuple[str, CheckResult, float]] = []
+
+    def Add(self, line: bytes):
+
+        self._lineNumber += 1
+
+        if not line.strip():
+            return
+
+        # invalid records are reported and skipped, all others are accepted
+        try:
+            try:
+                checkResultJson = json.loads(line)
+            except ValueError:
+                raise ApiError(400, "The line is not valid JSON.")
+
+            self._batch.append(self._parse(checkResultJson))
+            self.Accepted += 1
+
+        except ApiError as ex:
+
+            self.Rejected += 1
+
+            if len(self.Errors) < self.MaxErrors:
+                self.Errors.append({ "line": self._lineNumber, "error": ex.Message })
+
+        # the cache is modified in batches instead of per record
+        if len(self._batch) >= self._batchSize:
+            self._flush()
+
+    def Complete(self) -> ApiResponse:
+
+        self._flush()
+        self._logger.info(f"Fill cache with {self.Accepted} check results received via bulk POST ({self.Rejected} rejected).")
+
+        body = json.dumps({
+            "accepted": self.Accepted,
+            "rejected": self.Rejected,
+            "errors": self.Errors
+        })
+
+        return ApiResponse(200, body.encode('utf8'), "application/json")
+
+    def _flush(self):
+
+        if any(self._batch):
+            self._apply(self._batch)
+            self._batch = []
+
+class CheckResultApi:
+
+    Cache: ResultCache
+    Dashboard: Dashboard
+    History: HistoryStore
+    Metrics: Metrics
+    Agents: AgentRegistry
+    Logger: Logger
+    HeartbeatSeconds: float = 15
+    IngestBatchSize: int = 1000
+    AgentTokenHeader: str = "X-Agent-Token"
+
+    def __init__(self, cache: ResultCache, logger: Logger, loop: asyncio.AbstractEventLoop = None, dashboard: Dashboard = None, history: HistoryStore = None, metrics: Metrics = None, agents: AgentRegistry = None):
+        self.Cache = cache
+        self.Dashboard = dashboard
+        self.History = history
+        self.Metrics = metrics
+        self.Agents = agents
+        self.Logger = logger
+
+        self._loop = loop
+
+    def GetCheckResult(self, identifier: str, ifNoneMatch: str = None) -> ApiResponse:
+
+        # read the validator first so that a concurrent modification results in a stale (and not in a too new) validator
+        validator = f'"{self.Cache.GetEntryValidator(identifier)}"'
+        checkResult = self.Cache.get(identifier)
+
+        if checkResult is None:
+            raise ApiError(404, "The requested check result was not found.")
+
+        headers = {
+            "ETag": validator,
+            "Last-Modified": format_datetime(checkResult.Created, usegmt=True)
+        }
+
+        if self._matches(ifNoneMatch, validator):
+            return ApiResponse(304, headers=headers)
+
+        checkResultJson = json.dumps(self.ToDict(identifier, checkResult))
+
+        return ApiResponse(200, checkResultJson.encode('utf8'), "application/json", headers)
+
+    def GetCheckResults(self, identifiers: List[str] = None, prefix: str = None, format: str = "json", since: str = None, ifNoneMatch: str = None) -> ApiResponse:
+
+        if format not in ["json", "ndjson"]:
+            raise ApiError(400, f"The format '{format}' is not supported.")
+
+        validator = f'"{self.Cache.GetValidator()}"'
+        headers = { "ETag": validator }
+
+        # nothing has changed at all
+        if self._matches(ifNoneMatch, validator):
+            return ApiResponse(304, headers=headers)
+
+        # only return the check results which have been modified since the given generation
+        if since is not None:
+            (incremental, changedIdentifiers, removedIdentifiers) = self.Cache.GetChangesSince(self.Cache.GetGeneration(since))
+
+        else:
+            (incremental, changedIdentifiers, removedIdentifiers) = (False, None, [])
+
+        # take a snapshot because the cache might be modified concurrently by the event loop
+        if identifiers is not None and any(identifiers):
+
+            if changedIdentifiers is not None:
+                identifierSet = set(identifiers)
+                changedIdentifiers = [identifier for identifier in changedIdentifiers if identifier in identifierSet]
+                removedIdentifiers = [identifier for identifier in removedIdentifiers if identifier in identifierSet]
+
+            else:
+                changedIdentifiers = identifiers
+
+        if changedIdentifiers is not None:
+            items = [(identifier, self.Cache.get(identifier)) for identifier in changedIdentifiers]
+            items = [(identifier, checkResult) for (identifier, checkResult) in items if checkResult is not None]
+
+        else:
+            items = list(self.Cache.items())
+
+        if prefix is not None:
+            items = [(identifier, checkResult) for (identifier, checkResult) in items if identifier.startswith(prefix)]
+            removedIdentifiers = [identifier for identifier in removedIdentifiers if identifier.startswith(prefix)]
+
+        checkResultDicts = [self.ToDict(identifier, checkResult) for (identifier, checkResult) in items]
+
+        if format == "ndjson":
+
+            if since is not None:
+                checkResultDicts.extend({ "identifier": identifier, "removed": True } for identifier in removedIdentifiers)
+
+            body = "".join(json.dumps(checkResultDict) + "\n" for checkResultDict in checkResultDicts)
+            return ApiResponse(200, body.encode('utf8'), "application/x-ndjson", headers)
+
+        elif since is not None:
+
+            body = json.dumps({
+                "generation": validator.strip('"'),
+                "incremental": incremental,
+                "results": checkResultDicts,
+                "removed": removedIdentifiers
+            })
+
+            return ApiResponse(200, body.encode('utf8'), "application/json", headers)
+
+        else:
+            return ApiResponse(200, json.dumps(checkResultDicts).encode('utf8'), "application/json", headers)
+
+    def Subscribe(self, identifiers: List[str], prefix: str, format: str, since: str, wakeUp: Callable[[], None]) -> CheckResultSubscription:
+
+        if format not in ["sse", "ndjson"]:
+            raise ApiError(400, f"The format '{format}' is not supported.")
+
+        # wakeUp is called on the event loop whenever a subscribed check result has been modified
+        return CheckResultSubscription(self.Cache, self.ToDict, identifiers, prefix, format, since, wakeUp)
+
+    def GetDashboard(self, ifNoneMatch: str = None) -> ApiResponse:
+
+        dashboard = self._getDashboard()
+
+        # read the layout first so that a concurrent modification results in a stale (and not in a too new) validator
+        layout = dashboard.Layout
+        generation = dashboard.Results.GetValidator()
+        validator = f'"{generation}.{dashboard.LayoutVersion}"'
+        headers = { "ETag": validator, "Cache-Control": "no-cache" }
+
+        if self._matches(ifNoneMatch, validator):
+            return ApiResponse(304, headers=headers)
+
+        groups = []
+
+        for (group, keys) in layout:
+
+            checkResults = [(key, dashboard.Results.get(key)) for key in keys]
+
+            groups.append({
+                "name": group,
+                "checks": [self.ToDashboardDict(key, checkResult) for (key, checkResult) in checkResults if checkResult is not None]
+            })
+
+        body = json.dumps({ "generation": generation, "groups": groups })
+
+        return ApiResponse(200, body.encode('utf8'), "application/json", headers)
+
+    def SubscribeDashboard(self, identifiers: List[str], prefix: str, format: str, since: str, wakeUp: Callable[[], None]) -> CheckResultSubscription:
+
+        if format not in ["sse", "ndjson"]:
+            raise ApiError(400, f"The format '{format}' is not supported.")
+
+        return CheckResultSubscription(self._getDashboard().Results, self.ToDashboardDict, identifiers, prefix, format, since, wakeUp)
+
+    def GetHistory(self, checkId: str = None, days: str = "7") -> ApiResponse:
+
+        if self.History is None:
+            raise ApiError(404, "The history is disabled.")
+
+        try:
+            period = float(days) * 86400
+
+        except ValueError:
+            period = math.nan
+
+        if not 0 < period < math.inf:
+            raise ApiError(400, f"The number of days '{days}' is invalid.")
+
+        end = time.time()
+        start = end - period
+
+        # without check id, the ids of all checks with history are returned
+        if checkId is None:
+            body = json.dumps({ "checks": self.History.GetCheckIds(start, end) })
+
+        else:
+            transitions = self.History.GetTransitions(checkId, start, end)
+
+            body = json.dumps({
+                "check": checkId,
+                "start": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+                "end": datetime.fromtimestamp(end, timezone.utc).isoformat(),
+                "uptime": self.History.GetUptime(checkId, start, end),
+                "transitions": [
+                    {
+                        "time": datetime.fromtimestamp(timestamp, timezone.utc).isoformat(),
+                        "from": fromType.value,
+                        "to": toType.value,
+                        "message": message
+                    }
+                    for (timestamp, fromType, toType, message) in transitions
+                ]
+            })
+
+        return ApiResponse(200, body.encode('utf8'), "application/json")
+
+    def GetMetrics(self) -> ApiResponse:
+
+        if self.Metrics is None:
+            raise ApiError(404, "The metrics are disabled.")
+
+        return ApiResponse(200, self.Metrics.Render(), "text/plain; version=0.0.4; charset=utf-8")
+
+    def GetAgents(self, token: str) -> ApiResponse:
+        agents = self._getAgents(token)
+        agents = self._invoke(lambda: agents.GetAgents())
+        return ApiResponse(200, json.dumps({ "agents": agents }).encode('utf8'), "application/json")
+
+    def PostAgentHeartbeat(self, agentId: str, token: str, rawData: bytes) -> ApiResponse:
+
+        agents = self._getAgents(token)
+
+        try:
+            heartbeatJson = json.loads(rawData)
+        except ValueError:
+            raise ApiError(400, "The request body is not valid JSON.")
+
+        if not isinstance(heartbeatJson, dict) or not (heartbeatJson.get("version") is None or isinstance(heartbeatJson["version"], str)):
+            raise ApiError(400, "The heartbeat must be a JSON object with an optional version string.")
+
+        # the agent gets its checks with the first heartbeat and whenever they have changed
+        assignment = self._invoke(lambda: agents.Heartbeat(agentId, heartbeatJson.get("version")))
+
+        return ApiResponse(200, json.dumps(assignment).encode('utf8'), "application/json")
+
+    def DeleteAgent(self, agentId: str, token: str):
+
+        agents = self._getAgents(token)
+
+        if not self._invoke(lambda: agents.Unregister(agentId)):
+            raise ApiError(404, f"The agent {agentId} is not registered.")
+
+    def PostAgentResults(self, agentId: str, token: str, rawData: bytes) -> ApiResponse:
+
+        agents = self._getAgents(token)
+
+        try:
+            resultsJson = json.loads(rawData)
+        except ValueError:
+            raise ApiError(400, "The request body is not valid JSON.")
+
+        if not isinstance(resultsJson, dict) or not isinstance(resultsJson.get("results"), list):
+            raise ApiError(400, "The check results must be a JSON object with a list of results.")
+
+        timedResults = {}
+
+        for values in resultsJson["results"]:
+            (key, checkResult, duration) = self._parseAgentResult(values)
+            timedResults[key] = (checkResult, duration)
+
+        accepted = self._invoke(lambda: agents.AddResults(agentId, timedResults))
+
+        body = json.dumps({
+            "accepted": accepted,
+            "ignored": len(timedResults) - accepted
+        })
+
+        return ApiResponse(200, body.encode('utf8'), "application/json")
+
+    def PostCheckResult(self, rawData: bytes):
+
+        # binary -> json
+        try:
+            checkResultJson = json.loads(rawData)
+        except ValueError:
+            raise ApiError(400, "The request body is not valid JSON.")
+
+        (identifier, checkResult, ttl) = self._parseCheckResult(checkResultJson)
+
+        # populate cache
+        self.Logger.info(f"Fill cache with check result {identifier} (received via HTML POST).")
+        self._apply(lambda: self.Cache.Set(identifier, checkResult, ttl))
+
+    def IngestCheckResults(self) -> CheckResultIngest:
+        # one check result per line (NDJSON), fed line by line by the web servers while the body is received
+        return CheckResultIngest(self._parseCheckResult, self._applyBatch, self.IngestBatchSize, self.Logger)
+
+    def ToDict(self, identifier: str, checkResult: CheckResult) -> Dict[str, object]:
+        return {
+            "identifier": identifier,
+            "name": checkResult.Name,
+            "resultType": checkResult.ResultType.value,
+            "message": checkResult.Message,
+            "infoUrl": checkResult.InfoUrl,
+            "created": checkResult.Created.isoformat()
+        }
+
+    def ToDashboardDict(self, key: str, checkResult: CheckResult) -> Dict[str, object]:
+        return {
+            "key": key,
+            "name": checkResult.Name,
+            "resultType": checkResult.ResultType.value,
+            "message": checkResult.Message,
+            "infoUrl": checkResult.InfoUrl,
+            "muted": not any(checkResult.Notifiers)
+        }
+
+    def _getAgents(self, token: str) -> AgentRegistry:
+
+        if self.Agents is None:
+            raise ApiError(404, "The coordinator mode is disabled.")
+
+        # the agents get the check settings (including any passwords) and their results are trusted
+        if not self.Agents.IsAuthorized(token):
+            raise ApiError(401, f"The agent token is missing or invalid (header {self.AgentTokenHeader}).")
+
+        return self.Agents
+
+    def _getDashboard(self) -> Dashboard:
+
+        if self.Dashboard is None:
+            raise ApiError(404, "The dashboard is not available.")
+
+        return self.Dashboard
+
+    def _matches(self, ifNoneMatch: str, validator: str) -> bool:
+
+        if ifNoneMatch is None:
+            return False
+
+        return any(value.strip() in [validator, f"W/{validator}", "*"] for value in ifNoneMatch.split(","))
+
+    def _parseCheckResult(self, checkResultJson: object) -> Tuple[str, CheckResult, float]:
+
+        if not isinstance(checkResultJson, dict):
+            raise ApiError(400, "The check result must be a JSON object.")
+
+        try:
+            identifier = checkResultJson["identifier"]
+            name = checkResultJson["name"]
+            resultType = CheckResultType(int(checkResultJson["resultType"]))
+            message = checkResultJson["message"]
+
+        except KeyError as ex:
+            raise ApiError(400, f"The value {ex} is missing.")
+
+        except (TypeError, ValueError):
+            raise ApiError(400, f"The result type '{checkResultJson['resultType']}' is invalid.")
+
+        infoUrl = checkResultJson.get("infoUrl")
+        ttl = checkResultJson.get("ttlSeconds")
+        notifiers = []
+
+        if not isinstance(identifier, str) or identifier == "":
+            raise ApiError(400, f"The identifier '{identifier}' is invalid.")
+
+        if not isinstance(name, str) or not isinstance(message, str) or not (infoUrl is None or isinstance(infoUrl, str)):
+            raise ApiError(400, "The name, message and info URL must be strings.")
+
+        if ttl is not None and not (type(ttl) in [int, float] and ttl > 0):
+            raise ApiError(400, f"The time to live '{ttl}' is invalid.")
+
+        return (identifier, CheckResult(name, resultType, message, infoUrl, notifiers), ttl)
+
+    def _parseAgentResult(self, values: object) -> Tuple[str, CheckResult, float]:
+
+        # agents send their check results as compact arrays
+        try:
+            (key, name, resultType, message, infoUrl, notifiers, timestamp, duration) = values
+            resultType = CheckResultType(resultType)
+
+        except (TypeError, ValueError):
+            raise ApiError(400, f"The check result {json.dumps(values)} is invalid.")
+
+        if not all(isinstance(value, str) for value in [key, name, message]) or not (infoUrl is None or isinstance(infoUrl, str)):
+            raise ApiError(400, f"The key, name, message and info URL of the check result {json.dumps(values)} must be strings.")
+
+        if not isinstance(notifiers, list) or not all(isinstance(notifier, str) for notifier in notifiers):
+            raise ApiError(400, f"The notifiers of the check result {json.dumps(values)} must be a list of strings.")
+
+        if not all(type(value) in [int, float] for value in [timestamp, duration]):
+            raise ApiError(400, f"The timestamp and duration of the check result {json.dumps(values)} must be numbers.")
+
+        return (key, CheckResult(name, resultType, message, infoUrl, notifiers, timestamp), duration)
+
+    def _applyBatch(self, batch: List[Tuple[str, CheckResult, float]]):
+
+        def apply():
+            for (identifier, checkResult, ttl) in batch:
+                self.Cache.Set(identifier, checkResult, ttl)
+
+        self._apply(apply)
+
+    def _apply(self, action: Callable[[], None]):
+
+        try:
+            runningLoop = asyncio.get_running_loop()
+        except RuntimeError:
+            runningLoop = None
+
+        # the cache is owned by the event loop of the health checker, other threads hand over their changes
+        if self._loop is None or runningLoop is self._loop:
+            action()
+
+        else:
+            self._loop.call_soon_threadsafe(action)
+
+    def _invoke(self, action: Callable[[], object]) -> object:
+
+        try:
+            runningLoop = asyncio.get_running_loop()
+        except RuntimeError:
+            runningLoop = None
+
+        if self._loop is None or runningLoop is self._loop:
+            return action()
+
+        # like _apply, but other threads wait for the result
+        future = concurrent.futures.Future()
+
+        def invoke():
+
+            try:
+                future.set_result(action())
+
+            except Exception as ex:
+                future.set_exception(ex)
+
+        self._loop.call_soon_threadsafe(invoke)
+
+        return future.result()
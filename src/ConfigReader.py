@@ -1,65 +1,100 @@
+import hashlib
+import os
 from itertools import groupby
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Tuple
 
 from .BaseTypes import Config
 
 
 class ConfigReader():
 
+    _fileStat: Tuple[str, int, int] = None
+    _fileHash: str = None
+
     def Read(self, filePath: str) -> Config:
 
+        # the same encoding as ReadIfChanged, independent of the locale
+        with open(filePath, "r", encoding="utf8") as file:
+            return self._parse(file)
+
+    def ReadIfChanged(self, filePath: str) -> Config:
+
+        # cheap check first: file path, modification time and size
+        stat = os.stat(filePath)
+        fileStat = (filePath, stat.st_mtime_ns, stat.st_size)
+
+        if fileStat == self._fileStat:
+            return None
+
+        # the file has been touched, but maybe its content is still the same
+        with open(filePath, "rb") as file:
+            content = file.read()
+
+        fileHash = hashlib.sha256(content).hexdigest()
+
+        if fileHash == self._fileHash:
+            self._fileStat = fileStat
+            return None
+
+        # the file is only marked as read when it could be parsed, so a half-saved file is read again
+        config = self._parse(content.decode("utf8").splitlines(keepends=True))
+        self._fileStat = fileStat
+        self._fileHash = fileHash
+
+        return config
+
+    def _parse(self, lines: Iterable[str]) -> Config:
+
         notifiers: List[Dict[str, str]] = []
         checks: List[Dict[str, str]] = []
 
-        with open(filePath, "r") as file:
-
-            section: str
-            notifier: Dict[str, str] = None
-            check: Dict[str, str] = None
+        section: str
+        notifier: Dict[str, str] = None
+        check: Dict[str, str] = None
 
-            for line in file:
+        for line in lines:
 
-                # skip empty lines
-                if self._isNullOrWhiteSpace(line):
-                    notifier = None
-                    check = None
-                    continue
+            # skip empty lines
+            if self._isNullOrWhiteSpace(line):
+                notifier = None
+                check = None
+                continue
 
-                # skip comments
-                if line.startswith("#"):
-                    continue
+            # skip comments
+            if line.startswith("#"):
+                continue
 
-                # detect section
-                if line.startswith("[notifiers]"):
-                    section = "notifiers"
-                    continue
+            # detect section
+            if line.startswith("[notifiers]"):
+                section = "notifiers"
+                continue
 
-                elif line.startswith("[checks]"):
-                    section = "checks"
-                    continue
+            elif line.startswith("[checks]"):
+                section = "checks"
+                continue
 
-                # go
-                if section == "notifiers":
+            # go
+            if section == "notifiers":
 
-                    if notifier is None:
-                        notifier = {}
-                        notifiers.append(notifier)
+                if notifier is None:
+                    notifier = {}
+                    notifiers.append(notifier)
 
-                    (option, value) = self._parseOption(line)
-                    notifier[option] = value
+                (option, value) = self._parseOption(line)
+                notifier[option] = value
 
-                elif section == "checks":
+            elif section == "checks":
 
-                    if check is None:
-                        check = {}
-                        checks.append(check)
+                if check is None:
+                    check = {}
+                    checks.append(check)
 
-                    (option, value) = self._parseOption(line)
-                    check[option] = value
+                (option, value) = self._parseOption(line)
+                check[option] = value
 
-            for check in checks:
-                if not "group" in check:
-                    check["group"] = "Default"
+        for check in checks:
+            if not "group" in check:
+                check["group"] = "Default"
 
         groupedCheckers = {}
 
@@ -0,0 +1,47 @@
+from typing import Dict, List, Tuple
+
+from .BaseTypes import CheckResult
+from .ResultCache import ResultCache
+
+
+class Dashboard:
+
+    Results: ResultCache
+    Layout: List[Tuple[str, List[str]]]
+    LayoutVersion: int
+
+    def __init__(self):
+        self.Results = ResultCache()
+        self.Layout = []
+        self.LayoutVersion = 0
+
+    def Update(self, result: Dict[str, List[Tuple[str, CheckResult]]]):
+
+        keys = set()
+
+        # only check results which look different are sent to the browsers
+        for checkResults in result.values():
+            for (key, checkResult) in checkResults:
+
+                keys.add(key)
+                current = self.Results.get(key)
+
+                if current is None or self._isModified(current, checkResult):
+                    self.Results[key] = checkResult
+
+        for key in [key for key in self.Results if key not in keys]:
+            self.Results.pop(key)
+
+        # the layout is replaced instead of modified because it is read by other threads
+        layout = [(group, [key for (key, _) in checkResults]) for (group, checkResults) in result.items()]
+
+        if layout != self.Layout:
+            self.Layout = layout
+            self.LayoutVersion += 1
+
+    def _isModified(self, current: CheckResult, checkResult: CheckResult) -> bool:
+        return current.Name != checkResult.Name or \
+               current.ResultType != checkResult.ResultType or \
+               current.Message != checkResult.Message or \
+               current.InfoUrl != checkResult.InfoUrl or \
+               any(current.Notifiers) != any(checkResult.Notifiers)
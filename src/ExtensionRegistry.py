@@ -0,0 +1,115 @@
+import importlib
+import inspect
+import os
+import sys
+import time
+from logging import Logger
+from types import ModuleType
+from typing import Dict, Tuple
+
+from .BaseTypes import Checker, Notifier
+
+
+class ExtensionRegistry:
+
+    FolderPath: str
+    PackageName: str
+    Checkers: Dict[str, type]
+    Notifiers: Dict[str, type]
+    Reloads: int
+    Logger: Logger
+
+    def __init__(self, logger: Logger, folderPath: str = "src/Extensions", packageName: str = "src.Extensions"):
+        self.FolderPath = folderPath
+        self.PackageName = packageName
+        self.Checkers = {}
+        self.Notifiers = {}
+        self.Reloads = 0
+        self.Logger = logger
+
+        self._modules: Dict[str, Tuple[int, ModuleType]] = {}
+
+    def Refresh(self) -> bool:
+        return self._refresh(False)
+
+    def Reload(self) -> bool:
+        self.Logger.info(f"Reload all extensions.")
+        self.Reloads += 1
+        return self._refresh(True)
+
+    def _refresh(self, forceReload: bool) -> bool:
+
+        # only (re)import extension files which are new or have been modified
+        start = time.perf_counter()
+        fileNames = [fileName for fileName in os.listdir(self.FolderPath) if fileName.endswith(".py") and fileName != "__init__.py"]
+        changed = False
+
+        for fileName in [fileName for fileName in self._modules if fileName not in fileNames]:
+            self.Logger.info(f"Unload extension {fileName}.")
+            self._modules.pop(fileName)
+            changed = True
+
+        for fileName in fileNames:
+
+            modified = os.stat(os.path.join(self.FolderPath, fileName)).st_mtime_ns
+            entry = self._modules.get(fileName)
+
+            if entry is not None and entry[0] == modified and not forceReload:
+                continue
+
+            try:
+                self._modules[fileName] = (modified, self._loadModule(fileName, forceReload or entry is not None))
+                changed = True
+
+            except Exception as ex:
+                self.Logger.error(f"Unable to load extension {fileName}.", exc_info=ex)
+
+        if changed:
+            self._updateTypes()
+            self.Logger.info(f"Loaded {len(self._modules)} extension modules in {time.perf_counter() - start:.3f} s.")
+
+        else:
+            self.Logger.info(f"Extension modules are up to date (checked in {time.perf_counter() - start:.3f} s).")
+
+        return changed
+
+    def _loadModule(self, fileName: str, reload: bool) -> ModuleType:
+
+        moduleName = f"{self.PackageName}.{fileName[:-3]}"
+
+        if reload and moduleName in sys.modules:
+            self.Logger.info(f"Reload extension {fileName}.")
+            return importlib.reload(sys.modules[moduleName])
+
+        else:
+            return importlib.import_module(moduleName)
+
+    def _updateTypes(self):
+
+        checkers = {}
+        notifiers = {}
+
+        for (_, module) in self._modules.values():
+
+            # only consider classes which are defined in the extension module itself
+            for (_, member) in inspect.getmembers(module, inspect.isclass):
+
+                if member.__module__ != module.__name__ or inspect.isabstract(member):
+                    continue
+
+                if issubclass(member, Checker):
+                    checkers[member.Type] = member
+
+                elif issubclass(member, Notifier):
+                    notifiers[member.Type] = member
+
+        for checkerType in checkers:
+            if checkerType not in self.Checkers:
+                self.Logger.info(f"Loaded checker {checkerType}.")
+
+        for notifierType in notifiers:
+            if notifierType not in self.Notifiers:
+                self.Logger.info(f"Loaded notifier {notifierType}.")
+
+        self.Checkers = checkers
+        self.Notifiers = notifiers
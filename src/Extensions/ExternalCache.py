@@ -6,6 +6,7 @@ from ..BaseTypes import Checker, CheckResult
 
 class ExternalCacheChecker(Checker):
     Type: str = "external-cache"
+    DefaultTimeoutSeconds: float = 5
     Identifier: str
     MaxAgeMinutes: int
 
@@ -16,6 +17,9 @@ class ExternalCacheChecker(Checker):
         self.Identifier = settings["identifier"]
         self.MaxAgeMinutes = int(settings["max-age-minutes"])
 
+        self._source: CheckResult = None
+        self._result: CheckResult = None
+
     def SetCheckResult(self, checkResult: CheckResult):
         self.CheckResult = checkResult
 
@@ -27,12 +31,14 @@ class ExternalCacheChecker(Checker):
         if self.CheckResult is not None:
 
             if self.CheckResult.AgeMinutes <= self.MaxAgeMinutes:
-                self.CheckResult.Notifiers = self.Notifiers
 
-                if self.CheckResult.InfoUrl is None:
-                    self.CheckResult.InfoUrl = self.InfoUrl
+                # the cached result is shared, so the notifiers of this checker are applied to a copy
+                if self._source is not self.CheckResult:
+                    self._source = self.CheckResult
+                    infoUrl = self.InfoUrl if self.CheckResult.InfoUrl is None else self.CheckResult.InfoUrl
+                    self._result = CheckResult(self.CheckResult.Name, self.CheckResult.ResultType, self.CheckResult.Message, infoUrl, self.Notifiers, self.CheckResult.Timestamp)
 
-                return self.CheckResult
+                return self._result
                 
             else:
                 return self.Warning("Last check result too old.")
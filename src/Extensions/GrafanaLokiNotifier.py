@@ -1,78 +1,157 @@
+import asyncio
+import gzip
 import json
-import os
-from datetime import datetime
-from typing import Dict, List
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
 
-import requests
+from aiohttp import ClientResponseError
 
 from ..BaseTypes import CheckResult, CheckResultType, Notifier
+from ..HttpClient import HttpClient
 
 
 class GrafanaLokiNotifier(Notifier):
     Type: str = "grafana-loki"
     Url: str
-    Labels: str
+    Labels: Dict[str, str]
+    Compression: str
+    Retries: int
+    RetryDelaySeconds: float
+    MaxBuffer: int
+
+    HttpClient: HttpClient
 
     def __init__(self, settings: Dict[str, str]):
         super().__init__(settings)
 
         self.Url = settings["url"]
-        self.Labels = settings["labels"]
+        self.Labels = {}
+        self.Compression = settings.get("compression", "none")
+        self.Retries = int(settings.get("retries", 3))
+        self.RetryDelaySeconds = float(settings.get("retry-delay-seconds", 1))
+        self.MaxBuffer = int(settings.get("max-buffer", 1000))
+        self.HttpClient = None
+
+        for label in settings["labels"].split(","):
+            (key, value) = label.split("=", maxsplit=1)
+            self.Labels[key.strip()] = value.strip()
+
+        if self.Compression not in ["none", "gzip"]:
+            raise Exception(f"The compression '{self.Compression}' is not supported.")
+
+        # entries which could not be pushed yet (e.g. during a Loki outage), the oldest ones are dropped first
+        self._buffer: Deque[Tuple[str, int, str]] = deque(maxlen=self.MaxBuffer)
+        self._pushed: bool = False
+
+    def SetHttpClient(self, httpClient: HttpClient):
+        self.HttpClient = httpClient
 
     async def NotifyAsync(self, checkResult: Dict[str, List[CheckResult]]):
 
+        # the entries get the push time, Loki rejects entries which are older than its ingestion window
+        timestamp = int(time.time() * 1e9)
+
+        for (group, checkResults) in checkResult.items():
+            for result in checkResults:
+                self._buffer.append(self._getEntry(group, result, timestamp))
+
+        self._pushed = True
+        await self._pushAsync()
+
+    async def FlushAsync(self):
+
+        # entries which have been kept during an outage are pushed even if there are no new results
+        if self._pushed:
+            self._pushed = False
+
+        elif any(self._buffer):
+            await self._pushAsync()
+
+    async def _pushAsync(self):
+
+        entries = list(self._buffer)
+        (data, headers) = self._getRequest(entries)
         url = f"{self.Url}/api/v1/push"
 
-        headers = {
-            'Content-type': 'application/json'
-        }
+        for attempt in range(self.Retries + 1):
 
-        for (group, checkResults) in checkResult.items():
+            try:
+                async with self.HttpClient.Session.post(url, data=data, headers=headers, raise_for_status=True) as response:
+                    await response.read()
 
-            for result in checkResults:
+                break
+
+            except Exception as ex:
+
+                # a rejected request (e.g. invalid labels) would be rejected again, only rate limiting is retried
+                if isinstance(ex, ClientResponseError) and 400 <= ex.status < 500 and ex.status != 429:
+                    self._remove(entries)
+                    raise Exception(f"Grafana Loki has rejected {len(entries)} entries (status {ex.status}), they are dropped.") from ex
 
-                timestamp = int(datetime.utcnow().timestamp() * 1e9)
-
-                if (result.Message is not None and result.Message != ""):
-                    message = f"[{group}] {result.Name} = {result.Message}"
-
-                else:
-                    message = f"[{group}] {result.Name}"
-
-                if result.ResultType == CheckResultType.Warning:
-                    level = "warning"
-
-                elif result.ResultType == CheckResultType.Error:
-                    level = "error"
-
-                else:
-                    level = "info"
-
-                payload = {
-                    "streams": [
-                        { 
-                            "stream": 
-                            { 
-                                "level": level 
-                            }, 
-                            "values": 
-                            [ 
-                                [ 
-                                    timestamp,
-                                    message 
-                                ]
-                            ]
-                        }
-                    ]
+                if attempt == self.Retries:
+                    raise Exception(f"Unable to push {len(entries)} entries to Grafana Loki, they are kept for the next push.") from ex
+
+                await asyncio.sleep(self.RetryDelaySeconds * 2 ** attempt)
+
+        self._remove(entries)
+
+    def _remove(self, entries: List[Tuple[str, int, str]]):
+
+        # entries which have been added in the meantime are kept, entries which have been dropped because the buffer was full are skipped
+        for entry in entries:
+
+            if not any(self._buffer):
+                break
+
+            if self._buffer[0] is entry:
+                self._buffer.popleft()
+
+    def _getEntry(self, group: str, result: CheckResult, timestamp: int) -> Tuple[str, int, str]:
+
+        if (result.Message is not None and result.Message != ""):
+            message = f"[{group}] {result.Name} = {result.Message}"
+
+        else:
+            message = f"[{group}] {result.Name}"
+
+        if result.ResultType == CheckResultType.Warning:
+            level = "warning"
+
+        elif result.ResultType == CheckResultType.Error or result.ResultType == CheckResultType.Timeout:
+            level = "error"
+
+        else:
+            level = "info"
+
+        return (level, timestamp, message)
+
+    def _getRequest(self, entries: List[Tuple[str, int, str]]) -> Tuple[bytes, Dict[str, str]]:
+
+        # one stream per label set, i.e. per level, with the entries in chronological order
+        streams: Dict[str, list] = {}
+
+        for (level, timestamp, message) in sorted(entries, key=lambda entry: entry[1]):
+            streams.setdefault(level, []).append([str(timestamp), message])
+
+        payload = {
+            "streams": [
+                {
+                    "stream": { **self.Labels, "level": level },
+                    "values": values
                 }
+                for (level, values) in streams.items()
+            ]
+        }
 
-                splittedLabels = self.Labels.split(",")
+        data = json.dumps(payload).encode()
 
-                for label in splittedLabels:
-                    (key, value) = label.split("=", maxsplit=1)
-                    key = key.lstrip().rstrip()
-                    value = value.lstrip().rstrip()
-                    payload["streams"][0]["stream"][key] = value
+        headers = {
+            'Content-type': 'application/json'
+        }
 
-                reponse = requests.post(url, headers=headers, data=json.dumps(payload))
+        if self.Compression == "gzip":
+            data = gzip.compress(data)
+            headers["Content-Encoding"] = "gzip"
 
+        return (data, headers)
@@ -1,11 +1,10 @@
-import os
 import re
 from typing import Dict
 
-import aiohttp
-from aiohttp.client import ClientResponseError
+from aiohttp import ClientTimeout
 
 from ..BaseTypes import Checker, CheckResult
+from ..HttpClient import HttpClient
 
 
 class HttpGetChecker(Checker):
@@ -13,29 +12,32 @@ class HttpGetChecker(Checker):
     Url: str
     Regex: str
 
-    Cache: Dict[str, CheckResult]
+    HttpClient: HttpClient
 
     def __init__(self, settings: Dict[str, str]):
         super().__init__(settings)
         self.Url = settings["url"]
         self.Regex = settings["regex"]
+        self.HttpClient = None
+
+    def SetHttpClient(self, httpClient: HttpClient):
+        self.HttpClient = httpClient
 
     def GetName(self) -> str:
         return self.Url
 
     async def DoCheckAsync(self) -> CheckResult:
-        
-        async with aiohttp.ClientSession(raise_for_status=True) as session:
 
-            try:
-                async with session.get(self.Url) as response:
-                    content = await response.text()
-                    match = re.search(self.Regex, content)
+        try:
+            # the check may have a longer timeout than the default of the shared session
+            async with self.HttpClient.Session.get(self.Url, timeout=ClientTimeout(total=self.TimeoutSeconds), raise_for_status=True) as response:
+                content = await response.text()
+                match = re.search(self.Regex, content)
 
-                    if (match is None):
-                        return self.Error("Regular expression did not match.")
-                    else:
-                        return self.Success()
+                if (match is None):
+                    return self.Error("Regular expression did not match.")
+                else:
+                    return self.Success()
 
-            except Exception as ex:
-                return self.Error("Could not HTTP-GET data.")
+        except Exception as ex:
+            return self.Error("Could not HTTP-GET data.")
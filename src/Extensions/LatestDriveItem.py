@@ -1,3 +1,4 @@
+import asyncio
 import glob
 import os
 from datetime import datetime
@@ -8,6 +9,7 @@ from ..BaseTypes import Checker, CheckResult
 
 class LatestDriveItem(Checker):
     Type: str = "latest-drive-item"
+    DefaultTimeoutSeconds: float = 60
     Glob: str
     Recursive: bool
     AgeSecondsWarning: int
@@ -25,11 +27,11 @@ class LatestDriveItem(Checker):
         return f"Latest drive item ({self.Glob})"
 
     async def DoCheckAsync(self) -> CheckResult:
-        driveItems = glob.glob(self.Glob, recursive=self.Recursive)
-        driveItems.sort()
 
-        if any(driveItems):
-            lastModified = datetime.fromtimestamp(os.path.getmtime(driveItems[-1]))
+        # globbing might take a while on large (network) drives, so do not block the event loop
+        lastModified = await asyncio.get_running_loop().run_in_executor(None, self._getLastModified)
+
+        if lastModified is not None:
             age = (datetime.now() - lastModified).total_seconds()
 
             if age >= self.AgeSecondsError:
@@ -44,6 +46,16 @@ class LatestDriveItem(Checker):
         else:
             return self.Error("No items found.")
 
+    def _getLastModified(self) -> datetime:
+        driveItems = glob.glob(self.Glob, recursive=self.Recursive)
+        driveItems.sort()
+
+        if any(driveItems):
+            return datetime.fromtimestamp(os.path.getmtime(driveItems[-1]))
+
+        else:
+            return None
+
     def FormatAge(self, age: float) -> str:
         
         if age > 86400:
@@ -1,42 +1,50 @@
-import os
-import platform
 from typing import Dict
 
 from ..BaseTypes import Checker, CheckResult
+from ..Metrics import Metrics, MetricFamily
+from ..PingEngine import PingEngine
 
 
 class PingV4Checker(Checker):
     Type: str = "ping-v4"
+    DefaultTimeoutSeconds: float = 5
     Address: str
     Name: str
 
+    PingEngine: PingEngine
+    RoundTripTimes: MetricFamily
+
     def __init__(self, settings: Dict[str, str]):
         super().__init__(settings)
         self.Address = settings["address"]
+        self.PingEngine = None
+        self.RoundTripTimes = None
 
         if ("name" in settings):
             self.Name = settings["name"]
         else:
             self.Name = None
 
+    def SetPingEngine(self, pingEngine: PingEngine):
+        self.PingEngine = pingEngine
+
+    def SetMetrics(self, metrics: Metrics):
+        self.RoundTripTimes = metrics.Histogram("healthchecker_ping_round_trip_seconds", "The round trip time of the ping checks.", ("address",), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+
     def GetName(self) -> str:
         return f"Ping v4 ({self.Address})"
 
     async def DoCheckAsync(self) -> CheckResult:
 
-        system = platform.system()
+        # leave some time to report an unreachable host before the check times out
+        result = await self.PingEngine.PingAsync(self.Address, self.TimeoutSeconds * 0.8)
 
-        if system == "Linux":
-            success = not os.system(f"ping {self.Address} -c 1 >/dev/null 2>&1")
+        if result.Success:
 
-        elif system == "Windows":
-            success = not os.system(f"ping {self.Address} -n 1 > nul 2>&1")
-
-        else:
-            raise Exception(f"The platform '{system}' is not supported.")
+            # the round trip time is not part of the message, otherwise the result would change on every run
+            if self.RoundTripTimes is not None and result.RoundTripTime is not None:
+                self.RoundTripTimes.Labels(self.Address).Observe(result.RoundTripTime / 1000)
 
-        if success:
-            
             if (self.Name is None):
                 return self.Success()
             else:
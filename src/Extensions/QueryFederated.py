@@ -1,33 +1,55 @@
+import asyncio
 import json
 import os
 from datetime import datetime
-from typing import Dict
-from urllib.parse import quote, urlparse
+from typing import Callable, Dict
+from urllib.parse import urlparse
 from urllib.request import urlopen
 
-import aiohttp
 import iso8601
-from aiohttp.client import ClientResponseError
 from src.BaseTypes import CheckResultType
 
 from ..BaseTypes import Checker, CheckResult
+from ..FederationClient import FederationClient
 
 
-class PingV4Checker(Checker):
+class QueryFederatedChecker(Checker):
     Type: str = "query-federated"
     Url: str
     RemoteIdentifier: str
     MaxAgeMinutes: int
+    Mode: str
+
+    FederationClient: FederationClient
+    RunRequest: Callable[[], None]
 
     def __init__(self, settings: Dict[str, str]):
         super().__init__(settings)
         self.Url = settings["url"]
         self.RemoteIdentifier = settings["remote-identifier"]
         self.MaxAgeMinutes = int(settings["max-age-minutes"])
+        self.Mode = settings.get("mode", "poll")
+        self.FederationClient = None
+        self.RunRequest = None
+
+        if self.Mode not in ["poll", "stream"]:
+            raise Exception(f"The mode '{self.Mode}' is not supported.")
+
+        self._lastCheckResultJson = None
+        self._lastCheckResult = None
+
+    def SetFederationClient(self, federationClient: FederationClient):
+        self.FederationClient = federationClient
+
+    def SetRunRequest(self, runRequest: Callable[[], None]):
+        self.RunRequest = runRequest
 
     def GetName(self) -> str:
         return self.RemoteIdentifier
 
+    def GetBatchKey(self) -> str:
+        return f"{self.Type}:{self.Url}"
+
     async def DoCheckAsync(self) -> CheckResult:
         
         parseResult = urlparse(self.Url)
@@ -35,47 +57,69 @@ class PingV4Checker(Checker):
         if parseResult.scheme == "file":
            
             try:
-                with urlopen(self.Url) as file:
-                    jsonByteString = file.read()
+                # urlopen blocks, so run it in the executor to make the check cancellable
+                jsonByteString = await asyncio.get_running_loop().run_in_executor(None, self._readFile)
 
             except Exception:
                 return self.Error("Could not query federated data.")
 
+            checkResultJson = json.loads(jsonByteString)
+
         elif parseResult.scheme == "http" or parseResult.scheme == "https":
 
-            async with aiohttp.ClientSession(raise_for_status=True) as session:
+            # the federation client combines the queries of all checkers of the same instance into one request
+            # or, in stream mode, keeps the latest check results of the instance up to date
+            try:
+                if self.Mode == "stream":
+                    checkResultJson = await self.FederationClient.GetStreamedCheckResultAsync(self.Url, self.RemoteIdentifier, self._onUpdate)
+
+                else:
+                    checkResultJson = await self.FederationClient.GetCheckResultAsync(self.Url, self.RemoteIdentifier)
+
+            except Exception as ex:
+                return self.Error("Could not query federated data.")
 
-                try:
-                    url = f"{self.Url}/api/checkresults/{quote(self.RemoteIdentifier, safe='')}"
+            if checkResultJson is None:
+                return self.Error("Could not query federated data.")
 
-                    async with session.get(url) as response:
-                        jsonByteString = await response.read()
+        # the federation client returns the same data as before if the remote check result has not been modified
+        if checkResultJson is self._lastCheckResultJson:
+            checkResult = self._lastCheckResult
 
-                except Exception as ex:
-                    return self.Error("Could not query federated data.")
+        else:
 
-        checkResultJson = json.loads(jsonByteString)
+            # create CheckResult
+            identifier = checkResultJson["identifier"]
 
-        # create CheckResult
-        identifier = checkResultJson["identifier"]
+            if (identifier != self.RemoteIdentifier):
+                return self.Error("Requested and received identifiers do not match.")
 
-        if (identifier != self.RemoteIdentifier):
-            return self.Error("Requested and received identifiers do not match.")
+            name = checkResultJson["name"]
+            resultType = CheckResultType(int(checkResultJson["resultType"]))
+            message = checkResultJson["message"]
+            infoUrl = checkResultJson["infoUrl"]
+            notifiers = []
 
-        name = checkResultJson["name"]
-        resultType = CheckResultType(int(checkResultJson["resultType"]))
-        message = checkResultJson["message"]
-        infoUrl = checkResultJson["infoUrl"]
-        notifiers = []
+            if infoUrl is None:
+                infoUrl = self.InfoUrl
+                
+            created = iso8601.parse_date(checkResultJson["created"]).timestamp()
+            checkResult = CheckResult(name, resultType, message, infoUrl, self.Notifiers, created)
 
-        if infoUrl is None:
-            infoUrl = self.InfoUrl
-            
-        checkResult = CheckResult(name, resultType, message, infoUrl, self.Notifiers)
-        checkResult.Created = iso8601.parse_date(checkResultJson["created"])
+            self._lastCheckResultJson = checkResultJson
+            self._lastCheckResult = checkResult
 
         if checkResult.AgeMinutes <= self.MaxAgeMinutes:
             return checkResult
 
         else:
             return self.Warning("Last check result too old.")
+
+    def _onUpdate(self):
+
+        if self.RunRequest is not None:
+            self.RunRequest()
+
+    def _readFile(self) -> bytes:
+        with urlopen(self.Url) as file:
+            return file.read()
@@ -1,6 +1,9 @@
+import asyncio
 import os
 import smtplib
 import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.message import EmailMessage
 from typing import Dict, List
 
@@ -16,6 +19,8 @@ class SmtpNotifier(Notifier):
     From: str
     To: str
     Subject: str
+    IdleSeconds: float
+    DigestMinutes: float
 
     def __init__(self, settings: Dict[str, str]):
         super().__init__(settings)
@@ -27,24 +32,132 @@ class SmtpNotifier(Notifier):
         self.From = settings["from"]
         self.To = settings["to"]
         self.Subject = settings["subject"]
+        self.IdleSeconds = float(settings.get("idle-seconds", 60))
+        self.DigestMinutes = float(settings.get("digest-minutes", 0))
+
+        # smtplib blocks, so it runs on a dedicated thread which also owns the (reused) session
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"smtp-{self.Id}")
+        self._server: smtplib.SMTP = None
+        self._lastUsed: float = 0
+        self._digest: Dict[str, List[CheckResult]] = {}
+        self._digestStart: float = None
 
     async def NotifyAsync(self, checkResult: Dict[str, List[CheckResult]]):
 
-        with smtplib.SMTP(self.Server, self.Port) as server:
+        if self.DigestMinutes > 0:
+
+            # collect failures and send them as a single mail when the digest period is over
+            if self._digestStart is None:
+                self._digestStart = time.monotonic()
+
+            for (group, checkResults) in checkResult.items():
+                self._digest.setdefault(group, []).extend(checkResults)
+
+        else:
+            await self._sendAsync(checkResult)
+
+    async def FlushAsync(self):
+
+        if self._digestStart is not None and time.monotonic() - self._digestStart >= self.DigestMinutes * 60:
+            await self._sendDigestAsync()
+
+        if self._server is not None and time.monotonic() - self._lastUsed >= self.IdleSeconds:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+
+    async def CloseAsync(self):
+
+        # the collected failures are sent before the session is closed
+        try:
+            if self._digestStart is not None:
+                await self._sendDigestAsync()
+
+        finally:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+            self._executor.shutdown(wait=False)
+
+    async def _sendDigestAsync(self):
+
+        # the digest is taken out before it is sent, because the mail is still sent when the caller times out
+        (digest, digestStart) = (self._digest, self._digestStart)
+        self._digest = {}
+        self._digestStart = None
+
+        try:
+            await self._sendAsync(digest)
+
+        # failures which have been collected in the meantime are merged into the digest which is sent next
+        except Exception:
+
+            for (group, checkResults) in digest.items():
+                self._digest[group] = checkResults + self._digest.get(group, [])
+
+            self._digestStart = digestStart if self._digestStart is None else min(digestStart, self._digestStart)
+            raise
+
+    async def _sendAsync(self, checkResult: Dict[str, List[CheckResult]]):
+        htmlMessage = self.GetHtmlMessage(checkResult)
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._send, htmlMessage)
 
+    def _send(self, htmlMessage: str):
+
+        message = EmailMessage()
+        message.set_content("abc")
+        message['Subject'] = self.Subject
+        message['From'] = self.From
+        message['To'] = self.To
+        message.add_alternative(htmlMessage, subtype='html')
+
+        try:
+            self._getServer().send_message(message)
+
+        except smtplib.SMTPServerDisconnected:
+
+            # the server has closed the session in the meantime
+            self._close()
+            self._getServer().send_message(message)
+
+        self._lastUsed = time.monotonic()
+
+    def _getServer(self) -> smtplib.SMTP:
+
+        # reuse the authenticated session if it is still alive
+        if self._server is not None:
+
+            try:
+                if self._server.noop()[0] == 250:
+                    return self._server
+
+            except Exception:
+                pass
+
+            self._close()
+
+        server = smtplib.SMTP(self.Server, self.Port, timeout=self.TimeoutSeconds)
+
+        try:
             if self.Security == "starttls":
                 context = ssl.SSLContext(ssl.PROTOCOL_TLS)
                 server.starttls(context=context)
                 server.login(self.From, self.Password)
 
-            message = EmailMessage()
-            message.set_content("abc")
-            message['Subject'] = self.Subject
-            message['From'] = self.From
-            message['To'] = self.To
-            message.add_alternative(self.GetHtmlMessage(checkResult), subtype='html')
+        except Exception:
+            server.close()
+            raise
+
+        self._server = server
+
+        return server
+
+    def _close(self):
+
+        if self._server is not None:
+
+            try:
+                self._server.quit()
+            except Exception:
+                self._server.close()
 
-            server.send_message(message)
+            self._server = None
 
     def GetHtmlMessage(self, result: Dict[str, List[CheckResult]]) -> str:
 
@@ -5,6 +5,7 @@ from ..BaseTypes import Checker, CheckResult
 
 class WindowServiceChecker(Checker):
     Type: str = "windows-service"
+    DefaultTimeoutSeconds: float = 10
     ServiceName: str
 
     def __init__(self, settings: Dict[str, str]):
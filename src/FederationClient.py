@@ -0,0 +1,345 @@
+import asyncio
+import json
+from logging import Logger
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import quote, urlencode
+
+from aiohttp import ClientResponseError, ClientTimeout
+
+from .HttpClient import HttpClient
+
+
+class FederationStream:
+    BaseUrl: str
+    Results: Dict[str, Dict[str, object]]
+    Callbacks: Dict[str, Callable[[], None]]
+    Connected: asyncio.Event
+    Interrupted: bool
+    LastAccess: float
+
+    def __init__(self, baseUrl: str):
+        self.BaseUrl = baseUrl
+        self.Results = {}
+        self.Callbacks = {}
+        self.Connected = asyncio.Event()
+        self.Interrupted = False
+        self.LastAccess = 0
+
+class FederationClient:
+
+    MaxUrlLength: int
+    HttpClient: HttpClient
+    Logger: Logger
+
+    StreamConnectTimeout: float = 10
+    StreamReadTimeout: float = 60
+    StreamIdleSeconds: float = 600
+    StreamMaxRetryDelay: float = 60
+
+    def __init__(self, httpClient: HttpClient, logger: Logger, maxUrlLength: int = 4000):
+        self.MaxUrlLength = maxUrlLength
+        self.HttpClient = httpClient
+        self.Logger = logger
+
+        self._queue: Dict[str, Dict[str, List[asyncio.Future]]] = {}
+        self._flushScheduled: bool = False
+        self._tasks = set()
+
+        # base URLs of older remote instances which do not provide the bulk query yet
+        self._singleQueryUrls = set()
+
+        # validator and check results of the last response per base URL and request URL
+        self._states: Dict[str, Dict[str, Tuple[str, Dict[str, Dict[str, object]]]]] = {}
+
+        # one long-lived subscription per base URL
+        self._streams: Dict[str, FederationStream] = {}
+
+    async def GetCheckResultAsync(self, baseUrl: str, identifier: str) -> Dict[str, object]:
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        # queue the request, all requests of the current loop iteration are sent in one batch per base URL
+        self._queue.setdefault(baseUrl, {}).setdefault(identifier, []).append(future)
+
+        if not self._flushScheduled:
+            self._flushScheduled = True
+            loop.call_soon(self._flush)
+
+        return await future
+
+    async def GetStreamedCheckResultAsync(self, baseUrl: str, identifier: str, onUpdate: Callable[[], None]) -> Dict[str, object]:
+
+        loop = asyncio.get_running_loop()
+        stream = self._streams.get(baseUrl)
+
+        if stream is None:
+            stream = FederationStream(baseUrl)
+            self._streams[baseUrl] = stream
+            task = asyncio.ensure_future(self._streamAsync(stream))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        # the latest checker of an identifier is notified about updates
+        stream.Callbacks[identifier] = onUpdate
+        stream.LastAccess = loop.time()
+
+        if not stream.Connected.is_set():
+
+            try:
+                await asyncio.wait_for(stream.Connected.wait(), self.StreamConnectTimeout)
+
+            except asyncio.TimeoutError:
+                raise Exception(f"The stream of federated instance {baseUrl} is not connected.")
+
+        return stream.Results.get(identifier)
+
+    async def _streamAsync(self, stream: FederationStream):
+
+        loop = asyncio.get_running_loop()
+        validator = None
+        retryDelay = 1
+
+        # streams which are not used by any checker anymore are closed
+        while loop.time() - stream.LastAccess < self.StreamIdleSeconds:
+
+            url = f"{stream.BaseUrl}/api/stream?format=ndjson"
+
+            if validator is not None:
+                url += f"&{urlencode([('since', validator)])}"
+
+            try:
+                timeout = ClientTimeout(total=None, sock_connect=self.StreamConnectTimeout, sock_read=self.StreamReadTimeout)
+
+                async with self.HttpClient.Session.get(url, timeout=timeout, raise_for_status=True) as response:
+
+                    self.Logger.info(f"Subscribed to federated instance {stream.BaseUrl}.")
+                    receivedIdentifiers = []
+
+                    async for line in response.content:
+
+                        if not line.strip():
+                            continue
+
+                        data = json.loads(line)
+
+                        # a generation marker closes a batch of events
+                        if "generation" in data:
+
+                            validator = data["generation"]
+                            self._applyBatch(stream, receivedIdentifiers, data["incremental"])
+                            receivedIdentifiers = []
+                            retryDelay = 1
+
+                            if loop.time() - stream.LastAccess >= self.StreamIdleSeconds:
+                                break
+
+                        elif data.get("removed", False):
+                            stream.Results.pop(data["identifier"], None)
+                            receivedIdentifiers.append(data["identifier"])
+
+                        else:
+                            stream.Results[data["identifier"]] = data
+                            receivedIdentifiers.append(data["identifier"])
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as ex:
+                self.Logger.warning(f"The stream of federated instance {stream.BaseUrl} has been interrupted ({type(ex).__name__}: {ex}), reconnect in {retryDelay} s.")
+
+            # let the checkers report the interruption
+            if stream.Connected.is_set():
+                stream.Connected.clear()
+                stream.Interrupted = True
+                self._notify(stream, list(stream.Callbacks))
+
+            await asyncio.sleep(retryDelay)
+            retryDelay = min(retryDelay * 2, self.StreamMaxRetryDelay)
+
+        self.Logger.info(f"Close the unused stream of federated instance {stream.BaseUrl}.")
+        self._streams.pop(stream.BaseUrl, None)
+
+    def _applyBatch(self, stream: FederationStream, receivedIdentifiers: List[str], incremental: bool):
+
+        # a complete snapshot replaces all previous results
+        if not incremental:
+
+            receivedIdentifierSet = set(receivedIdentifiers)
+
+            for identifier in [identifier for identifier in stream.Results if identifier not in receivedIdentifierSet]:
+                stream.Results.pop(identifier)
+                receivedIdentifiers.append(identifier)
+
+        if not stream.Connected.is_set():
+            stream.Connected.set()
+
+            # the checkers of an interrupted stream have reported errors in the meantime,
+            # while the checkers waiting for the first connection read the results themselves
+            if stream.Interrupted:
+                stream.Interrupted = False
+                receivedIdentifiers = list(stream.Callbacks)
+
+            else:
+                receivedIdentifiers = []
+
+        self._notify(stream, receivedIdentifiers)
+
+    def _notify(self, stream: FederationStream, identifiers: List[str]):
+
+        for identifier in set(identifiers):
+
+            onUpdate = stream.Callbacks.get(identifier)
+
+            if onUpdate is not None:
+                onUpdate()
+
+    def _flush(self):
+
+        self._flushScheduled = False
+        queue = self._queue
+        self._queue = {}
+
+        for (baseUrl, requests) in queue.items():
+            task = asyncio.ensure_future(self._queryAsync(baseUrl, requests))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _queryAsync(self, baseUrl: str, requests: Dict[str, List[asyncio.Future]]):
+
+        try:
+            if baseUrl in self._singleQueryUrls:
+                checkResultJsons = await self._querySingleAsync(baseUrl, list(requests))
+
+            else:
+                checkResultJsons = await self._queryBulkAsync(baseUrl, list(requests))
+
+            for (identifier, futures) in requests.items():
+                for future in futures:
+                    if not future.done():
+                        future.set_result(checkResultJsons.get(identifier))
+
+        except Exception as ex:
+            for futures in requests.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(ex)
+
+    async def _queryBulkAsync(self, baseUrl: str, identifiers: List[str]) -> Dict[str, Dict[str, object]]:
+
+        checkResultJsons = {}
+        previousStates = self._states.get(baseUrl, {})
+        states = {}
+        notModified = 0
+
+        for chunk in self._getChunks(baseUrl, identifiers):
+
+            url = f"{baseUrl}/api/checkresults?{urlencode([('id', identifier) for identifier in chunk])}"
+
+            try:
+                (modified, states[url]) = await self._queryChunkAsync(url, previousStates.get(url))
+
+            except ClientResponseError as ex:
+
+                if ex.status not in [400, 404, 405]:
+                    raise
+
+                self.Logger.warning(f"The federated instance {baseUrl} does not support bulk queries, falling back to single queries.")
+                self._singleQueryUrls.add(baseUrl)
+                self._states.pop(baseUrl, None)
+
+                return await self._querySingleAsync(baseUrl, identifiers)
+
+            checkResultJsons.update(states[url][1])
+
+            if not modified:
+                notModified += 1
+
+        # forget the states of requests which are not sent anymore (e.g. after a config change)
+        self._states[baseUrl] = states
+        self.Logger.info(f"Queried {len(checkResultJsons)} of {len(identifiers)} check results from federated instance {baseUrl} ({notModified} of {len(states)} requests not modified).")
+
+        return checkResultJsons
+
+    async def _queryChunkAsync(self, url: str, state: Tuple[str, Dict[str, Dict[str, object]]]) -> Tuple[bool, Tuple[str, Dict[str, Dict[str, object]]]]:
+
+        headers = {}
+        requestUrl = url
+
+        # only ask for the check results which have been modified since the last response
+        if state is not None and state[0] is not None:
+            headers["If-None-Match"] = f'"{state[0]}"'
+            requestUrl = f"{url}&{urlencode([('since', state[0])])}"
+
+        async with self.HttpClient.Session.get(requestUrl, headers=headers, raise_for_status=True) as response:
+
+            if response.status == 304:
+                return (False, state)
+
+            data = json.loads(await response.read())
+            validator = response.headers.get("ETag")
+
+        if validator is not None:
+            validator = validator.strip('"')
+
+        # incremental response
+        if isinstance(data, dict):
+
+            checkResultJsons = dict(state[1]) if data["incremental"] else {}
+
+            for checkResultJson in data["results"]:
+                checkResultJsons[checkResultJson["identifier"]] = checkResultJson
+
+            for identifier in data["removed"]:
+                checkResultJsons.pop(identifier, None)
+
+        # full response (e.g. of an instance without validators)
+        else:
+            checkResultJsons = {checkResultJson["identifier"]: checkResultJson for checkResultJson in data}
+
+        return (True, (validator, checkResultJsons))
+
+    async def _querySingleAsync(self, baseUrl: str, identifiers: List[str]) -> Dict[str, Dict[str, object]]:
+
+        async def queryAsync(identifier: str):
+
+            url = f"{baseUrl}/api/checkresults/{quote(identifier, safe='')}"
+
+            try:
+                async with self.HttpClient.Session.get(url, raise_for_status=True) as response:
+                    return json.loads(await response.read())
+
+            except ClientResponseError as ex:
+
+                if ex.status == 404:
+                    return None
+
+                raise
+
+        checkResultJsons = await asyncio.gather(*[queryAsync(identifier) for identifier in identifiers])
+
+        return {identifier: checkResultJson for (identifier, checkResultJson) in zip(identifiers, checkResultJsons) if checkResultJson is not None}
+
+    def _getChunks(self, baseUrl: str, identifiers: List[str]) -> List[List[str]]:
+
+        # keep the request line below the limits of common HTTP servers
+        chunks = []
+        chunk = []
+        length = len(baseUrl) + len("/api/checkresults?")
+
+        for identifier in identifiers:
+
+            parameterLength = len(urlencode([("id", identifier)])) + 1
+
+            if chunk and length + parameterLength > self.MaxUrlLength:
+                chunks.append(chunk)
+                chunk = []
+                length = len(baseUrl) + len("/api/checkresults?")
+
+            chunk.append(identifier)
+            length += parameterLength
+
+        if chunk:
+            chunks.append(chunk)
+
+        return chunks
@@ -0,0 +1,55 @@
+import bisect
+import hashlib
+from typing import List, Set
+
+
+class HashRing:
+
+    Replicas: int
+    Nodes: Set[str]
+
+    def __init__(self, replicas: int = 64):
+        self.Replicas = replicas
+        self.Nodes = set()
+
+        # sorted points of all nodes, each node has many points so that the keys are spread evenly
+        self._hashes: List[int] = []
+        self._nodes: List[str] = []
+
+    def Add(self, node: str):
+
+        if node in self.Nodes:
+            return
+
+        self.Nodes.add(node)
+
+        for i in range(self.Replicas):
+            hash = self._hash(f"{node}#{i}")
+            index = bisect.bisect(self._hashes, hash)
+            self._hashes.insert(index, hash)
+            self._nodes.insert(index, node)
+
+    def Remove(self, node: str):
+
+        if node not in self.Nodes:
+            return
+
+        self.Nodes.remove(node)
+
+        # only the keys of the removed node move to other nodes
+        points = [(hash, other) for (hash, other) in zip(self._hashes, self._nodes) if other != node]
+        self._hashes = [hash for (hash, _) in points]
+        self._nodes = [other for (_, other) in points]
+
+    def GetNode(self, key: str) -> str:
+
+        if not self._hashes:
+            return None
+
+        # the first point clockwise of the key
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+
+        return self._nodes[index]
+
+    def _hash(self, value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
@@ -1,60 +1,285 @@
 import asyncio
-import inspect
+import functools
+import hashlib
 import json
-import os
-from datetime import datetime
+import time
 from logging import Logger
-from typing import Dict, List
+from typing import Callable, Dict, List, Tuple
 
-import aiohttp
+from aiohttp import ClientTimeout
 
-from .BaseTypes import Checker, CheckResult, Config, DefaultChecker, Notifier
-from .Extensions.ExternalCache import ExternalCacheChecker
+from .BaseTypes import Checker, CheckResult, Config, DefaultChecker
+from .ExtensionRegistry import ExtensionRegistry
+from .FederationClient import FederationClient
+from .HttpClient import HttpClient
+from .Metrics import Metrics
+from .PingEngine import PingEngine
+from .ResultCache import ResultCache
+from .WorkerPool import WorkerPool
 
 
 class HealthChecker:
-    
+
     Config: Config
-    CheckerTypes: List[Checker]
-    Cache: Dict[str, CheckResult]
+    Extensions: ExtensionRegistry
+    Checkers: Dict[str, Checker]
+    Results: Dict[str, CheckResult]
+    Cache: ResultCache
+    PingEngine: PingEngine
+    HttpClient: HttpClient
+    FederationClient: FederationClient
     Logger: Logger
+    CycleDeadline: float
+    GroupDurations: Dict[str, float]
+    TimeoutCounts: Dict[str, int]
+    RunRequested: Callable[[List[str]], None]
+    Metrics: Metrics
+    WorkerPool: WorkerPool
 
-    def __init__(self, config: Config, extensions: List, cache: Dict[str, CheckResult], logger: Logger):
-        self.Config = config
-        self.CheckerTypes = [checkerType for checkerType in extensions if issubclass(checkerType, Checker) and not inspect.isabstract(checkerType)]
+    # the results of a run are only processed further when all of them have been shared
+    ShareTimeout: float = 10
+
+    def __init__(self, cache: ResultCache, pingEngine: PingEngine, httpClient: HttpClient, federationClient: FederationClient, logger: Logger, cycleDeadline: float = None, metrics: Metrics = None, workerPool: WorkerPool = None):
+        self.Config = Config([], {})
+        self.Extensions = None
+        self.Checkers = {}
+        self.Results = {}
         self.Cache = cache
+        self.PingEngine = pingEngine
+        self.HttpClient = httpClient
+        self.FederationClient = federationClient
         self.Logger = logger
+        self.CycleDeadline = cycleDeadline
+        self.GroupDurations = {}
+        self.TimeoutCounts = {}
+        self.RunRequested = None
+        self.Metrics = metrics if metrics is not None else Metrics()
+        self.WorkerPool = workerPool
 
-        for checkerType in self.CheckerTypes:
-            logger.info(f"Loaded checker {checkerType.Type}.")
+        if workerPool is not None:
+            workerPool.RunRequested = self._requestRuns
 
-    async def CheckHealthAsync(self) -> Dict[str, List[CheckResult]]:
-        checkResult = {group:await self._doChecksAsync(checks) for (group, checks) in self.Config.Checkers.items()}
-        return checkResult
+        self._checkDurations = self.Metrics.Histogram("healthchecker_check_duration_seconds", "The duration of the checks.", ("type", "group"))
+        self._checkTimeouts = self.Metrics.Counter("healthchecker_check_timeouts_total", "The number of checks which have timed out.", ("type",))
+        self._runDurations = self.Metrics.Histogram("healthchecker_run_duration_seconds", "The wall time of the check runs (all checks which are due at the same time run concurrently).").Labels()
+        self._runChecks = self.Metrics.Histogram("healthchecker_run_checks", "The number of checks which run concurrently in one check run.", buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)).Labels()
+
+    def SetConfig(self, config: Config, extensions: ExtensionRegistry):
+        self.Config = config
+        self.SetChecks(self._getChecks(config), extensions)
 
-    async def _doChecksAsync(self, checks: list) -> List[CheckResult]:
+    def SetChecks(self, checks: Dict[str, Dict[str, str]], extensions: ExtensionRegistry):
+        self.Extensions = extensions
 
+        # only instantiate checkers of new (or modified) checks and of reloaded extensions, unchanged checkers keep their state
         self.Logger.info(f"Instantiate checkers.")
-        checkers = []
+        checkers = {}
+        addedKeys = []
+        reloadedKeys = []
+
+        for (key, check) in checks.items():
 
-        for check in checks:
+            checker = self.Checkers.get(key)
+
+            if checker is not None and type(checker) is self._getCheckerType(check):
+                checkers[key] = checker
+                continue
 
             try:
-                checkers.append(self._getChecker(check))
+                checkers[key] = self._getChecker(check)
+
+                if checker is None:
+                    addedKeys.append(key)
+                else:
+                    reloadedKeys.append(key)
 
             except Exception as ex:
                 self.Logger.error(f"Unable to instantiate checker for check {check['type']} of group {check['group']}.", exc_info=ex)
 
+        removedKeys = [key for key in self.Checkers if key not in checkers]
+
+        self._provideServices({key: checkers[key] for key in addedKeys + reloadedKeys})
+        self.Checkers = checkers
+        self._logConfigDiff(addedKeys, removedKeys, len(reloadedKeys), len(checkers))
+
+        # forget the results of removed checks
+        self.Results = {key:result for (key, result) in self.Results.items() if key in checkers}
+
+        if self.WorkerPool is not None:
+            self.WorkerPool.SetChecks(self.GetRemoteChecks(), extensions)
+
+    def GetIntervals(self, defaultInterval: float) -> Dict[str, float]:
+
+        intervals = {}
+
+        for (key, checker) in self.Checkers.items():
+
+            interval = defaultInterval
+
+            if "interval" in checker.Settings:
+
+                try:
+                    interval = float(checker.Settings["interval"])
+
+                    if interval <= 0:
+                        raise Exception("The interval must be greater than zero.")
+
+                except Exception as ex:
+                    self.Logger.error(f"Invalid interval of check {checker.Settings['type']} of group {checker.Settings['group']}.", exc_info=ex)
+                    interval = defaultInterval
+
+            intervals[key] = interval
+
+        return intervals
+
+    def GetBatchKeys(self) -> Dict[str, str]:
+
+        batchKeys = {}
+
+        for (key, checker) in self.Checkers.items():
+
+            batchKey = checker.GetBatchKey()
+
+            if batchKey is not None:
+                batchKeys[key] = batchKey
+
+        return batchKeys
+
+    def GetCheckResult(self) -> Dict[str, List[CheckResult]]:
+        return {group: [result for (_, result) in results] for (group, results) in self.GetKeyedCheckResult().items()}
+
+    def GetKeyedCheckResult(self) -> Dict[str, List[Tuple[str, CheckResult]]]:
+
+        checkResult = {}
+
+        for (key, checker) in self.Checkers.items():
+
+            result = self.Results.get(key)
+
+            if result is not None:
+                checkResult.setdefault(checker.Settings["group"], []).append((key, result))
+
+        return checkResult
+
+    async def CheckHealthAsync(self) -> Dict[str, List[CheckResult]]:
+        self.CleanUpCache()
+        return await self.RunChecksAsync(list(self.Checkers))
+
+    async def RunChecksAsync(self, keys: List[str]) -> Dict[str, List[CheckResult]]:
+
+        # keep the config order of the checks
+        keySet = set(keys)
+        keys = [key for key in self.Checkers if key in keySet]
+        checkers = [self.Checkers[key] for key in keys]
+
+        self._provideCachedResults(checkers)
+
+        # run all checkers (of all groups) at once
+        self.Logger.info(f"Execute checks.")
+        start = time.perf_counter()
+        timedResults = await self._executeAsync(keys, checkers)
+        cycleDuration = time.perf_counter() - start
+
+        return await self._collectAsync(keys, checkers, timedResults, cycleDuration)
+
+    async def AddCheckResultsAsync(self, timedResults: Dict[str, Tuple[CheckResult, float]]) -> Dict[str, List[CheckResult]]:
+
+        # check results which have been run elsewhere (e.g. by agents) are processed like those of a local run
+        keys = [key for key in timedResults if key in self.Checkers]
+        checkers = [self.Checkers[key] for key in keys]
+
+        return await self._collectAsync(keys, checkers, [timedResults[key] for key in keys], None)
+
+    async def ExecuteChecksAsync(self, keys: List[str]) -> List[Tuple[str, CheckResult, float]]:
+
+        # only runs the checks, used by worker processes and agents which leave everything else to the main process
+        keys = [key for key in keys if key in self.Checkers]
+        timedResults = await self._executeAsync(keys, [self.Checkers[key] for key in keys])
+
+        return [(key, result, duration) for (key, (result, duration)) in zip(keys, timedResults)]
+
+    def GetRemoteChecks(self) -> Dict[str, Dict[str, str]]:
+        # the settings of all checks which can be run by other processes
+        return {key: checker.Settings for (key, checker) in self.Checkers.items() if not self._runsLocally(checker)}
+
+    def CleanUpCache(self):
+
+        # only the expired entries are visited
         self.Logger.info(f"Clean up cache.")
-        keysToDelete = []
+        expired = self.Cache.EvictExpired()
+        statistics = self.Cache.GetStatistics()
+
+        self.Logger.info(f"Cache: {statistics['entries']} entries, {expired} expired now, {statistics['hits']} hits / {statistics['misses']} misses, {statistics['expirations']} expired / {statistics['evictions']} evicted so far.")
+
+    def _logConfigDiff(self, addedKeys: List[str], removedKeys: List[str], reloaded: int, count: int):
+
+        # keys are derived from the settings, so a modified check is one that has been removed and added within the same group and type
+        addedTypes = [key.rsplit("/", 1)[0] for key in addedKeys]
+        removedTypes = [key.rsplit("/", 1)[0] for key in removedKeys]
+        changed = sum(min(addedTypes.count(checkType), removedTypes.count(checkType)) for checkType in set(addedTypes))
+
+        self.Logger.info(f"Applied config: {len(addedKeys) - changed} checks added, {changed} changed, {len(removedKeys) - changed} removed, {reloaded} reloaded, {count - len(addedKeys) - reloaded} unchanged.")
+
+    def _getChecks(self, config: Config) -> Dict[str, Dict[str, str]]:
+
+        checks = {}
+
+        for groupChecks in config.Checkers.values():
+            for check in groupChecks:
+
+                # the key is derived from the settings so that it is stable across config reloads
+                settings = json.dumps(check, sort_keys=True).encode()
+                baseKey = f"{check['group']}/{check['type']}/{hashlib.sha1(settings).hexdigest()[:12]}"
+                key = baseKey
+                i = 1
 
-        for key, value in self.Cache.items():
-            if (value.AgeMinutes > 1440):
-                keysToDelete.append(key)
+                while key in checks:
+                    i += 1
+                    key = f"{baseKey}#{i}"
 
-        for key in keysToDelete:
-            self.Logger.info(f"Delete cache entry {key}.")
-            self.Cache.pop(key)
+                checks[key] = check
+
+        return checks
+
+    def _provideServices(self, checkers: Dict[str, Checker]):
+
+        for (key, checker) in checkers.items():
+
+            # all ping checkers share one engine so that their echo requests are sent in one batch
+            if hasattr(checker, "SetPingEngine"):
+                checker.SetPingEngine(self.PingEngine)
+
+            # all HTTP based checkers share one connection pool
+            if hasattr(checker, "SetHttpClient"):
+                checker.SetHttpClient(self.HttpClient)
+
+            # all federation checkers share one client so that their queries are sent in one batch per instance
+            if hasattr(checker, "SetFederationClient"):
+                checker.SetFederationClient(self.FederationClient)
+
+            # checkers which report additional measurements (e.g. the round trip time of a ping)
+            if hasattr(checker, "SetMetrics"):
+                checker.SetMetrics(self.Metrics)
+
+            # push based checkers ask to be run when new data has arrived
+            if hasattr(checker, "SetRunRequest"):
+                checker.SetRunRequest(functools.partial(self._requestRun, key))
+
+    def _requestRun(self, key: str):
+        self._requestRuns([key])
+
+    def _requestRuns(self, keys: List[str]):
+
+        keys = [key for key in keys if key in self.Checkers]
+
+        if self.RunRequested is not None and any(keys):
+            self.RunRequested(keys)
+
+    def _runsLocally(self, checker: Checker) -> bool:
+        # checkers which are provided with cached check results depend on the cache of this process
+        return hasattr(checker, "SetCheckResult")
+
+    def _provideCachedResults(self, checkers: List[Checker]):
 
         # special handling for ExternalCacheChecker
         for checker in checkers:
@@ -66,10 +291,127 @@ class HealthChecker:
                     checkerType = checker.Settings["type"]
                     self.Logger.info(f"Provide cached check result {checker.Identifier} to checker {checkerType} in group {group}.")
 
-                checker.SetCheckResult(self.Cache.get(checker.Identifier, None))
+                checker.SetCheckResult(checkResult)
 
-        self.Logger.info(f"Execute checks.")
-        results = await asyncio.gather(*[checker.GetCheckResultAsync() for checker in checkers])
+    async def _executeAsync(self, keys: List[str], checkers: List[Checker]) -> List[Tuple[CheckResult, float]]:
+
+        if self.WorkerPool is None:
+            return await self._runCheckersAsync(checkers)
+
+        # the checks are run by the worker processes, except those which depend on the state of this process
+        localCheckers = [checker for checker in checkers if self._runsLocally(checker)]
+        remoteKeys = [key for (key, checker) in zip(keys, checkers) if not self._runsLocally(checker)]
+
+        # the workers stop their checks at the cycle deadline or when the checks time out
+        if self.CycleDeadline is not None:
+            timeout = self.CycleDeadline
+
+        else:
+            timeout = max([checker.TimeoutSeconds for checker in checkers if not self._runsLocally(checker)], default=0)
+
+        (localResults, (remoteResults, timedOutKeys)) = await asyncio.gather(
+            self._runCheckersAsync(localCheckers),
+            self.WorkerPool.RunAsync(remoteKeys, timeout))
+
+        localResults = iter(localResults)
+        timedResults = []
+
+        for (key, checker) in zip(keys, checkers):
+
+            if self._runsLocally(checker):
+                timedResults.append(next(localResults))
+
+            elif key in timedOutKeys:
+                timedResults.append((checker.Timeout(f"The check did not finish within {timeout:g} s in its worker process."), timeout))
+
+            else:
+                timedResults.append(remoteResults.get(key) or (checker.Error("The check has not been run because its worker process is not available."), 0))
+
+        return timedResults
+
+    async def _collectAsync(self, keys: List[str], checkers: List[Checker], timedResults: List[Tuple[CheckResult, float]], cycleDuration: float) -> Dict[str, List[CheckResult]]:
+
+        # group the results
+        checkResult = {}
+        self.GroupDurations = {}
+
+        for (key, checker, (result, duration)) in zip(keys, checkers, timedResults):
+            group = checker.Settings["group"]
+
+            # the check might have been removed by a config reload in the meantime
+            if self.Checkers.get(key) is checker:
+                self.Results[key] = result
+
+            checkResult.setdefault(group, []).append(result)
+            self.GroupDurations[group] = max(self.GroupDurations.get(group, 0), duration)
+            self._checkDurations.Labels(checker.Settings["type"], group).Observe(duration)
+
+        # only local runs have a wall time
+        if cycleDuration is not None:
+            self._runDurations.Observe(cycleDuration)
+            self._runChecks.Observe(len(checkers))
+
+        for (group, duration) in self.GroupDurations.items():
+            self.Logger.info(f"Group {group} finished after {duration:.3f} s.")
+
+        timedOutCheckers = [checker for (checker, (result, _)) in zip(checkers, timedResults) if result.IsTimeout]
+
+        for checker in timedOutCheckers:
+            checkerType = checker.Settings["type"]
+            self.TimeoutCounts[checkerType] = self.TimeoutCounts.get(checkerType, 0) + 1
+            self._checkTimeouts.Labels(checkerType).Inc()
+
+        if any(timedOutCheckers):
+            self.Logger.warning(f"{len(timedOutCheckers)} checks timed out. Timeouts per checker type so far: {', '.join(f'{checkerType} = {count}' for (checkerType, count) in self.TimeoutCounts.items())}.")
+
+        if cycleDuration is not None:
+            self.Logger.info(f"All {len(checkers)} checks of {len(checkResult)} groups finished after {cycleDuration:.3f} s (sum of group durations: {sum(self.GroupDurations.values()):.3f} s).")
+
+        else:
+            self.Logger.info(f"Received {len(checkers)} check results of {len(checkResult)} groups.")
+
+        # the results are stored first so that a failure while sharing them cannot lose them
+        await self._postProcessAsync(checkers, [result for (result, _) in timedResults])
+
+        return checkResult
+
+    async def _runCheckersAsync(self, checkers: List[Checker]) -> List[Tuple[CheckResult, float]]:
+
+        if self.CycleDeadline is None:
+            return await asyncio.gather(*[self._timeCheckAsync(checker) for checker in checkers])
+
+        tasks = [asyncio.ensure_future(self._timeCheckAsync(checker)) for checker in checkers]
+
+        if not any(tasks):
+            return []
+
+        (_, pending) = await asyncio.wait(tasks, timeout=self.CycleDeadline)
+
+        # checks which are still running when the deadline has passed are cancelled
+        for task in pending:
+            task.cancel()
+
+        timedResults = []
+
+        for (checker, task) in zip(checkers, tasks):
+
+            if task in pending:
+                timedResults.append((checker.Timeout(f"The check did not finish within the cycle deadline of {self.CycleDeadline:g} s."), self.CycleDeadline))
+
+            else:
+                timedResults.append(task.result())
+
+        return timedResults
+
+    async def _timeCheckAsync(self, checker: Checker) -> Tuple[CheckResult, float]:
+        start = time.perf_counter()
+        result = await checker.GetCheckResultAsync()
+
+        return (result, time.perf_counter() - start)
+
+    async def _postProcessAsync(self, checkers: List[Checker], results: List[CheckResult]):
+
+        shareTasks = []
 
         for i, checker in enumerate(checkers):
 
@@ -86,31 +428,41 @@ class HealthChecker:
             # share result?
             if "share-method" in checker.Settings:
                 self.Logger.info(f"Share check result.")
-                await self._shareResultAsync(checker.Settings, results[i])
+                shareTasks.append(self._shareResultAsync(checker.Settings, results[i]))
 
-        # return
-        return results
+        await asyncio.gather(*shareTasks)
 
     async def _shareResultAsync(self, settings: Dict[str, str], result: CheckResult):
+
+        # an unreachable share target must not affect the other check results
+        try:
+            await self._postResultAsync(settings, result)
+
+        except Exception as ex:
+            self.Logger.warning(f"Unable to share check result {settings.get('share-id')} with {settings.get('share-target')} ({type(ex).__name__}: {ex}).")
+
+    async def _postResultAsync(self, settings: Dict[str, str], result: CheckResult):
         shareMethod = settings["share-method"]
 
         if (shareMethod == "http-post" and "share-target" in settings and "share-id" in settings):
 
-            async with aiohttp.ClientSession(raise_for_status=False) as session:
+            url = settings["share-target"]
+            identifier = settings["share-id"]
+
+            params = {
+                "identifier": identifier,
+                "name": result.Name,
+                "resultType": result.ResultType.value,
+                "message": result.Message,
+            }
 
-                url = settings["share-target"]
-                identifier = settings["share-id"]
+            data = json.dumps(params)
 
-                params = {
-                    "identifier": identifier,
-                    "name": result.Name,
-                    "resultType": result.ResultType.value,
-                    "message": result.Message,
-                }
+            async with self.HttpClient.Session.post(url, data=data, timeout=ClientTimeout(total=self.ShareTimeout)) as response:
+                await response.read()
 
-                data = json.dumps(params)
-                response = await session.post(url, data=data)
-                response.close()
+    def _getCheckerType(self, check) -> type:
+        return self.Extensions.Checkers.get(check["type"], DefaultChecker)
 
     def _getChecker(self, check) -> Checker:
-        return next((checker(check) for checker in self.CheckerTypes if checker.Type == check["type"]), DefaultChecker(check))
+        return self._getCheckerType(check)(check)
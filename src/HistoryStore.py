@@ -0,0 +1,364 @@
+import bisect
+import json
+import os
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from logging import Logger
+from typing import Dict, List, Set, Tuple
+
+from .BaseTypes import CheckResult, CheckResultType
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class HistorySegment:
+    Day: str
+    CheckIds: Dict[str, int]
+    Messages: List[str]
+    MessageIds: Dict[str, int]
+    Rows: int
+
+    def __init__(self, day: str):
+        self.Day = day
+        self.CheckIds = {}
+        self.Messages = []
+        self.MessageIds = {}
+        self.Rows = 0
+
+class HistoryStore:
+
+    FolderPath: str
+    RetentionDays: int
+    Logger: Logger
+
+    # one file per column and day, the rows of all checks are appended in the order of their arrival
+    _columns: List[Tuple[str, str]] = [("checks", "I"), ("times", "d"), ("types", "B"), ("messages", "I")]
+
+    def __init__(self, folderPath: str, logger: Logger, retentionDays: int = 30):
+        self.FolderPath = folderPath
+        self.RetentionDays = retentionDays
+        self.Logger = logger
+
+        self._lock = threading.Lock()
+        self._segment: HistorySegment = None
+        self._lastTimestamps: Dict[str, float] = {}
+        self._seededDays: Set[str] = set()
+
+        os.makedirs(folderPath, exist_ok=True)
+
+    def Record(self, result: Dict[str, List[CheckResult]]):
+
+        rowsPerDay: Dict[str, list] = {}
+
+        with self._lock:
+
+            for (group, checkResults) in result.items():
+                for checkResult in checkResults:
+
+                    checkId = f"{group}/{checkResult.Name}"
+                    timestamp = checkResult.Timestamp
+                    day = self._getDay(timestamp)
+
+                    # the rows which have been written before (e.g. by the previous process) count as well
+                    if day not in self._seededDays:
+                        self._seedLastTimestamps(day)
+
+                    # cached, external and federated results are provided again with their original timestamp
+                    if timestamp <= self._lastTimestamps.get(checkId, float("-inf")):
+                        continue
+
+                    self._lastTimestamps[checkId] = timestamp
+                    rowsPerDay.setdefault(day, []).append((checkId, timestamp, checkResult.ResultType.value, checkResult.Message))
+
+            for (day, rows) in sorted(rowsPerDay.items()):
+                self._append(day, rows)
+
+    def GetUptime(self, checkId: str, start: float, end: float) -> float:
+
+        # the share of successful results within the period
+        (_, types, _, _) = self._select(checkId, start, end)
+
+        if len(types) == 0:
+            return None
+
+        if numpy is not None:
+            return float(numpy.count_nonzero(types == CheckResultType.Success.value)) / len(types)
+
+        else:
+            return types.count(CheckResultType.Success.value) / len(types)
+
+    def GetTransitions(self, checkId: str, start: float, end: float) -> List[Tuple[float, CheckResultType, CheckResultType, str]]:
+
+        (times, types, messages, segments) = self._select(checkId, start, end)
+
+        if len(types) < 2:
+            return []
+
+        if numpy is not None:
+            indices = (numpy.flatnonzero(types[1:] != types[:-1]) + 1).tolist()
+
+        else:
+            indices = [i for i in range(1, len(types)) if types[i] != types[i - 1]]
+
+        # messages are resolved only for the transitions, using the string table of the segment of the row
+        offsets = [offset for (offset, _) in segments]
+        transitions = []
+
+        for i in indices:
+            segment = segments[bisect.bisect_right(offsets, i) - 1][1]
+            transitions.append((float(times[i]), CheckResultType(int(types[i - 1])), CheckResultType(int(types[i])), segment.Messages[int(messages[i])]))
+
+        return transitions
+
+    def GetCheckIds(self, start: float, end: float) -> List[str]:
+
+        checkIds = set()
+
+        for day in self._getDays(start, end):
+            segment = self._loadSegment(day)
+
+            if segment is not None:
+                checkIds.update(segment.CheckIds)
+
+        return sorted(checkIds)
+
+    def CleanUp(self):
+
+        # segments are deleted as a whole once they are older than the retention period
+        oldestDay = self._getDay(time.time() - self.RetentionDays * 86400)
+
+        for fileName in os.listdir(self.FolderPath):
+
+            day = fileName.split(".", 1)[0]
+
+            if len(day) == 10 and day < oldestDay:
+                self.Logger.info(f"Delete history file {fileName}.")
+                os.remove(os.path.join(self.FolderPath, fileName))
+
+    def _append(self, day: str, rows: List[Tuple[str, float, int, str]]):
+
+        if self._segment is None or self._segment.Day != day:
+            self._segment = self._loadSegment(day, repair=True) or HistorySegment(day)
+            self.CleanUp()
+
+        segment = self._segment
+        newCheckIds = []
+        newMessages = []
+        columns = { name: array(typeCode) for (name, typeCode) in self._columns }
+
+        # check ids and messages are interned per segment
+        for (checkId, timestamp, resultType, message) in rows:
+
+            checkIndex = segment.CheckIds.get(checkId)
+
+            if checkIndex is None:
+                checkIndex = len(segment.CheckIds)
+                segment.CheckIds[checkId] = checkIndex
+                newCheckIds.append(checkId)
+
+            messageIndex = segment.MessageIds.get(message)
+
+            if messageIndex is None:
+                messageIndex = len(segment.Messages)
+                segment.Messages.append(message)
+                segment.MessageIds[message] = messageIndex
+                newMessages.append(message)
+
+            columns["checks"].append(checkIndex)
+            columns["times"].append(timestamp)
+            columns["types"].append(resultType)
+            columns["messages"].append(messageIndex)
+
+        # the string tables are written before the rows which refer to them
+        self._appendStrings(day, "checks.jsonl", newCheckIds)
+        self._appendStrings(day, "messages.jsonl", newMessages)
+
+        for (name, values) in columns.items():
+            with open(self._getFilePath(day, name), "ab") as file:
+                values.tofile(file)
+
+        segment.Rows += len(rows)
+
+    def _seedLastTimestamps(self, day: str):
+
+        self._seededDays.add(day)
+        segment = self._segment if self._segment is not None and self._segment.Day == day else self._loadSegment(day)
+
+        if segment is None or segment.Rows == 0:
+            return
+
+        checkIds = list(segment.CheckIds)
+        checks = self._readColumn(day, "checks", "I", segment.Rows)
+        times = self._readColumn(day, "times", "d", segment.Rows)
+
+        for (checkIndex, timestamp) in zip(checks, times):
+
+            checkId = checkIds[checkIndex]
+
+            if timestamp > self._lastTimestamps.get(checkId, float("-inf")):
+                self._lastTimestamps[checkId] = timestamp
+
+    def _appendStrings(self, day: str, fileName: str, values: List[str]):
+
+        if len(values) > 0:
+            with open(os.path.join(self.FolderPath, f"{day}.{fileName}"), "a", encoding="utf8") as file:
+                file.write("".join(json.dumps(value) + "\n" for value in values))
+
+    def _loadSegment(self, day: str, repair: bool = False) -> HistorySegment:
+
+        filePath = os.path.join(self.FolderPath, f"{day}.checks.jsonl")
+
+        if not os.path.isfile(filePath):
+            return None
+
+        segment = HistorySegment(day)
+        segment.CheckIds = {checkId: i for (i, checkId) in enumerate(self._readStrings(filePath, repair))}
+        segment.Messages = self._readStrings(os.path.join(self.FolderPath, f"{day}.messages.jsonl"), repair)
+        segment.MessageIds = {message: i for (i, message) in enumerate(segment.Messages)}
+
+        # the columns might have different lengths after a crash, only complete rows are valid
+        sizes = []
+
+        for (name, typeCode) in self._columns:
+
+            columnFilePath = self._getFilePath(day, name)
+            size = os.path.getsize(columnFilePath) if os.path.isfile(columnFilePath) else 0
+            sizes.append((size, array(typeCode).itemsize))
+
+        segment.Rows = min(size // itemSize for (size, itemSize) in sizes)
+
+        if repair and any(size != segment.Rows * itemSize for (size, itemSize) in sizes):
+
+            self.Logger.warning(f"Truncate incomplete rows of history segment {day}.")
+
+            for (name, typeCode) in self._columns:
+                with open(self._getFilePath(day, name), "ab") as file:
+                    file.truncate(segment.Rows * array(typeCode).itemsize)
+
+        return segment
+
+    def _readStrings(self, filePath: str, repair: bool) -> List[str]:
+
+        values = []
+        length = 0
+
+        if not os.path.isfile(filePath):
+            return values
+
+        with open(filePath, "rb") as file:
+            data = file.read()
+
+        # a line which has not been written completely (e.g. after a crash) is dropped
+        for line in data.splitlines(keepends=True):
+
+            if not line.endswith(b"\n"):
+                break
+
+            try:
+                values.append(json.loads(line))
+            except ValueError:
+                break
+
+            length += len(line)
+
+        if repair and length != len(data):
+
+            with open(filePath, "ab") as file:
+                file.truncate(length)
+
+        return values
+
+    def _select(self, checkId: str, start: float, end: float):
+
+        times = []
+        types = []
+        messages = []
+        segments = []
+        offset = 0
+
+        for day in self._getDays(start, end):
+
+            # the current segment grows while it is read, so only the rows known so far are read
+            with self._lock:
+                segment = self._segment if self._segment is not None and self._segment.Day == day else self._loadSegment(day)
+                rows = segment.Rows if segment is not None else 0
+
+            if segment is None or checkId not in segment.CheckIds:
+                continue
+
+            checkIndex = segment.CheckIds[checkId]
+            (dayTimes, dayTypes, dayMessages) = self._selectFromSegment(day, rows, checkIndex, start, end)
+            times.append(dayTimes)
+            types.append(dayTypes)
+            messages.append(dayMessages)
+            segments.append((offset, segment))
+            offset += len(dayTimes)
+
+        if numpy is not None:
+
+            if len(segments) == 0:
+                return (numpy.array([], dtype=numpy.float64), numpy.array([], dtype=numpy.uint8), numpy.array([], dtype=numpy.uint32), segments)
+
+            return (numpy.concatenate(times), numpy.concatenate(types), numpy.concatenate(messages), segments)
+
+        else:
+            return (
+                [value for dayTimes in times for value in dayTimes],
+                [value for dayTypes in types for value in dayTypes],
+                [value for dayMessages in messages for value in dayMessages],
+                segments
+            )
+
+    def _selectFromSegment(self, day: str, rows: int, checkIndex: int, start: float, end: float):
+
+        if numpy is not None:
+
+            # vectorized scan of the columns
+            checks = numpy.fromfile(self._getFilePath(day, "checks"), dtype=numpy.uint32, count=rows)
+            times = numpy.fromfile(self._getFilePath(day, "times"), dtype=numpy.float64, count=rows)
+            types = numpy.fromfile(self._getFilePath(day, "types"), dtype=numpy.uint8, count=rows)
+            messages = numpy.fromfile(self._getFilePath(day, "messages"), dtype=numpy.uint32, count=rows)
+            mask = (checks == checkIndex) & (times >= start) & (times < end)
+
+            return (times[mask], types[mask], messages[mask])
+
+        else:
+            checks = self._readColumn(day, "checks", "I", rows)
+            times = self._readColumn(day, "times", "d", rows)
+            types = self._readColumn(day, "types", "B", rows)
+            messages = self._readColumn(day, "messages", "I", rows)
+            indices = [i for i in range(rows) if checks[i] == checkIndex and start <= times[i] < end]
+
+            return ([times[i] for i in indices], [types[i] for i in indices], [messages[i] for i in indices])
+
+    def _readColumn(self, day: str, name: str, typeCode: str, rows: int) -> array:
+
+        values = array(typeCode)
+
+        with open(self._getFilePath(day, name), "rb") as file:
+            values.fromfile(file, rows)
+
+        return values
+
+    def _getDays(self, start: float, end: float) -> List[str]:
+
+        days = []
+        current = datetime.fromtimestamp(start, timezone.utc).date()
+        last = datetime.fromtimestamp(end, timezone.utc).date()
+
+        while current <= last:
+            days.append(current.isoformat())
+            current += timedelta(days=1)
+
+        return days
+
+    def _getDay(self, timestamp: float) -> str:
+        return datetime.fromtimestamp(timestamp, timezone.utc).date().isoformat()
+
+    def _getFilePath(self, day: str, name: str) -> str:
+        return os.path.join(self.FolderPath, f"{day}.{name}.bin")
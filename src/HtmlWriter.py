@@ -1,12 +1,70 @@
+import asyncio
+import gzip
+import hashlib
 import os
+import tempfile
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from .BaseTypes import CheckResult, CheckResultType
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class HtmlPage:
+
+    Content: bytes
+    GzipContent: bytes
+    BrotliContent: bytes
+    ETag: str
+
+    # moderate levels, the page is compressed again whenever a check result changes
+    GzipLevel: int = 6
+    BrotliQuality: int = 5
+
+    def __init__(self, content: bytes):
+        self.Content = content
+        self.GzipContent = gzip.compress(content, compresslevel=self.GzipLevel, mtime=0)
+        self.BrotliContent = brotli.compress(content, quality=self.BrotliQuality) if brotli is not None else None
+        self.ETag = f'"{hashlib.sha1(content).hexdigest()[:16]}"'
+
+    def GetContent(self, acceptEncoding: str) -> Tuple[bytes, str]:
+
+        encodings = set()
+
+        # e.g. "gzip, deflate, br;q=0.9"
+        if acceptEncoding is not None:
+            for value in acceptEncoding.split(","):
+
+                (encoding, _, parameters) = value.strip().partition(";")
+                quality = 1.0
+
+                if parameters.strip().startswith("q="):
+
+                    try:
+                        quality = float(parameters.strip()[2:])
+                    except ValueError:
+                        pass
+
+                if quality > 0:
+                    encodings.add(encoding.strip().lower())
+
+        if "br" in encodings and self.BrotliContent is not None:
+            return (self.BrotliContent, "br")
+
+        elif "gzip" in encodings:
+            return (self.GzipContent, "gzip")
+
+        else:
+            return (self.Content, None)
 
 class HtmlWriter:
 
+    Page: HtmlPage
+
     _indexFilePath: str
     _refreshInterval: int
 
@@ -14,9 +72,12 @@ class HtmlWriter:
         self._indexFilePath = indexFilePath
         self._refreshInterval = refreshInterval
 
+        # rendered fragments per check state and per group state
+        self._checkFragments: Dict[tuple, str] = {}
+        self._groupFragments: Dict[tuple, str] = {}
+
         if not os.path.isfile(self._indexFilePath):
-            with open(self._indexFilePath, "w") as file:
-                file.write("""
+            self._write("""
 <h2>The checks are currently being executed, please wait a moment ...</h2>
 <script>
     setTimeout(function() {{
@@ -25,9 +86,36 @@ class HtmlWriter:
 </script>
 """)
 
-    def WriteResult(self, result: Dict[str, List[CheckResult]]):
+        with open(self._indexFilePath, "rb") as file:
+            self.Page = HtmlPage(file.read())
+
+    async def WriteResultAsync(self, result: Dict[str, List[CheckResult]]):
 
-        contents = [self._getGroupContent(group, checkResults) for (group, checkResults) in result.items()]
+        # only fragments of modified checks and groups are rendered again, unused fragments are dropped
+        checkFragments = {}
+        groupFragments = {}
+        contents = []
+
+        for (group, checkResults) in result.items():
+
+            states = [self._getState(checkResult) for checkResult in checkResults]
+            groupState = (group, tuple(states))
+
+            for (state, checkResult) in zip(states, checkResults):
+
+                if state not in checkFragments:
+                    checkFragments[state] = self._checkFragments.get(state) or self._getContent(checkResult)
+
+            groupFragment = self._groupFragments.get(groupState)
+
+            if groupFragment is None:
+                groupFragment = self._getGroupContent(group, [checkFragments[state] for state in states])
+
+            groupFragments[groupState] = groupFragment
+            contents.append(groupFragment)
+
+        self._checkFragments = checkFragments
+        self._groupFragments = groupFragments
         joinChar = "\n"
 
         renderFragment = f"""
@@ -58,12 +146,37 @@ class HtmlWriter:
 </html>
 """
 
-        with open(self._indexFilePath, "w") as file:
-            file.write(renderFragment)
+        # writing and compressing the page would block the event loop, the old page is served until the new one is ready
+        page = await asyncio.get_running_loop().run_in_executor(None, self._writePage, renderFragment)
+
+        # the page is replaced as a whole, so it can be served by other threads without locking
+        self.Page = page
+
+    def _writePage(self, content: str) -> HtmlPage:
+        self._write(content)
+        return HtmlPage(content.encode("utf8"))
 
-    def _getGroupContent(self, group: str, checkResults: List[CheckResult]) -> str:
+    def _write(self, content: str):
+
+        # readers see either the old or the new file, but never a partially written one
+        folderPath = os.path.dirname(os.path.abspath(self._indexFilePath))
+        (fileDescriptor, tempFilePath) = tempfile.mkstemp(dir=folderPath, prefix=".index-", suffix=".tmp")
+
+        try:
+            with os.fdopen(fileDescriptor, "w", encoding="utf8") as file:
+                file.write(content)
+
+            os.replace(tempFilePath, self._indexFilePath)
+
+        except:
+            os.remove(tempFilePath)
+            raise
+
+    def _getState(self, checkResult: CheckResult) -> tuple:
+        return (checkResult.Name, checkResult.ResultType, checkResult.Message, checkResult.InfoUrl, any(checkResult.Notifiers))
+
+    def _getGroupContent(self, group: str, contents: List[str]) -> str:
         joinChar = "\n"
-        contents = [self._getContent(checkResult) for checkResult in checkResults]
         renderFragment = f"""
 <h2>{group}</h2>
 <div class="group">
@@ -88,9 +201,13 @@ class HtmlWriter:
             error = " error"
             content = f'<div class="check-icon"><i class="fas fa-exclamation-circle"></i></div>'
 
+        elif checkResult.ResultType == CheckResultType.Timeout:
+            error = " error"
+            content = f'<div class="check-icon"><i class="fas fa-hourglass-end"></i></div>'
+
         else:
             raise Exception(f"The check result type '{checkResult.ResultType}' is unknown")
-            
+
         if not any(checkResult.Notifiers):
             content = f'<div class="check-icon"><i class="fas fa-volume-mute"></i></div>'
 
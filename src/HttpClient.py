@@ -0,0 +1,115 @@
+from logging import Logger
+from typing import Dict
+
+import aiohttp
+
+
+class HttpClient:
+
+    Limit: int
+    LimitPerHost: int
+    KeepAliveTimeout: float
+    DnsCacheTtl: int
+    Timeout: float
+    ConnectTimeout: float
+    Logger: Logger
+
+    # the checks time out by themselves (30 s by default), the session limits requests without a timeout of their own
+    def __init__(self, logger: Logger, limit: int = 100, limitPerHost: int = 10, keepAliveTimeout: float = 90, dnsCacheTtl: int = 300, timeout: float = 60, connectTimeout: float = 10):
+        self.Limit = limit
+        self.LimitPerHost = limitPerHost
+        self.KeepAliveTimeout = keepAliveTimeout
+        self.DnsCacheTtl = dnsCacheTtl
+        self.Timeout = timeout
+        self.ConnectTimeout = connectTimeout
+        self.Logger = logger
+
+        self._session: aiohttp.ClientSession = None
+        self._requests: int = 0
+        self._connectionsCreated: int = 0
+        self._connectionsReused: int = 0
+        self._dnsCacheHits: int = 0
+        self._dnsCacheMisses: int = 0
+
+    @property
+    def Session(self) -> aiohttp.ClientSession:
+
+        # the session must be created from within the running event loop
+        if self._session is None or self._session.closed:
+
+            connector = aiohttp.TCPConnector(
+                limit=self.Limit,
+                limit_per_host=self.LimitPerHost,
+                keepalive_timeout=self.KeepAliveTimeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.DnsCacheTtl)
+
+            timeout = aiohttp.ClientTimeout(total=self.Timeout, connect=self.ConnectTimeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[self._getTraceConfig()])
+
+        return self._session
+
+    def GetStatistics(self) -> Dict[str, float]:
+
+        connectionsAcquired = self._connectionsCreated + self._connectionsReused
+        openConnections = 0
+        idleConnections = 0
+
+        if self._session is not None and not self._session.closed:
+
+            # aiohttp does not expose the pool, so its private members are read if they (still) exist
+            connector = self._session.connector
+            pool = getattr(connector, "_conns", None)
+            acquired = getattr(connector, "_acquired", None)
+
+            if isinstance(pool, dict) and acquired is not None:
+                idleConnections = sum(len(connections) for connections in pool.values())
+                openConnections = idleConnections + len(acquired)
+
+        return {
+            "requests": self._requests,
+            "connectionsCreated": self._connectionsCreated,
+            "connectionsReused": self._connectionsReused,
+            "reuseRatio": self._connectionsReused / connectionsAcquired if connectionsAcquired > 0 else 0,
+            "openConnections": openConnections,
+            "idleConnections": idleConnections,
+            "dnsCacheHits": self._dnsCacheHits,
+            "dnsCacheMisses": self._dnsCacheMisses
+        }
+
+    def LogStatistics(self):
+        statistics = self.GetStatistics()
+        self.Logger.info(f"HTTP client: {statistics['requests']} requests, {statistics['connectionsCreated']} connections created, {statistics['connectionsReused']} reused (ratio {statistics['reuseRatio']:.2f}), {statistics['openConnections']} open ({statistics['idleConnections']} idle), DNS cache {statistics['dnsCacheHits']} hits / {statistics['dnsCacheMisses']} misses.")
+
+    async def CloseAsync(self):
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _getTraceConfig(self) -> aiohttp.TraceConfig:
+
+        traceConfig = aiohttp.TraceConfig()
+
+        async def onRequestStart(session, context, params):
+            self._requests += 1
+
+        async def onConnectionCreateEnd(session, context, params):
+            self._connectionsCreated += 1
+
+        async def onConnectionReuseconn(session, context, params):
+            self._connectionsReused += 1
+
+        async def onDnsCacheHit(session, context, params):
+            self._dnsCacheHits += 1
+
+        async def onDnsCacheMiss(session, context, params):
+            self._dnsCacheMisses += 1
+
+        traceConfig.on_request_start.append(onRequestStart)
+        traceConfig.on_connection_create_end.append(onConnectionCreateEnd)
+        traceConfig.on_connection_reuseconn.append(onConnectionReuseconn)
+        traceConfig.on_dns_cache_hit.append(onDnsCacheHit)
+        traceConfig.on_dns_cache_miss.append(onDnsCacheMiss)
+
+        return traceConfig
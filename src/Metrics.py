@@ -0,0 +1,179 @@
+import bisect
+import math
+from typing import Callable, Dict, List, Tuple
+
+
+class Counter:
+    Value: float
+
+    def __init__(self):
+        self.Value = 0
+
+    def Inc(self, value: float = 1):
+        self.Value += value
+
+class Gauge:
+    Value: float
+
+    def __init__(self):
+        self.Value = 0
+
+    def Set(self, value: float):
+        self.Value = value
+
+class Histogram:
+    Buckets: Tuple[float, ...]
+    Counts: List[int]
+    Sum: float
+    Count: int
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.Buckets = buckets
+
+        # one count per bucket plus one for +Inf, allocated once so that an observation only increments numbers
+        self.Counts = [0] * (len(buckets) + 1)
+        self.Sum = 0
+        self.Count = 0
+
+    def Observe(self, value: float):
+        self.Counts[bisect.bisect_left(self.Buckets, value)] += 1
+        self.Sum += value
+        self.Count += 1
+
+class MetricFamily:
+    Name: str
+    Help: str
+    Type: str
+    LabelNames: Tuple[str, ...]
+
+    def __init__(self, name: str, help: str, type: str, labelNames: Tuple[str, ...], create: Callable[[], object]):
+        self.Name = name
+        self.Help = help
+        self.Type = type
+        self.LabelNames = labelNames
+
+        self._create = create
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def Labels(self, *labelValues: str):
+
+        # the children are cached, so callers on hot paths may also keep a reference to them
+        child = self._children.get(labelValues)
+
+        if child is None:
+
+            if len(labelValues) != len(self.LabelNames):
+                raise Exception(f"The metric {self.Name} requires the labels {', '.join(self.LabelNames)}.")
+
+            child = self._create()
+            self._children[labelValues] = child
+
+        return child
+
+    def GetChildren(self) -> List[Tuple[Tuple[str, ...], object]]:
+        # a copy because the metrics are rendered by other threads
+        return list(self._children.items())
+
+class Metrics:
+
+    DefaultBuckets: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+
+        # values which are read when the metrics are rendered (e.g. the size of the cache)
+        self._functions: List[Tuple[str, str, str, Callable[[], float]]] = []
+
+    def Counter(self, name: str, help: str, labelNames: Tuple[str, ...] = ()) -> MetricFamily:
+        return self._getFamily(name, help, "counter", labelNames, Counter)
+
+    def Gauge(self, name: str, help: str, labelNames: Tuple[str, ...] = ()) -> MetricFamily:
+        return self._getFamily(name, help, "gauge", labelNames, Gauge)
+
+    def Histogram(self, name: str, help: str, labelNames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = None) -> MetricFamily:
+        buckets = tuple(sorted(buckets)) if buckets is not None else self.DefaultBuckets
+        return self._getFamily(name, help, "histogram", labelNames, lambda: Histogram(buckets))
+
+    def AddCounterFunction(self, name: str, help: str, function: Callable[[], float]):
+        self._functions.append((name, help, "counter", function))
+
+    def AddGaugeFunction(self, name: str, help: str, function: Callable[[], float]):
+        self._functions.append((name, help, "gauge", function))
+
+    def Render(self) -> bytes:
+
+        # text exposition format (version 0.0.4)
+        lines = []
+
+        for family in list(self._families.values()):
+
+            lines.append(f"# HELP {family.Name} {self._escapeHelp(family.Help)}")
+            lines.append(f"# TYPE {family.Name} {family.Type}")
+
+            for (labelValues, child) in sorted(family.GetChildren(), key=lambda item: item[0]):
+
+                labels = list(zip(family.LabelNames, labelValues))
+
+                if family.Type == "histogram":
+
+                    cumulativeCount = 0
+
+                    for (bucket, count) in zip(child.Buckets + (math.inf,), list(child.Counts)):
+                        cumulativeCount += count
+                        lines.append(f"{family.Name}_bucket{self._formatLabels(labels + [('le', self._formatValue(bucket))])} {cumulativeCount}")
+
+                    lines.append(f"{family.Name}_sum{self._formatLabels(labels)} {self._formatValue(child.Sum)}")
+                    lines.append(f"{family.Name}_count{self._formatLabels(labels)} {child.Count}")
+
+                else:
+                    lines.append(f"{family.Name}{self._formatLabels(labels)} {self._formatValue(child.Value)}")
+
+        for (name, help, type, function) in self._functions:
+            lines.append(f"# HELP {name} {self._escapeHelp(help)}")
+            lines.append(f"# TYPE {name} {type}")
+            lines.append(f"{name} {self._formatValue(function())}")
+
+        return ("\n".join(lines) + "\n").encode("utf8")
+
+    def _getFamily(self, name: str, help: str, type: str, labelNames: Tuple[str, ...], create: Callable[[], object]) -> MetricFamily:
+
+        family = self._families.get(name)
+
+        if family is None:
+            family = MetricFamily(name, help, type, tuple(labelNames), create)
+            self._families[name] = family
+
+        elif family.Type != type or family.LabelNames != tuple(labelNames):
+            raise Exception(f"The metric {name} has already been registered with another type or other labels.")
+
+        return family
+
+    def _formatLabels(self, labels: List[Tuple[str, str]]) -> str:
+
+        if not any(labels):
+            return ""
+
+        return "{" + ",".join(f'{name}="{self._escapeLabelValue(str(value))}"' for (name, value) in labels) + "}"
+
+    def _formatValue(self, value: float) -> str:
+
+        if value == math.inf:
+            return "+Inf"
+
+        elif value == -math.inf:
+            return "-Inf"
+
+        elif math.isnan(value):
+            return "NaN"
+
+        elif float(value).is_integer():
+            return str(int(value))
+
+        else:
+            return repr(float(value))
+
+    def _escapeHelp(self, help: str) -> str:
+        return help.replace("\\", "\\\\").replace("\n", "\\n")
+
+    def _escapeLabelValue(self, value: str) -> str:
+        return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
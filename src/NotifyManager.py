@@ -1,41 +1,174 @@
-import inspect
+import asyncio
+import hashlib
+import json
+import time
 from logging import Logger
 from typing import Dict, List
 
 from .BaseTypes import CheckResult, Config, Notifier
+from .ExtensionRegistry import ExtensionRegistry
+from .HttpClient import HttpClient
+from .Metrics import Metrics
 
 
+class NotifierStatistics:
+    Notifications: int
+    Failures: int
+    Timeouts: int
+    LastLatency: float
+    MaxLatency: float
+    TotalLatency: float
+
+    def __init__(self):
+        self.Notifications = 0
+        self.Failures = 0
+        self.Timeouts = 0
+        self.LastLatency = 0
+        self.MaxLatency = 0
+        self.TotalLatency = 0
+
 class NotifyManager:
     
     Config: Config
-    NotifierTypes: List[Notifier]
+    Extensions: ExtensionRegistry
+    Notifiers: Dict[str, Notifier]
+    Statistics: Dict[str, NotifierStatistics]
+    HttpClient: HttpClient
     Logger: Logger
+    Metrics: Metrics
 
-    def __init__(self, config: Config, extensions: List, logger: Logger):
-        self.Config = config
-        self.NotifierTypes = [notifierType for notifierType in extensions if issubclass(notifierType, Notifier) and not inspect.isabstract(notifierType)]
+    def __init__(self, httpClient: HttpClient, logger: Logger, metrics: Metrics = None):
+        self.Config = Config([], {})
+        self.Extensions = None
+        self.Notifiers = {}
+        self.Statistics = {}
+        self.HttpClient = httpClient
         self.Logger = logger
+        self.Metrics = metrics if metrics is not None else Metrics()
+
+        # removed or replaced notifiers are closed in the background
+        self._closeTasks = set()
+
+        self._notifierDurations = self.Metrics.Histogram("healthchecker_notifier_duration_seconds", "The duration of the notifications.", ("notifier",))
+        self._notifierFailures = self.Metrics.Counter("healthchecker_notifier_failures_total", "The number of failed notifications.", ("notifier", "reason"))
+
+    def SetConfig(self, config: Config, extensions: ExtensionRegistry):
+        self.Config = config
+        self.Extensions = extensions
+
+        # only instantiate notifiers which are new or have been modified or reloaded, unchanged notifiers keep their state
+        notifiers = {}
+        added = 0
+
+        for notify in config.Notifiers:
+
+            key = hashlib.sha1(json.dumps(notify, sort_keys=True).encode()).hexdigest()
+            notifier = self.Notifiers.get(key)
+
+            if notifier is not None and type(notifier) is self.Extensions.Notifiers.get(notify["type"]):
+                notifiers[key] = notifier
+                continue
+
+            try:
+                notifier = self._getNotifier(notify)
+
+                # HTTP based notifiers share the connection pool of the checkers
+                if hasattr(notifier, "SetHttpClient"):
+                    notifier.SetHttpClient(self.HttpClient)
+
+                notifiers[key] = notifier
+                added += 1
+
+            except Exception as ex:
+                self.Logger.error(f"Unable to instantiate notifier {notify.get('id')} of type {notify.get('type')}.", exc_info=ex)
+
+        removedNotifiers = [notifier for (key, notifier) in self.Notifiers.items() if key not in notifiers]
+        removed = len(removedNotifiers)
+        self.Notifiers = notifiers
+
+        for notifier in removedNotifiers:
+            task = asyncio.ensure_future(self._closeAsync(notifier))
+            self._closeTasks.add(task)
+            task.add_done_callback(self._closeTasks.discard)
+
+        self.Logger.info(f"Applied config: {added} notifiers added or changed, {removed} removed or changed, {len(notifiers) - added} unchanged.")
 
     async def NotifyAsync(self, checkResult: Dict[str, List[CheckResult]]):
 
-        notifiers = [self._getNotifier(notify) for notify in self.Config.Notifiers]
+        # assign the results to the notifiers in a single pass
+        index: Dict[str, Dict[str, List[CheckResult]]] = {}
+
+        for (group, results) in checkResult.items():
+            for result in results:
+                for notifierId in result.Notifiers:
+                    index.setdefault(notifierId, {}).setdefault(group, []).append(result)
+
+        # notifiers run concurrently, so a slow one does not delay the others
+        await asyncio.gather(*[self._notifyAsync(notifier, index.get(notifier.Id)) for notifier in self.Notifiers.values()])
+
+    async def _notifyAsync(self, notifier: Notifier, checkResult: Dict[str, List[CheckResult]]):
+
+        statistics = self.Statistics.setdefault(notifier.Id, NotifierStatistics())
+
+        if checkResult is not None:
+            self.Logger.info(f"Notifier {notifier.Id} notifies groups {', '.join(checkResult)}.")
+            start = time.perf_counter()
+
+            try:
+                await asyncio.wait_for(notifier.NotifyAsync(checkResult), notifier.TimeoutSeconds)
+                statistics.Notifications += 1
+
+            except asyncio.TimeoutError:
+                statistics.Timeouts += 1
+                self._notifierFailures.Labels(notifier.Id, "timeout").Inc()
+                self.Logger.error(f"Notifier {notifier.Id} timed out after {notifier.TimeoutSeconds:g} s.")
 
-        for notifier in notifiers:
-            filteredCheckResult = {}
+            except Exception as ex:
+                statistics.Failures += 1
+                self._notifierFailures.Labels(notifier.Id, "error").Inc()
+                self.Logger.error(msg=str(ex), exc_info=ex)
 
-            for (group, results) in checkResult.items():
-                filteredResults = [result for result in results if notifier.Id in result.Notifiers]
+            latency = time.perf_counter() - start
+            self._notifierDurations.Labels(notifier.Id).Observe(latency)
+            statistics.LastLatency = latency
+            statistics.MaxLatency = max(statistics.MaxLatency, latency)
+            statistics.TotalLatency += latency
+            self.Logger.info(f"Notifier {notifier.Id} finished after {latency:.3f} s ({statistics.Notifications} notifications, {statistics.Failures} failures, {statistics.Timeouts} timeouts so far).")
 
-                if any(filteredResults):
-                    filteredCheckResult[group] = filteredResults
+        # allows notifiers to send collected notifications or to close idle connections
+        try:
+            await asyncio.wait_for(notifier.FlushAsync(), notifier.TimeoutSeconds)
 
-            if any(filteredCheckResult):
-                self.Logger.info(f"Notifier {notifier.Id} notifies group {group}.")
+        except asyncio.TimeoutError:
+            statistics.Timeouts += 1
+            self._notifierFailures.Labels(notifier.Id, "timeout").Inc()
+            self.Logger.error(f"Notifier {notifier.Id} timed out after {notifier.TimeoutSeconds:g} s.")
 
-                try:
-                    await notifier.NotifyAsync(filteredCheckResult)
-                except Exception as ex:
-                    self.Logger.error(msg=str(ex), exc_info=ex)
+        except Exception as ex:
+            statistics.Failures += 1
+            self._notifierFailures.Labels(notifier.Id, "error").Inc()
+            self.Logger.error(msg=str(ex), exc_info=ex)
+
+    async def CloseAsync(self):
+        await asyncio.gather(*[self._closeAsync(notifier) for notifier in self.Notifiers.values()], *self._closeTasks)
+        self.Notifiers = {}
+
+    async def _closeAsync(self, notifier: Notifier):
+
+        try:
+            await asyncio.wait_for(notifier.CloseAsync(), notifier.TimeoutSeconds)
+
+        except asyncio.TimeoutError:
+            self.Logger.error(f"Notifier {notifier.Id} timed out after {notifier.TimeoutSeconds:g} s while closing.")
+
+        except Exception as ex:
+            self.Logger.error(msg=str(ex), exc_info=ex)
 
     def _getNotifier(self, notify) -> Notifier:
-        return next((notifier(notify) for notifier in self.NotifierTypes if notifier.Type == notify["type"]))
+
+        notifierType = self.Extensions.Notifiers.get(notify["type"])
+
+        if notifierType is None:
+            raise Exception(f"Could not find notifier '{notify['type']}'.")
+
+        return notifierType(notify)
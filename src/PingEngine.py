@@ -0,0 +1,272 @@
+import asyncio
+import ipaddress
+import platform
+import re
+import socket
+import struct
+import time
+from logging import Logger
+from typing import Dict, List, Tuple
+
+
+class PingResult:
+    Success: bool
+    RoundTripTime: float
+    Message: str
+
+    def __init__(self, success: bool, roundTripTime: float = None, message: str = ""):
+        self.Success = success
+        self.RoundTripTime = roundTripTime
+        self.Message = message
+
+class PingEngine:
+
+    Timeout: float
+    MaxProcesses: int
+    Logger: Logger
+
+    _echoRequest: int = 8
+    _echoReply: int = 0
+    _timeRegex = re.compile(r"time[=<]\s*([\d.]+)\s*ms")
+
+    def __init__(self, logger: Logger, timeout: float = 4, maxProcesses: int = 32):
+        self.Timeout = timeout
+        self.MaxProcesses = maxProcesses
+        self.Logger = logger
+
+        self._socket: socket.socket = None
+        self._useSubprocess: bool = False
+        self._identifier: int = None
+        self._sequence: int = 0
+        self._pending: Dict[int, Tuple[str, float, asyncio.Future]] = {}
+        self._queue: List[Tuple[str, int, asyncio.Future]] = []
+        self._flushScheduled: bool = False
+        self._processSemaphore: asyncio.Semaphore = None
+
+    async def PingAsync(self, address: str, timeout: float = None) -> PingResult:
+
+        if timeout is None:
+            timeout = self.Timeout
+
+        loop = asyncio.get_running_loop()
+
+        if not self._useSubprocess and self._socket is None:
+            self._openSocket(loop)
+
+        if self._useSubprocess:
+            return await self._pingSubprocessAsync(address, timeout)
+
+        try:
+            ip = await self._resolveAsync(loop, address)
+        except Exception:
+            return PingResult(False, message="Could not resolve host.")
+
+        # queue the request, all requests of the current loop iteration are sent in one batch
+        sequence = self._nextSequence()
+        future = loop.create_future()
+        self._queue.append((ip, sequence, future))
+
+        if not self._flushScheduled:
+            self._flushScheduled = True
+            loop.call_soon(self._flush, loop)
+
+        try:
+            roundTripTime = await asyncio.wait_for(future, timeout)
+            return PingResult(True, roundTripTime)
+
+        except asyncio.TimeoutError:
+            return PingResult(False, message="Request timed out.")
+
+        except OSError as ex:
+            return PingResult(False, message=str(ex))
+
+        finally:
+            self._pending.pop(sequence, None)
+
+    def Close(self):
+
+        if self._socket is not None:
+
+            try:
+                asyncio.get_running_loop().remove_reader(self._socket.fileno())
+            except Exception:
+                pass
+
+            self._socket.close()
+            self._socket = None
+
+    def _openSocket(self, loop: asyncio.AbstractEventLoop):
+
+        try:
+            # unprivileged ICMP datagram socket (Linux: net.ipv4.ping_group_range, macOS)
+            icmpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            icmpSocket.setblocking(False)
+
+            # replies of a whole batch arrive at once, so make room for them
+            try:
+                icmpSocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+            except OSError:
+                pass
+
+            try:
+                loop.add_reader(icmpSocket.fileno(), self._onReadable)
+            except Exception:
+                icmpSocket.close()
+                raise
+
+            self._socket = icmpSocket
+
+        except Exception as ex:
+            self.Logger.warning(f"ICMP datagram sockets are not available ({ex}), falling back to the ping executable.")
+            self._useSubprocess = True
+
+    async def _resolveAsync(self, loop: asyncio.AbstractEventLoop, address: str) -> str:
+
+        try:
+            return str(ipaddress.IPv4Address(address))
+
+        except ipaddress.AddressValueError:
+            addressInfos = await loop.getaddrinfo(address, None, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+            return addressInfos[0][4][0]
+
+    def _nextSequence(self) -> int:
+
+        while True:
+            self._sequence = (self._sequence + 1) & 0xFFFF
+
+            if self._sequence not in self._pending:
+                return self._sequence
+
+    def _flush(self, loop: asyncio.AbstractEventLoop):
+
+        self._flushScheduled = False
+        queue = self._queue
+        self._queue = []
+
+        for i, (ip, sequence, future) in enumerate(queue):
+
+            if future.done():
+                continue
+
+            try:
+                # the kernel replaces the identifier of datagram ICMP sockets by the local port
+                self._socket.sendto(self._getEchoRequest(sequence), (ip, 0))
+
+            except BlockingIOError:
+                # send buffer is full, send the rest of the batch in the next iteration
+                self._queue = queue[i:] + self._queue
+                self._flushScheduled = True
+                loop.call_soon(self._flush, loop)
+                return
+
+            except OSError as ex:
+                future.set_exception(ex)
+                continue
+
+            if self._identifier is None:
+                self._identifier = self._socket.getsockname()[1]
+
+            self._pending[sequence] = (ip, time.perf_counter(), future)
+
+    def _onReadable(self):
+
+        while True:
+
+            try:
+                (packet, (ip, _)) = self._socket.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+
+            receiveTime = time.perf_counter()
+
+            # some platforms (e.g. macOS) deliver the IP header as well
+            if len(packet) >= 20 and packet[0] >> 4 == 4:
+                packet = packet[(packet[0] & 0x0F) * 4:]
+
+            if len(packet) < 8:
+                continue
+
+            (icmpType, _, _, identifier, sequence) = struct.unpack("!BBHHH", packet[:8])
+
+            if icmpType != self._echoReply or (self._identifier is not None and identifier != self._identifier):
+                continue
+
+            pending = self._pending.pop(sequence, None)
+
+            if pending is None:
+                continue
+
+            (expectedIp, sendTime, future) = pending
+
+            if ip != expectedIp:
+                self._pending[sequence] = pending
+                continue
+
+            if not future.done():
+                future.set_result((receiveTime - sendTime) * 1000)
+
+    def _getEchoRequest(self, sequence: int) -> bytes:
+        payload = b"PythonHealthChecker"
+        header = struct.pack("!BBHHH", self._echoRequest, 0, 0, 0, sequence)
+        checksum = self._getChecksum(header + payload)
+
+        return struct.pack("!BBHHH", self._echoRequest, 0, checksum, 0, sequence) + payload
+
+    def _getChecksum(self, data: bytes) -> int:
+
+        if len(data) % 2:
+            data += b"\x00"
+
+        checksum = sum(struct.unpack(f"!{len(data) // 2}H", data))
+        checksum = (checksum >> 16) + (checksum & 0xFFFF)
+        checksum += checksum >> 16
+
+        return ~checksum & 0xFFFF
+
+    async def _pingSubprocessAsync(self, address: str, timeout: float) -> PingResult:
+
+        if self._processSemaphore is None:
+            self._processSemaphore = asyncio.Semaphore(self.MaxProcesses)
+
+        system = platform.system()
+
+        if system == "Linux":
+            arguments = ["ping", "-c", "1", "-W", str(max(1, round(timeout))), address]
+
+        elif system == "Windows":
+            arguments = ["ping", "-n", "1", "-w", str(int(timeout * 1000)), address]
+
+        else:
+            raise Exception(f"The platform '{system}' is not supported.")
+
+        async with self._processSemaphore:
+
+            start = time.perf_counter()
+
+            try:
+                process = await asyncio.create_subprocess_exec(*arguments, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+
+            except FileNotFoundError:
+                return PingResult(False, message="The ping executable was not found.")
+
+            try:
+                (output, _) = await asyncio.wait_for(process.communicate(), timeout + 1)
+
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                return PingResult(False, message="Request timed out.")
+
+            roundTripTime = (time.perf_counter() - start) * 1000
+
+        if process.returncode != 0:
+            return PingResult(False, message="Request timed out.")
+
+        match = self._timeRegex.search(output.decode(errors="ignore"))
+
+        if match is not None:
+            roundTripTime = float(match.group(1))
+
+        return PingResult(True, roundTripTime)
@@ -0,0 +1,277 @@
+import heapq
+import math
+import uuid
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from .BaseTypes import CheckResult, GetTimestamp
+
+
+# the entries are wrapped instead of inherited from dict, so that all mutators (e.g. update or clear) maintain the
+# expiries, the LRU order and the generations and all readers skip expired entries
+class ResultCache(MutableMapping):
+
+    Epoch: str
+    Generation: int
+    MaxRemoved: int
+    DefaultTtl: float
+    MaxSize: int
+    Hits: int
+    Misses: int
+    Expirations: int
+    Evictions: int
+
+    def __init__(self, maxRemoved: int = 1024, defaultTtl: float = None, maxSize: int = None):
+
+        self._entries: Dict[str, CheckResult] = {}
+
+        # the epoch distinguishes the generations of different processes
+        self.Epoch = uuid.uuid4().hex[:8]
+        self.Generation = 0
+        self.MaxRemoved = maxRemoved
+        self.DefaultTtl = defaultTtl
+        self.MaxSize = maxSize
+
+        # the counters are statistics only, so increments of concurrent readers may get lost
+        self.Hits = 0
+        self.Misses = 0
+        self.Expirations = 0
+        self.Evictions = 0
+
+        # expiry time per identifier and a heap of (expiry time, identifier) with outdated items which are skipped
+        self._expiries: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+
+        # identifiers ordered from least to most recently used (only with max size)
+        self._lru: OrderedDict = OrderedDict() if maxSize is not None else None
+
+        # generation of the last modification per identifier, ordered by modification
+        self._changes: Dict[str, int] = {}
+        self._removed: Dict[str, int] = {}
+
+        # changes older than the horizon are unknown because their removal records have been dropped
+        self._horizon: int = 0
+
+        # listeners are replaced instead of modified so that they can be (un)registered from other threads
+        self._listeners: Tuple[Callable[[str], None], ...] = ()
+
+    def __setitem__(self, identifier: str, checkResult: CheckResult):
+        self.Set(identifier, checkResult)
+
+    def __getitem__(self, identifier: str) -> CheckResult:
+
+        checkResult = self.get(identifier)
+
+        if checkResult is None:
+            raise KeyError(identifier)
+
+        return checkResult
+
+    def __delitem__(self, identifier: str):
+        del self._entries[identifier]
+        self._touch(identifier, True)
+
+    def __contains__(self, identifier: str) -> bool:
+        return identifier in self._entries and not self._isExpired(identifier, GetTimestamp())
+
+    # the readers get snapshots, because the cache is modified by the event loop while other threads read it
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        now = GetTimestamp()
+        return len(self._entries) - len([expiry for expiry in list(self._expiries.values()) if expiry <= now])
+
+    def keys(self) -> List[str]:
+        return [identifier for (identifier, _) in self.items()]
+
+    def values(self) -> List[CheckResult]:
+        return [checkResult for (_, checkResult) in self.items()]
+
+    def items(self) -> List[Tuple[str, CheckResult]]:
+        now = GetTimestamp()
+        return [(identifier, checkResult) for (identifier, checkResult) in list(self._entries.items()) if not self._isExpired(identifier, now)]
+
+    def pop(self, identifier: str, *args) -> CheckResult:
+
+        if identifier not in self._entries:
+
+            if len(args) > 0:
+                return args[0]
+
+            raise KeyError(identifier)
+
+        checkResult = self._entries.pop(identifier)
+        self._touch(identifier, True)
+
+        return checkResult
+
+    def clear(self):
+
+        # expired entries are removed, too
+        for identifier in list(self._entries):
+            self.pop(identifier)
+
+    def get(self, identifier: str, default: CheckResult = None) -> CheckResult:
+
+        checkResult = self._entries.get(identifier)
+
+        # expired entries are invisible to readers but only removed on the event loop which owns the cache
+        if checkResult is not None and self._isExpired(identifier, GetTimestamp()):
+            checkResult = None
+
+        if checkResult is None:
+            self.Misses += 1
+            return default
+
+        self.Hits += 1
+
+        if self._lru is not None:
+
+            # the entry might be evicted concurrently
+            try:
+                self._lru.move_to_end(identifier)
+            except KeyError:
+                pass
+
+        return checkResult
+
+    def Set(self, identifier: str, checkResult: CheckResult, ttl: float = None):
+
+        # the time to live counts from the creation of the check result, like its age
+        if ttl is None:
+            ttl = self.DefaultTtl
+
+        self._entries[identifier] = checkResult
+        self._setExpiry(identifier, checkResult.Timestamp + ttl if ttl is not None else math.inf)
+
+        if self._lru is not None:
+            self._lru[identifier] = None
+            self._lru.move_to_end(identifier)
+
+        self._touch(identifier, False)
+
+        self.EvictExpired()
+
+        # protect against runaway ingestion
+        if self._lru is not None:
+            while len(self._entries) > self.MaxSize:
+                self.pop(next(iter(self._lru)))
+                self.Evictions += 1
+
+    def EvictExpired(self) -> int:
+
+        now = GetTimestamp()
+        count = 0
+
+        while any(self._heap) and self._heap[0][0] <= now:
+
+            (expiry, identifier) = heapq.heappop(self._heap)
+
+            if self._expiries.get(identifier) == expiry:
+                self.pop(identifier)
+                self.Expirations += 1
+                count += 1
+
+        return count
+
+    def GetStatistics(self) -> Dict[str, int]:
+        return {
+            "entries": len(self),
+            "hits": self.Hits,
+            "misses": self.Misses,
+            "expirations": self.Expirations,
+            "evictions": self.Evictions
+        }
+
+    def AddListener(self, listener: Callable[[str], None]):
+        self._listeners = self._listeners + (listener,)
+
+    def RemoveListener(self, listener: Callable[[str], None]):
+        self._listeners = tuple(current for current in self._listeners if current != listener)
+
+    def GetValidator(self) -> str:
+        return f"{self.Epoch}-{self.Generation}"
+
+    def GetEntryValidator(self, identifier: str) -> str:
+        return f"{self.Epoch}-{self._changes.get(identifier, 0)}"
+
+    def GetGeneration(self, validator: str) -> int:
+
+        # validators of other processes (e.g. before a restart) are unknown
+        (epoch, _, generation) = validator.strip('"').partition("-")
+
+        if epoch != self.Epoch or not generation.isdigit():
+            return None
+
+        return int(generation)
+
+    def GetChangesSince(self, generation: int) -> Tuple[bool, List[str], List[str]]:
+
+        # a snapshot of the records is taken because the cache might be modified concurrently
+        if generation is None or generation < self._horizon or generation > self.Generation:
+            return (False, list(self.keys()), [])
+
+        changedIdentifiers = self._getChangesSince(list(self._changes.items()), generation)
+        removedIdentifiers = self._getChangesSince(list(self._removed.items()), generation)
+
+        return (True, changedIdentifiers, removedIdentifiers)
+
+    def _getChangesSince(self, records: List[Tuple[str, int]], generation: int) -> List[str]:
+
+        identifiers = []
+
+        for (identifier, changeGeneration) in reversed(records):
+
+            if changeGeneration <= generation:
+                break
+
+            identifiers.append(identifier)
+
+        identifiers.reverse()
+
+        return identifiers
+
+    def _isExpired(self, identifier: str, now: float) -> bool:
+        expiry = self._expiries.get(identifier)
+        return expiry is not None and expiry <= now
+
+    def _setExpiry(self, identifier: str, expiry: float):
+
+        if expiry == math.inf:
+            self._expiries.pop(identifier, None)
+
+        else:
+            self._expiries[identifier] = expiry
+            heapq.heappush(self._heap, (expiry, identifier))
+
+        # rebuild the heap when most of its items are outdated (e.g. results which are pushed again and again)
+        if len(self._heap) > 2 * len(self._expiries) + 64:
+            self._heap = [(expiry, identifier) for (identifier, expiry) in self._expiries.items()]
+            heapq.heapify(self._heap)
+
+    def _touch(self, identifier: str, removed: bool):
+
+        self.Generation += 1
+
+        # move the identifier to the end to keep the records ordered by generation
+        self._changes.pop(identifier, None)
+        self._removed.pop(identifier, None)
+
+        if removed:
+            self._removed[identifier] = self.Generation
+            self._expiries.pop(identifier, None)
+
+            if self._lru is not None:
+                self._lru.pop(identifier, None)
+
+            while len(self._removed) > self.MaxRemoved:
+                oldestIdentifier = next(iter(self._removed))
+                self._horizon = self._removed.pop(oldestIdentifier)
+
+        else:
+            self._changes[identifier] = self.Generation
+
+        for listener in self._listeners:
+            listener(identifier)
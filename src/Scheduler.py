@@ -0,0 +1,190 @@
+import asyncio
+import heapq
+import math
+import random
+from logging import Logger
+from typing import Awaitable, Callable, Dict, List, Set, Tuple
+
+
+class Scheduler:
+
+    DefaultInterval: float
+    Jitter: float
+    Logger: Logger
+
+    def __init__(self, defaultInterval: float, jitter: float, logger: Logger):
+        self.DefaultInterval = defaultInterval
+        self.Jitter = jitter
+        self.Logger = logger
+
+        # heap entries are [due, sequence, key, interval], removed entries get key None
+        self._heap: List[list] = []
+        self._entries: Dict[str, list] = {}
+        self._batchMembers: Dict[Tuple[str, float], str] = {}
+        self._sequence: int = 0
+        self._running: Set[str] = set()
+        self._triggered: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._changed: asyncio.Event = None
+
+    def SetChecks(self, intervals: Dict[str, float], batchKeys: Dict[str, str] = {}):
+
+        now = self._now()
+
+        # remove checks which do not exist anymore
+        for key in [key for key in self._entries if key not in intervals]:
+            self._entries.pop(key)[2] = None
+
+        for (key, interval) in intervals.items():
+
+            entry = self._entries.get(key)
+
+            # keep the cadence of known checks
+            if entry is not None and entry[3] == interval:
+                continue
+
+            batchKey = batchKeys.get(key)
+            memberEntry = self._entries.get(self._batchMembers.get((batchKey, interval))) if batchKey is not None else None
+
+            # checks of the same batch share the phase of the batch so that they run together
+            if memberEntry is not None and memberEntry[2] is not None and memberEntry[3] == interval:
+
+                if entry is not None:
+                    entry[2] = None
+
+                due = memberEntry[0]
+
+            # spread the first run of new checks over (a fraction of) their interval
+            elif entry is None:
+                due = now + random.uniform(0, interval * self.Jitter)
+
+            else:
+                entry[2] = None
+                due = min(entry[0], now + interval)
+
+            self._push(key, due, interval)
+
+            if batchKey is not None and memberEntry is None:
+                self._batchMembers[(batchKey, interval)] = key
+
+        # rebuild the heap when it consists mostly of removed entries
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [entry for entry in self._heap if entry[2] is not None]
+            heapq.heapify(self._heap)
+
+        if self._changed is not None:
+            self._changed.set()
+
+    def Trigger(self, keys: List[str]):
+
+        now = self._now()
+        triggered = False
+
+        # run the checks as soon as possible, the following runs keep their interval from now on
+        for key in keys:
+
+            entry = self._entries.get(key)
+
+            # a running check is triggered again when it has finished
+            if key in self._running:
+                self._triggered.add(key)
+                continue
+
+            if entry is None or entry[0] <= now:
+                continue
+
+            entry[2] = None
+            self._push(key, now, entry[3])
+            triggered = True
+
+        if triggered and self._changed is not None:
+            self._changed.set()
+
+    def PopDue(self) -> List[str]:
+
+        now = self._now()
+        keys = []
+
+        while self._heap and self._heap[0][0] <= now:
+
+            (due, _, key, interval) = heapq.heappop(self._heap)
+
+            if key is None:
+                continue
+
+            keys.append(key)
+
+            # keep the cadence, skip slots which have been missed entirely
+            nextDue = due + interval
+
+            if nextDue <= now:
+                nextDue += interval * math.ceil((now - nextDue) / interval)
+
+            self._push(key, nextDue, interval)
+
+        return keys
+
+    def GetDelay(self) -> float:
+
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+
+        if not self._heap:
+            return self.DefaultInterval
+
+        return max(0, self._heap[0][0] - self._now())
+
+    async def RunAsync(self, runChecksAsync: Callable[[List[str]], Awaitable[None]]):
+
+        self._changed = asyncio.Event()
+
+        while True:
+
+            try:
+                await asyncio.wait_for(self._changed.wait(), self.GetDelay())
+            except asyncio.TimeoutError:
+                pass
+
+            self._changed.clear()
+            keys = []
+
+            for key in self.PopDue():
+
+                # do not start a check again while its previous run is still in progress
+                if key in self._running:
+                    self.Logger.warning(f"Skip run of check {key} because its previous run is still in progress.")
+
+                else:
+                    keys.append(key)
+
+            if any(keys):
+                self._running.update(keys)
+                task = asyncio.create_task(self._runAsync(runChecksAsync, keys))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _runAsync(self, runChecksAsync: Callable[[List[str]], Awaitable[None]], keys: List[str]):
+
+        try:
+            await runChecksAsync(keys)
+
+        except Exception as ex:
+            self.Logger.error(msg=str(ex), exc_info=ex)
+
+        finally:
+            self._running.difference_update(keys)
+
+            triggeredKeys = [key for key in keys if key in self._triggered]
+
+            if any(triggeredKeys):
+                self._triggered.difference_update(triggeredKeys)
+                self.Trigger(triggeredKeys)
+
+    def _push(self, key: str, due: float, interval: float):
+        self._sequence += 1
+        entry = [due, self._sequence, key, interval]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _now(self) -> float:
+        return asyncio.get_running_loop().time()
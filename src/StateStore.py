@@ -0,0 +1,120 @@
+import os
+import pickle
+import tempfile
+import zlib
+from logging import Logger
+from typing import Dict, Tuple
+
+from .BaseTypes import CheckResult, CheckResultType, NotificationState
+
+
+class State:
+    Cache: Dict[str, CheckResult]
+    Results: Dict[str, CheckResult]
+    StageMap: Dict[str, NotificationState]
+    MuteMap: Dict[str, NotificationState]
+    RunMap: Dict[str, NotificationState]
+
+    def __init__(self, cache: Dict[str, CheckResult], results: Dict[str, CheckResult], stageMap: Dict[str, NotificationState], muteMap: Dict[str, NotificationState], runMap: Dict[str, NotificationState]):
+        self.Cache = cache
+        self.Results = results
+        self.StageMap = stageMap
+        self.MuteMap = muteMap
+        self.RunMap = runMap
+
+class StateStore:
+
+    FilePath: str
+    Logger: Logger
+
+    # the version is increased whenever the layout of the tuples changes
+    _header: bytes = b"PHCSTATE"
+    _version: int = 2
+
+    def __init__(self, filePath: str, logger: Logger):
+        self.FilePath = filePath
+        self.Logger = logger
+
+        self._lastData: bytes = None
+
+    def GetSnapshot(self, state: State) -> tuple:
+
+        # only plain tuples are stored so that the file does not depend on the classes of the app
+        return (
+            self._version,
+            [(identifier, self._toTuple(checkResult)) for (identifier, checkResult) in state.Cache.items()],
+            [(key, self._toTuple(checkResult)) for (key, checkResult) in state.Results.items()],
+            [(key, notificationState.RunId, notificationState.Date) for (key, notificationState) in state.StageMap.items()],
+            [(key, notificationState.RunId, notificationState.Date) for (key, notificationState) in state.MuteMap.items()],
+            [(key, notificationState.RunId, notificationState.Date) for (key, notificationState) in state.RunMap.items()]
+        )
+
+    def Save(self, snapshot: tuple) -> bool:
+
+        data = zlib.compress(pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL))
+
+        # nothing to do when nothing has changed since the last snapshot
+        if data == self._lastData:
+            return False
+
+        # readers see either the old or the new file, but never a partially written one
+        folderPath = os.path.dirname(os.path.abspath(self.FilePath))
+        (fileDescriptor, tempFilePath) = tempfile.mkstemp(dir=folderPath, prefix=".state-", suffix=".tmp")
+
+        try:
+            with os.fdopen(fileDescriptor, "wb") as file:
+                file.write(self._header)
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+
+            os.replace(tempFilePath, self.FilePath)
+
+        except:
+            os.remove(tempFilePath)
+            raise
+
+        self._lastData = data
+
+        return True
+
+    def Load(self) -> State:
+
+        if not os.path.isfile(self.FilePath):
+            return None
+
+        try:
+            with open(self.FilePath, "rb") as file:
+                data = file.read()
+
+            if not data.startswith(self._header):
+                raise Exception("The file header is invalid.")
+
+            snapshot = pickle.loads(zlib.decompress(data[len(self._header):]))
+
+            if snapshot[0] != self._version:
+                raise Exception(f"The version {snapshot[0]} is not supported.")
+
+            (_, cache, results, stageMap, muteMap, runMap) = snapshot
+
+            return State(
+                {identifier: self._fromTuple(values) for (identifier, values) in cache},
+                {key: self._fromTuple(values) for (key, values) in results},
+                {key: NotificationState(runId, date) for (key, runId, date) in stageMap},
+                {key: NotificationState(runId, date) for (key, runId, date) in muteMap},
+                {key: NotificationState(runId, date) for (key, runId, date) in runMap}
+            )
+
+        # a broken snapshot must not prevent the app from starting
+        except Exception as ex:
+            self.Logger.warning(f"Unable to load the state from {self.FilePath} ({type(ex).__name__}: {ex}), start without it.")
+            return None
+
+    def _toTuple(self, checkResult: CheckResult) -> tuple:
+        return (checkResult.Name, checkResult.ResultType.value, checkResult.Message, checkResult.InfoUrl, list(checkResult.Notifiers), checkResult.Timestamp)
+
+    def _fromTuple(self, values: Tuple[str, int, str, str, list, float]) -> CheckResult:
+
+        (name, resultType, message, infoUrl, notifiers, created) = values
+
+        return CheckResult(name, CheckResultType(resultType), message, infoUrl, notifiers, created)
@@ -1,34 +1,16 @@
-import importlib
-import inspect
 import os
 import platform
 import sys
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from .BaseTypes import CheckResult, NotificationState
 
-_lastRunId: str = "undefined"
 _stageMap: Dict[str, NotificationState] = {}
 _muteMap: Dict[str, NotificationState] = {}
-
-def LoadExtensions() -> List:
-    extensionFolderPath = "src/Extensions"
-    extensionFiles = os.listdir(extensionFolderPath)
-    modules = [_loadModule(extensionFile) for extensionFile in extensionFiles]
-    extensions = [potentialExtension[1] for module in modules for potentialExtension in inspect.getmembers(module) if inspect.isclass(potentialExtension[1])]
-
-    return extensions
-
-def _loadModule(extensionFile: str):
-    moduleName = f".{extensionFile.split('.')[0]}"
-    packageName = "src.Extensions"
-    module = importlib.import_module(moduleName, package=packageName)
-    importlib.reload(module)
-
-    return module
+_runMap: Dict[str, NotificationState] = {}
 
 def PrepareLocalAppdata() -> str:
 
@@ -47,19 +29,32 @@ def PrepareLocalAppdata() -> str:
 
     return folderPath
 
+def GetThrottleState() -> Tuple[Dict[str, NotificationState], Dict[str, NotificationState], Dict[str, NotificationState]]:
+    return (_stageMap, _muteMap, _runMap)
+
+def SetThrottleState(stageMap: Dict[str, NotificationState], muteMap: Dict[str, NotificationState], runMap: Dict[str, NotificationState]):
+
+    global _stageMap
+    global _muteMap
+    global _runMap
+
+    _stageMap = stageMap
+    _muteMap = muteMap
+    _runMap = runMap
+
 def ThrottleNotifications(checkResult: Dict[str, List[CheckResult]]) -> Dict[str, List[CheckResult]]:
 
-    global _lastRunId
     global _stageMap
     global _muteMap
+    global _runMap
 
     now = datetime.now()
-    currentRunId = uuid.uuid4()
     filteredCheckResult = {}
 
     # remove notifications older than 1 day
     _stageMap = { group:lastNotification for (group, lastNotification) in _stageMap.items() if now.date() == lastNotification.Date }
     _muteMap = { group:lastNotification for (group, lastNotification) in _muteMap.items() if now.date() == lastNotification.Date }
+    _runMap = { check:lastRun for (check, lastRun) in _runMap.items() if now.date() == lastRun.Date }
 
     # for each group
     for (group, results) in checkResult.items():
@@ -68,8 +63,13 @@ def ThrottleNotifications(checkResult: Dict[str, List[CheckResult]]) -> Dict[str
 
         for checkResult in results:
             
-            key = f"{group}/{checkResult.Name}/{checkResult.Message}"
-            notificationState = NotificationState(currentRunId, now.date())
+            # checks run on their own schedule, so "twice in a row" refers to the previous run of the same check,
+            # which might be part of the same batch (e.g. when the results of several runs are merged)
+            check = f"{group}/{checkResult.Name}"
+            key = f"{check}/{checkResult.Message}"
+            previousRun = _runMap.get(check)
+            notificationState = NotificationState(uuid.uuid4(), now.date())
+            _runMap[check] = notificationState
 
             # if check failed
             if checkResult.HasError:
@@ -78,7 +78,7 @@ def ThrottleNotifications(checkResult: Dict[str, List[CheckResult]]) -> Dict[str
                 if not key in _muteMap:
 
                     # if check failed twice in a row
-                    if key in _stageMap and _stageMap[key].RunId == _lastRunId:
+                    if key in _stageMap and previousRun is not None and _stageMap[key].RunId == previousRun.RunId:
                         filteredResults.append(checkResult)
                         _muteMap[key] = notificationState
                         _stageMap.pop(key)
@@ -89,6 +89,4 @@ def ThrottleNotifications(checkResult: Dict[str, List[CheckResult]]) -> Dict[str
         if any(filteredResults):
             filteredCheckResult[group] = filteredResults
 
-    _lastRunId = currentRunId
-
     return filteredCheckResult
@@ -1,73 +1,278 @@
-import json
-from datetime import datetime
+import os
+import threading
 from logging import Logger
-from typing import Dict
+from typing import Callable
 
 import cherrypy
+from cherrypy.lib.static import serve_file
 
-from .BaseTypes import CheckResult, CheckResultType
+from .CheckResultApi import ApiError, CheckResultApi, CheckResultSubscription
+from .HtmlWriter import HtmlWriter
 
 
 class Application:
 
-    HtmlFilePath: str
+    HtmlWriter: HtmlWriter
 
-    def __init__(self, htmlFilePath: str):
-        self.HtmlFilePath = htmlFilePath
+    def __init__(self, htmlWriter: HtmlWriter):
+        self.HtmlWriter = htmlWriter
 
     @cherrypy.expose
     def index(self):
-        return open(self.HtmlFilePath)
+
+        # the page and its compressed variants are prepared by the html writer
+        page = self.HtmlWriter.Page
+        (content, encoding) = page.GetContent(cherrypy.request.headers.get("Accept-Encoding"))
+
+        cherrypy.response.headers["Content-Type"] = "text/html; charset=utf-8"
+        cherrypy.response.headers["Vary"] = "Accept-Encoding"
+        cherrypy.response.headers["ETag"] = page.ETag
+
+        if cherrypy.request.headers.get("If-None-Match") == page.ETag:
+            cherrypy.response.status = 304
+            return b""
+
+        if encoding is not None:
+            cherrypy.response.headers["Content-Encoding"] = encoding
+
+        return content
+
+    @cherrypy.expose
+    def live(self):
+        # the static shell of the live dashboard is cached by the browsers
+        return serve_file(os.path.abspath("./src/wwwroot/live.html"), "text/html")
+
+@cherrypy.expose
+class Stream:
+
+    Api: CheckResultApi
+    Subscribe: Callable[..., CheckResultSubscription]
+    Logger: Logger
+
+    def __init__(self, api: CheckResultApi, logger: Logger, subscribe: Callable[..., CheckResultSubscription] = None):
+        self.Api = api
+        self.Subscribe = subscribe if subscribe is not None else api.Subscribe
+        self.Logger = logger
+
+    def GET(self, id = None, prefix = None, format = "sse", since = None):
+
+        if id is not None and not isinstance(id, list):
+            id = [id]
+
+        # browsers resume an event stream with the id of the last event, which is newer than the initial since parameter
+        since = cherrypy.request.headers.get("Last-Event-ID", since)
+
+        wakeUpEvent = threading.Event()
+
+        try:
+            subscription = self.Subscribe(id, prefix, format, since, wakeUpEvent.set)
+
+        except ApiError as ex:
+            raise cherrypy.HTTPError(status=ex.Status, message=ex.Message)
+
+        cherrypy.response.headers['Content-Type'] = subscription.ContentType
+        cherrypy.response.headers['Cache-Control'] = 'no-cache'
+
+        # each subscriber occupies a worker thread, a disconnect is detected with the next heartbeat
+        def generate():
+
+            try:
+                yield subscription.GetInitialEvents()
+
+                while True:
+                    wakeUpEvent.wait(self.Api.HeartbeatSeconds)
+                    wakeUpEvent.clear()
+                    yield subscription.GetEvents()
+
+            finally:
+                subscription.Close()
+
+        return generate()
+
+    GET._cp_config = { "response.stream": True }
+
+@cherrypy.expose
+class DashboardAPI:
+
+    Api: CheckResultApi
+    Logger: Logger
+
+    def __init__(self, api: CheckResultApi, logger: Logger):
+        self.Api = api
+        self.Logger = logger
+
+    def GET(self):
+
+        try:
+            response = self.Api.GetDashboard(cherrypy.request.headers.get("If-None-Match"))
+
+        except ApiError as ex:
+            raise cherrypy.HTTPError(status=ex.Status, message=ex.Message)
+
+        cherrypy.response.status = response.Status
+        cherrypy.response.headers.update(response.Headers)
+
+        if response.ContentType is not None:
+            cherrypy.response.headers['Content-Type'] = response.ContentType
+
+        return response.Body
+
+@cherrypy.expose
+class HistoryAPI:
+
+    Api: CheckResultApi
+    Logger: Logger
+
+    def __init__(self, api: CheckResultApi, logger: Logger):
+        self.Api = api
+        self.Logger = logger
+
+    def GET(self, check = None, days = "7"):
+
+        try:
+            response = self.Api.GetHistory(check, days)
+
+        except ApiError as ex:
+            raise cherrypy.HTTPError(status=ex.Status, message=ex.Message)
+
+        cherrypy.response.headers['Content-Type'] = response.ContentType
+
+        return response.Body
+
+@cherrypy.expose
+class MetricsAPI:
+
+    Api: CheckResultApi
+    Logger: Logger
+
+    def __init__(self, api: CheckResultApi, logger: Logger):
+        self.Api = api
+        self.Logger = logger
+
+    def GET(self):
+
+        try:
+            response = self.Api.GetMetrics()
+
+        except ApiError as ex:
+            raise cherrypy.HTTPError(status=ex.Status, message=ex.Message)
+
+        cherrypy.response.headers['Content-Type'] = response.ContentType
+
+        return response.Body
+
+@cherrypy.expose
+class AgentAPI:
+
+    Api: CheckResultApi
+    Logger: Logger
+
+    def __init__(self, api: CheckResultApi, logger: Logger):
+        self.Api = api
+        self.Logger = logger
+
+    def GET(self):
+
+        try:
+            response = self.Api.GetAgents(cherrypy.request.headers.get(CheckResultApi.AgentTokenHeader))
+
+        except ApiError as ex:
+            raise cherrypy.HTTPError(status=ex.Status, message=ex.Message)
+
+        cherrypy.response.headers['Content-Type'] = response.ContentType
+
+        return response.Body
+
+    def POST(self, agentId, action = None):
+
+        rawData = cherrypy.request.body.read(int(cherrypy.request.headers['Content-Length']))
+        token = cherrypy.request.headers.get(CheckResultApi.AgentTokenHeader)
+
+        try:
+
+            # heartbeat
+            if action is None:
+                response = self.Api.PostAgentHeartbeat(agentId, token, rawData)
+
+            elif action == "results":
+                response = self.Api.PostAgentResults(agentId, token, rawData)
+
+            else:
+                raise ApiError(404, f"The action '{action}' is not supported.")
+
+        except ApiError as ex:
+            raise cherrypy.HTTPError(status=ex.Status, message=ex.Message)
+
+        cherrypy.response.headers['Content-Type'] = response.ContentType
+
+        return response.Body
+
+    def DELETE(self, agentId):
+
+        try:
+            self.Api.DeleteAgent(agentId, cherrypy.request.headers.get(CheckResultApi.AgentTokenHeader))
+
+        except ApiError as ex:
+            raise cherrypy.HTTPError(status=ex.Status, message=ex.Message)
 
 @cherrypy.expose
 class API:
 
-    Cache: Dict[str, CheckResult]
+    Api: CheckResultApi
     Logger: Logger
 
-    def __init__(self, cache: Dict[str, CheckResult], logger: Logger):
-        self.Cache = cache
+    def __init__(self, api: CheckResultApi, logger: Logger):
+        self.Api = api
         self.Logger = logger
     
-    def GET(self, identifier):
+    def GET(self, identifier = None, id = None, prefix = None, format = "json", since = None):
+
+        ifNoneMatch = cherrypy.request.headers.get("If-None-Match")
+
+        try:
 
-        if identifier in self.Cache:
+            # bulk query
+            if identifier is None:
 
-            checkResult = self.Cache[identifier]
+                if id is not None and not isinstance(id, list):
+                    id = [id]
 
-            checkResultDict = {
-                "identifier": identifier,
-                "name": checkResult.Name,
-                "resultType": checkResult.ResultType.value,
-                "message": checkResult.Message,
-                "infoUrl": checkResult.InfoUrl,
-                "created": checkResult.Created.isoformat()
-            }
+                response = self.Api.GetCheckResults(id, prefix, format, since, ifNoneMatch)
 
-            checkResultJson = json.dumps(checkResultDict)
-            cherrypy.response.headers['Content-Type'] = 'application/json'
+            else:
+                response = self.Api.GetCheckResult(identifier, ifNoneMatch)
 
-            return checkResultJson.encode('utf8')
+        except ApiError as ex:
+            raise cherrypy.HTTPError(status=ex.Status, message=ex.Message)
 
-        else:
-            raise cherrypy.HTTPError(status=404, message="The requested check result was not found.")
+        cherrypy.response.status = response.Status
+        cherrypy.response.headers.update(response.Headers)
+
+        if response.ContentType is not None:
+            cherrypy.response.headers['Content-Type'] = response.ContentType
+
+        return response.Body
 
     def POST(self):
 
+        # bulk ingestion, the body is processed line by line while it is received
+        if cherrypy.request.headers.get("Content-Type", "").split(";")[0].strip() == "application/x-ndjson":
+
+            ingest = self.Api.IngestCheckResults()
+
+            for line in cherrypy.request.body:
+                ingest.Add(line)
+
+            response = ingest.Complete()
+            cherrypy.response.headers['Content-Type'] = response.ContentType
+
+            return response.Body
+
         # binary -> json
         rawData = cherrypy.request.body.read(int(cherrypy.request.headers['Content-Length']))
-        checkResultJson = json.loads(rawData)
-
-        # create CheckResult
-        identifier = checkResultJson["identifier"]
-        name = checkResultJson["name"]
-        resultType = CheckResultType(int(checkResultJson["resultType"]))
-        message = checkResultJson["message"]
-        infoUrl = checkResultJson["infoUrl"]
-        notifiers = []
 
-        checkResult = CheckResult(name, resultType, message, infoUrl, notifiers)
+        try:
+            self.Api.PostCheckResult(rawData)
 
-        # populate cache
-        self.Logger.info(f"Fill cache with check result {identifier} (received via HTML POST).")
-        self.Cache[identifier] = checkResult
+        except ApiError as ex:
+            raise cherrypy.HTTPError(status=ex.Status, message=ex.Message)
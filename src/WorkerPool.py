@@ -0,0 +1,346 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger
+from multiprocessing.connection import Connection
+from threading import Thread
+from typing import Callable, Dict, List, Set, Tuple
+
+from .BaseTypes import CheckResult, CheckResultType
+from .ExtensionRegistry import ExtensionRegistry
+from .HashRing import HashRing
+
+
+class WorkerProcess:
+    Index: int
+    Process: multiprocessing.Process
+    Connection: Connection
+    Running: bool
+    Sender: ThreadPoolExecutor
+
+    def __init__(self, index: int):
+        self.Index = index
+        self.Process = None
+        self.Connection = None
+        self.Running = False
+
+        # large messages block until the worker has read them, so they are sent by a thread (in order)
+        self.Sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"worker-{index}-sender")
+
+class WorkerPool:
+
+    WorkerCount: int
+    CycleDeadline: float
+    Logger: Logger
+    RunRequested: Callable[[List[str]], None]
+
+    RestartDelay: float = 5
+    TimeoutSlack: float = 5
+
+    def __init__(self, workerCount: int, logger: Logger, cycleDeadline: float = None):
+        self.WorkerCount = workerCount
+        self.CycleDeadline = cycleDeadline
+        self.Logger = logger
+        self.RunRequested = None
+
+        # the workers do not inherit the threads and the event loop of this process
+        self._context = multiprocessing.get_context("spawn")
+        self._loop: asyncio.AbstractEventLoop = None
+        self._workers: List[WorkerProcess] = [WorkerProcess(i) for i in range(workerCount)]
+        self._ring: HashRing = HashRing()
+        self._checks: Dict[str, Dict[str, str]] = {}
+        self._shards: Dict[int, Dict[str, Dict[str, str]]] = {}
+        self._reloads: int = 0
+        self._runs: Dict[int, Tuple[int, asyncio.Future]] = {}
+        self._runId: int = 0
+        self._stopped: bool = False
+
+    @property
+    def RunningWorkers(self) -> int:
+        return len([worker for worker in self._workers if worker.Running])
+
+    def SetChecks(self, checks: Dict[str, Dict[str, str]], extensions: ExtensionRegistry):
+
+        # the workers are started with the first config
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+
+            for worker in self._workers:
+                self._start(worker)
+
+        self._checks = checks
+        forceReload = extensions.Reloads != self._reloads
+        self._reloads = extensions.Reloads
+
+        # the workers refresh their extensions whenever they receive their checks, so all of them get their checks
+        self._distribute(True, forceReload)
+
+    async def RunAsync(self, keys: List[str], timeout: float) -> Tuple[Dict[str, Tuple[CheckResult, float]], Set[str]]:
+
+        workerKeys: Dict[int, List[str]] = {}
+
+        for key in keys:
+
+            node = self._ring.GetNode(key)
+
+            if node is not None:
+                workerKeys.setdefault(int(node), []).append(key)
+
+        # one run per worker, the results of checks which have not been run (e.g. because their worker has exited) are missing
+        runs: Dict[asyncio.Future, Tuple[int, int, List[str]]] = {}
+
+        for (index, keys) in workerKeys.items():
+            self._runId += 1
+            future = self._loop.create_future()
+            self._runs[self._runId] = (index, future)
+            self._send(self._workers[index], ("run", self._runId, keys))
+            runs[future] = (self._runId, index, keys)
+
+        timedResults = {}
+        timedOutKeys = set()
+
+        if not any(runs):
+            return (timedResults, timedOutKeys)
+
+        # the checks time out by themselves, so a run which takes considerably longer is blocked (e.g. by a synchronous call)
+        (done, pending) = await asyncio.wait(list(runs), timeout=timeout + self.TimeoutSlack)
+
+        for future in done:
+            timedResults.update(future.result())
+
+        for future in pending:
+
+            (runId, index, keys) = runs[future]
+            self._runs.pop(runId, None)
+            timedOutKeys.update(keys)
+            worker = self._workers[index]
+
+            # the receiving thread reports the exit of the worker, which is then restarted
+            if worker.Running and worker.Process.is_alive():
+                self.Logger.error(f"Worker process {index} has not finished {len(keys)} checks within {timeout + self.TimeoutSlack:g} s, terminate it.")
+                worker.Process.terminate()
+
+        return (timedResults, timedOutKeys)
+
+    def Stop(self):
+
+        self._stopped = True
+
+        for worker in self._workers:
+            if worker.Process is not None:
+                worker.Process.terminate()
+                worker.Process.join(1)
+
+            worker.Sender.shutdown(wait=False)
+
+    def _start(self, worker: WorkerProcess):
+
+        (connection, workerConnection) = self._context.Pipe()
+        process = self._context.Process(target=_runWorker, args=(worker.Index, workerConnection, self.CycleDeadline, self.Logger.getEffectiveLevel()), name=f"Health Checker Worker {worker.Index}", daemon=True)
+        process.start()
+        workerConnection.close()
+
+        worker.Process = process
+        worker.Connection = connection
+        worker.Running = True
+        self._ring.Add(str(worker.Index))
+
+        # the pipe is read by a thread which hands the messages over to the event loop
+        Thread(target=self._receive, args=(worker, connection), daemon=True).start()
+
+        self.Logger.info(f"Started worker process {worker.Index} (pid {process.pid}).")
+
+    def _restart(self, worker: WorkerProcess):
+
+        if self._stopped or worker.Running:
+            return
+
+        self._start(worker)
+        self._distribute(False)
+
+    def _distribute(self, force: bool, forceReload: bool = False):
+
+        # consistent hashing of the check keys, so only the checks of started or exited workers move
+        shards = {worker.Index: {} for worker in self._workers if worker.Running}
+
+        for (key, settings) in self._checks.items():
+
+            node = self._ring.GetNode(key)
+
+            if node is not None:
+                shards[int(node)][key] = settings
+
+        for (index, shard) in shards.items():
+            if force or shard != self._shards.get(index):
+                self._send(self._workers[index], ("config", shard, forceReload))
+
+        self._shards = shards
+
+    def _send(self, worker: WorkerProcess, message: tuple):
+
+        if not worker.Running:
+            return
+
+        worker.Sender.submit(self._sendNow, worker.Connection, message)
+
+    def _sendNow(self, connection: Connection, message: tuple):
+
+        try:
+            connection.send(message)
+
+        # the receiving thread reports the exit of the worker
+        except OSError:
+            pass
+
+    def _receive(self, worker: WorkerProcess, connection: Connection):
+
+        try:
+            while True:
+                self._loop.call_soon_threadsafe(self._onMessage, connection.recv())
+
+        except (EOFError, OSError):
+            pass
+
+        try:
+            self._loop.call_soon_threadsafe(self._onExit, worker, connection)
+
+        # the event loop has already been closed
+        except RuntimeError:
+            pass
+
+    def _onMessage(self, message: tuple):
+
+        if message[0] == "results":
+
+            (_, runId, results) = message
+            run = self._runs.pop(runId, None)
+
+            if run is not None and not run[1].done():
+                run[1].set_result({key: (CheckResult(name, CheckResultType(resultType), resultMessage, infoUrl, notifiers, timestamp), duration) for (key, name, resultType, resultMessage, infoUrl, notifiers, timestamp, duration) in results})
+
+        elif message[0] == "trigger":
+
+            if self.RunRequested is not None:
+                self.RunRequested(message[1])
+
+    def _onExit(self, worker: WorkerProcess, connection: Connection):
+
+        # the worker might have been restarted in the meantime
+        if worker.Connection is not connection:
+            return
+
+        worker.Running = False
+        connection.close()
+        self._ring.Remove(str(worker.Index))
+
+        # the health checker reports the checks which have been running in the worker as failed
+        for (runId, (index, future)) in list(self._runs.items()):
+            if index == worker.Index:
+                del self._runs[runId]
+
+                if not future.done():
+                    future.set_result({})
+
+        if self._stopped:
+            return
+
+        worker.Process.join(1)
+        self.Logger.error(f"Worker process {worker.Index} has exited with code {worker.Process.exitcode}, move its checks to the other workers and restart it in {self.RestartDelay:g} s.")
+        self._distribute(False)
+        self._loop.call_later(self.RestartDelay, self._restart, worker)
+
+def _runWorker(index: int, connection: Connection, cycleDeadline: float, logLevel: int):
+
+    # Ctrl+C is handled by the main process, which stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    logging.basicConfig(level=logLevel)
+    logger = logging.getLogger(f"Health Checker Worker {index}")
+
+    asyncio.run(_runWorkerAsync(connection, cycleDeadline, logger))
+
+async def _runWorkerAsync(connection: Connection, cycleDeadline: float, logger: Logger):
+
+    # imported here because the health checker itself depends on the worker pool
+    from .FederationClient import FederationClient
+    from .HealthChecker import HealthChecker
+    from .HttpClient import HttpClient
+    from .PingEngine import PingEngine
+    from .ResultCache import ResultCache
+
+    loop = asyncio.get_running_loop()
+    messages: asyncio.Queue = asyncio.Queue()
+    tasks = set()
+
+    # the worker only executes the checks, caching, sharing and notifying is done by the main process
+    httpClient = HttpClient(logger)
+    healthChecker = HealthChecker(ResultCache(), PingEngine(logger), httpClient, FederationClient(httpClient, logger), logger, cycleDeadline)
+    extensions = ExtensionRegistry(logger)
+
+    def Send(message: tuple):
+
+        try:
+            connection.send(message)
+
+        except OSError:
+            pass
+
+    def Receive():
+
+        try:
+            while True:
+                loop.call_soon_threadsafe(messages.put_nowait, connection.recv())
+
+        except (EOFError, OSError):
+            loop.call_soon_threadsafe(messages.put_nowait, None)
+
+    async def RunAsync(runId: int, keys: List[str]):
+
+        try:
+            timedResults = await healthChecker.ExecuteChecksAsync(keys)
+
+        except Exception as ex:
+            logger.error(msg=str(ex), exc_info=ex)
+            timedResults = []
+
+        # plain tuples are smaller and faster to pickle than check results
+        Send(("results", runId, [(key, result.Name, result.ResultType.value, result.Message, result.InfoUrl, result.Notifiers, result.Timestamp, duration) for (key, result, duration) in timedResults]))
+
+    # checks which ask to be run (e.g. on streamed federated check results) are scheduled by the main process
+    healthChecker.RunRequested = lambda keys: Send(("trigger", keys))
+
+    Thread(target=Receive, daemon=True).start()
+
+    # the worker stops when the main process has closed its end of the pipe
+    while True:
+
+        message = await messages.get()
+
+        if message is None:
+            break
+
+        elif message[0] == "config":
+
+            (_, checks, forceReload) = message
+
+            try:
+
+                if forceReload:
+                    extensions.Reload()
+
+                else:
+                    extensions.Refresh()
+
+                healthChecker.SetChecks(checks, extensions)
+
+            except Exception as ex:
+                logger.error(msg=str(ex), exc_info=ex)
+
+        elif message[0] == "run":
+            task = asyncio.create_task(RunAsync(message[1], message[2]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    await httpClient.CloseAsync()